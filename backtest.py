@@ -1,19 +1,35 @@
+import argparse
 import csv
 import datetime
-import glob
 import os
 import time
+from contextlib import nullcontext
 
-import pandas as pd
 from dotenv import load_dotenv
 
 from src.account import Account
+from src.bar import Bar
+from src.batch_backtest import BatchBacktest
+from src.kline_log import KlineLog
+from src.portfolio_backtest import PortfolioBacktest
+from src.profiler import SamplingProfiler
 from src.setting import Setting
 from src.strategy import Strategy
 
 load_dotenv()
 os.environ['TZ'] = 'UTC'
 
+parser = argparse.ArgumentParser()
+parser.add_argument('--profile', action='store_true', help='sample every replay, collapsed stacks go to logs/')
+args = parser.parse_args()
+
+profiler = SamplingProfiler() if args.profile else None
+
+
+def profile(name: str):
+    return profiler.profile(name) if profiler else nullcontext()
+
+
 balance = float(os.getenv('BALANCE')) if os.getenv('BALANCE') else 500.
 
 account = Account(balance)
@@ -23,12 +39,20 @@ setting.is_back_test = True
 strategy = Strategy(account, setting)
 
 logs_path = 'logs'
-os.chdir(logs_path)
-log_files = glob.glob('*.{}'.format('csv'))
+log_files = KlineLog.find_logs(logs_path)
 
 from_date = None
 # from_date = "05-05-2023 00:00:01"
 
+# replay the whole file with vectorized entry masks instead of row by row
+batch = True
+
+# replay every symbol at once on one account, merged by close_time
+portfolio = False
+
+# an empty list replays every log found
+symbols = ['LDOUSDT']
+
 # strategy.setting.ema1_amplitude = 2.25
 # strategy.setting.ema2_amplitude = 2.25
 # strategy.setting.take_profit = 0.02
@@ -45,39 +69,62 @@ if from_date:
         datetime.datetime.strptime(from_date, "%d-%m-%Y %H:%M:%S").timetuple()
     ) * 1000
 
-for file in log_files:
-    symbol = file[:-4]
+if symbols:
+    log_files = {symbol: file for symbol, file in log_files.items() if symbol in symbols}
 
-    if symbol not in ['LDOUSDT']:
-        continue
+if portfolio:
+    with profile('portfolio'):
+        stats = PortfolioBacktest(strategy).run(log_files, from_date)
 
+    for symbol, symbol_stats in stats["symbols"].items():
+        print(
+            f'{symbol}: Events: {symbol_stats["events"]}, Wins: {symbol_stats["wins"]}, '
+            f'Loses: {symbol_stats["loses"]}, Trailing Loses: {symbol_stats["trailing_loses"]}, '
+            f'PnL: {symbol_stats["pnl"]:.4f}'
+        )
+
+    print(f'Open positions: {", ".join(stats["total"]["open_symbols"]) or "-"}')
+    print(f'Rows per second: {stats["total"]["rows_per_second"]:.0f}')
+    log_files = {}
+
+
+def replay(symbol: str, file: str):
     print(f'Processing symbol {symbol}')
     try:
         file_abs_path = os.getcwd() + "/" + file
 
-        print(file_abs_path, os.path.isfile(file_abs_path))
+        print(file_abs_path, os.path.exists(file_abs_path))
 
-        with open(os.getcwd() + "/" + file, 'r') as csv_file:
-            csv_reader = csv.reader(csv_file, delimiter=',')
+        # binary logs can only be replayed in batch
+        if batch or file.endswith(KlineLog.binary_extension):
+            BatchBacktest(strategy).run(symbol, KlineLog.read(file_abs_path, from_date))
+            return
 
-            header = []
-            for i, row in enumerate(csv_reader):
-                if i == 0:
-                    header = row
-                    continue
+        # starts right at the rows of from_date, the header is already skipped
+        with KlineLog.open_csv(file_abs_path, from_date) as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=',')
 
-                df = pd.DataFrame([row], columns=header)
-                df_data = df.iloc[0]
+            for row in csv_reader:
+                bar, current_price = Bar.from_log_row(row)
 
                 if from_date:
-                    if float(df_data.close_time) < from_date:
+                    if bar.close_time < from_date:
                         continue
 
-                strategy.process_kline_event(symbol, df_data, float(df_data['current_price']))
+                strategy.process_kline_event(symbol, bar, current_price)
     except FileNotFoundError as re:
         # raise re
         print(re)
 
+
+for symbol, file in log_files.items():
+    with profile(symbol):
+        replay(symbol, file)
+
 print(f'Wins: {strategy.setting.wins}')
 print(f'Loses: {strategy.setting.loses}')
 print(f'Trailing Loses: {strategy.setting.trailing_loses}')
+print(f'Balance: {strategy.account.balance:.4f}')
+
+if profiler:
+    profiler.print_top()
@@ -0,0 +1,107 @@
+import asyncio
+import random
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.append('.')
+
+from src.bootstrap import KlineBootstrap
+
+symbol_count = 54
+days = 2
+interval_ms = 60000
+start_time = 1672531200000  # 2023-01-01 00:00:00 UTC
+
+
+class MockExchange:
+    # the futures klines endpoint, with latency and a share of failing requests
+    def __init__(self, latency: float, error_rate: float, broken_symbols: list, hung_symbols: list):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.broken_symbols = broken_symbols
+        self.hung_symbols = hung_symbols
+        self.random = random.Random(0)
+
+        self.requests = 0
+        self.errors = 0
+        self.weight = 0
+
+    async def klines(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.weight += KlineBootstrap.get_request_weight(int(request.query["limit"]))
+
+        await asyncio.sleep(self.latency)
+
+        s = request.query["symbol"]
+
+        if s in self.hung_symbols:
+            # answers long after the client gave up
+            await asyncio.sleep(KlineBootstrap.request_timeout * 2)
+
+        if s in self.broken_symbols or self.random.random() < self.error_rate:
+            self.errors += 1
+
+            # a server error and a connection dropped without an answer, in turns
+            if self.errors % 2:
+                return web.Response(status=503)
+
+            request.transport.close()
+            return web.Response(status=503)
+
+        start_ms = int(request.query["startTime"])
+        end_ms = min(int(request.query["endTime"]), start_time + days * 86400000 - 1)
+        limit = int(request.query["limit"])
+
+        klines = [
+            [t, "100.0", "101.0", "99.0", "100.5", "1234.5", t + interval_ms - 1, "123456.7", 42, "600.1", "60000.2", "0"]
+            for t in range(start_ms, end_ms + 1, interval_ms)[:limit]
+        ]
+
+        return web.json_response(klines, headers={"X-MBX-USED-WEIGHT-1M": "1"})
+
+
+async def run(latency: float, error_rate: float, broken_symbols: list, hung_symbols: list = ()):
+    exchange = MockExchange(latency, error_rate, broken_symbols, hung_symbols)
+
+    application = web.Application()
+    application.router.add_get(KlineBootstrap.klines_path, exchange.klines)
+
+    runner = web.AppRunner(application)
+    await runner.setup()
+
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    try:
+        symbols = [f"SYM{i}USDT" for i in range(symbol_count)]
+        end_ms = start_time + days * 86400000 - 1
+
+        started = time.perf_counter()
+        tables = await KlineBootstrap(f"http://127.0.0.1:{port}").fetch({s: start_time for s in symbols}, end_ms)
+        elapsed = time.perf_counter() - started
+    finally:
+        await runner.cleanup()
+
+    rows = days * 24 * 60
+    complete = sum(len(table) == rows for table in tables.values())
+
+    print(
+        f"latency {latency * 1000:.0f}ms, error rate {error_rate:.0%}: {symbol_count} symbols x {days} days "
+        f"in {elapsed:.2f}s, {exchange.requests} requests, {exchange.errors} failed, weight {exchange.weight}"
+    )
+    print(f"  complete symbols: {complete}/{symbol_count}, missing: {sorted(set(symbols) - set(tables))}")
+
+
+if __name__ == '__main__':
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    error_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+    asyncio.run(run(latency, 0., []))
+    asyncio.run(run(latency, error_rate, []))
+    # a symbol that always fails is left out alone
+    asyncio.run(run(latency, 0., ["SYM0USDT"]))
+    # and so does one that never answers in time
+    asyncio.run(run(latency, 0., [], ["SYM1USDT"]))
@@ -0,0 +1,77 @@
+import csv
+import os
+import sys
+
+import numpy as np
+
+sys.path.append('.')
+
+from src.indicators import IndicatorEngine
+from src.kline_log import KlineLog
+
+path = 'cache/benchmarks'
+
+sizes = {
+    'day': 24 * 60,
+    'month': 30 * 24 * 60,
+    'year': 365 * 24 * 60,
+}
+
+start_time = 1672531200000  # 2023-01-01 00:00:00 UTC
+
+
+def get_fixture_path(size: str, seed: int = 0) -> str:
+    return os.path.join(path, f'BENCH{size.upper()}{seed}USDT.csv')
+
+
+def generate(log_path: str, rows: int, seed: int = 0):
+    # same seed, same file, so numbers from different versions are comparable
+    rng = np.random.default_rng(seed)
+    indicators = IndicatorEngine()
+
+    returns = rng.normal(0, 0.004, rows) + np.where(rng.random(rows) < 0.005, rng.normal(0, 0.03, rows), 0)
+    wicks = np.abs(rng.normal(0, 0.002, (rows, 2)))
+    ticks = rng.normal(0, 0.003, rows)
+    volumes = rng.gamma(2, 500, rows)
+    trades = rng.poisson(200, rows)
+
+    temporary_path = log_path + '.tmp'
+
+    with open(temporary_path, 'w', newline='') as out_csv:
+        writer = csv.writer(out_csv, delimiter=',', lineterminator='\n')
+        writer.writerow(KlineLog.headers)
+
+        close = 1.
+        for i in range(rows):
+            open_price = close
+            # pulled back towards 1, so a year long walk keeps a realistic price and atr
+            close = open_price * (1 + returns[i] - 0.0005 * np.log(open_price))
+            high = max(open_price, close) * (1 + wicks[i, 0])
+            low = min(open_price, close) * (1 - wicks[i, 1])
+            open_time = start_time + i * 60000
+
+            writer.writerow(
+                [
+                    open_price, high, low, close, volumes[i], open_time + 59999, volumes[i] * close,
+                    int(trades[i]), volumes[i] / 2, volumes[i] * close / 2, 0.,
+                ]
+                + indicators.update(open_time, high, low, close)
+                + [close * (1 + ticks[i])]
+            )
+
+    os.replace(temporary_path, log_path)
+
+
+def get_fixture(size: str, seed: int = 0) -> str:
+    log_path = get_fixture_path(size, seed)
+
+    if not os.path.isfile(log_path):
+        os.makedirs(path, exist_ok=True)
+        generate(log_path, sizes[size], seed)
+
+    return log_path
+
+
+if __name__ == '__main__':
+    for size in sys.argv[1:] or sizes:
+        print(get_fixture(size))
@@ -0,0 +1,118 @@
+import csv
+import sys
+import time
+
+sys.path.append('.')
+
+from benchmarks.fixtures import get_fixture
+from src.account import Account
+from src.bar import Bar
+from tests.fake_exchange import FakeExchange
+from src.order_executor import OrderExecutor
+from src.setting import Setting
+from src.strategy import Strategy
+
+symbol = "BENCHUSDT"
+
+
+def create_strategy(exchange: FakeExchange) -> Strategy:
+    setting = Setting()
+    setting.is_back_test = True
+    setting.is_hyperopt = True
+    setting.paper_leverage = 10
+
+    strategy = Strategy(Account(exchange.balance), setting)
+
+    # the live path against the local exchange, without setup_binance
+    strategy.live = True
+    strategy.client = exchange
+    strategy.order_executor = OrderExecutor(exchange)
+    exchange.subscribe(strategy.order_executor.handle_order_update)
+
+    setting.set_symbols_setting("leverage", {symbol: {"initialLeverage": 10}})
+    setting.set_symbols_setting("info", {symbol: {"quantityPrecision": 3, "pricePrecision": 5}})
+
+    return strategy
+
+
+def check_flat_after_close(strategy: Strategy, exchange: FakeExchange) -> list:
+    # every close the book applies has to leave the exchange flat, a remainder is an orphan or a reversed position
+    remainders = []
+    fill_close_order = strategy.fill_close_order
+
+    def fill_and_check(order):
+        fill_close_order(order)
+
+        amount = exchange.get_position(order.symbol)["amount"]
+        if amount:
+            remainders.append((order.client_order_id, amount))
+
+    strategy.fill_close_order = fill_and_check
+
+    return remainders
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+
+    return values[min(int(len(values) * q), len(values) - 1)] if values else 0.
+
+
+def run(log_path: str, latency: float, tick_interval: float, fill_in_response: bool):
+    exchange = FakeExchange(latency=latency, fill_in_response=fill_in_response)
+    strategy = create_strategy(exchange)
+    executor = strategy.order_executor
+    remainders = check_flat_after_close(strategy, exchange)
+
+    ticks = []
+
+    with open(log_path, 'r') as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=',')
+        next(csv_reader)
+
+        for row in csv_reader:
+            bar, current_price = Bar.from_log_row(row)
+            exchange.set_price(symbol, current_price)
+
+            started = time.perf_counter()
+            strategy.process_kline_event(symbol, bar, current_price)
+            ticks.append((time.perf_counter() - started) * 1000)
+
+            if tick_interval:
+                time.sleep(tick_interval)
+
+    executor.close()
+    strategy.apply_orders()
+
+    summary = executor.get_latency_summary()
+    orders = len(executor.latencies)
+
+    print(f"fill in response: {fill_in_response}, exchange latency: {latency * 1000:.0f}ms, orders: {orders}")
+    print(
+        f"  tick path: p50 {percentile(ticks, 0.5):.3f}ms, p99 {percentile(ticks, 0.99):.3f}ms, "
+        f"max {max(ticks):.3f}ms over {len(ticks)} ticks"
+    )
+
+    for stage, stats in summary.items():
+        print(f"  {stage:>8}: p50 {stats['p50']:.1f}ms, p99 {stats['p99']:.1f}ms, max {stats['max']:.1f}ms")
+
+    # the order and the position request used to run one after the other on the tick
+    print(f"  blocking path would have held ticks for {orders * 2 * latency:.1f}s")
+    print(f"  balance: {strategy.account.balance:.4f}, exchange balance: {exchange.balance:.4f}")
+    print(f"  closes that left a position: {len(remainders)} {remainders[:5]}")
+
+    return not remainders
+
+
+if __name__ == '__main__':
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    tick_interval = float(sys.argv[2]) if len(sys.argv) > 2 else 0.
+    size = sys.argv[3] if len(sys.argv) > 3 else 'month'
+
+    path = get_fixture(size)
+
+    flat = run(path, latency, tick_interval, True)
+    flat = run(path, latency, tick_interval, False) and flat
+
+    if not flat:
+        sys.exit(1)
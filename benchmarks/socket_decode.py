@@ -0,0 +1,70 @@
+import json
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append('.')
+
+from src.kline_event import KlineEvent
+
+# the field layout handle_socket_message used to give the "k" payload
+event_columns = [
+    "kline_start_time", "kline_close_time", "interval", "first_trade_id", "last_trade_id", "open", "close", "high",
+    "low", "volume", "number_of_trades", "is_closed", "quote_asset_volume", "taker_buy_volume",
+    "taker_buy_quote_asset_volume", "ignore",
+]
+
+
+def create_events(count: int, symbols: int = 54) -> list:
+    random.seed(0)
+
+    events = []
+    for i in range(count):
+        price = 100 + random.random()
+
+        events.append(json.dumps({
+            "e": "continuous_kline", "E": 1680000000000 + i, "ps": f"SYM{i % symbols}USDT", "ct": "PERPETUAL",
+            "k": {
+                "t": 1680000000000, "T": 1680000059999, "i": "1m", "f": i, "L": i + 10,
+                "o": f"{price:.4f}", "c": f"{price:.4f}", "h": f"{price + 1:.4f}", "l": f"{price - 1:.4f}",
+                "v": "1234.5", "n": 42, "x": False, "q": "123456.7", "V": "600.1", "Q": "60000.2", "B": "0",
+            },
+        }))
+
+    return events
+
+
+def decode_dataframe(event: dict) -> float:
+    event_df = pd.DataFrame([event["k"]])
+    event_df = event_df.set_axis(event_columns, axis=1, copy=False)
+    event_df.drop("interval", axis=1, inplace=True)
+    event_df.astype(float)
+
+    return float(event_df.iloc[0].close)
+
+
+def decode_slotted(event: dict, events: dict) -> float:
+    return events[event["ps"]].decode(event).close
+
+
+def measure(name: str, decode, messages: list):
+    started = time.perf_counter()
+
+    for message in messages:
+        decode(json.loads(message))
+
+    elapsed = time.perf_counter() - started
+    print(f"{name:>10}: {len(messages) / elapsed:>12,.0f} events/sec ({elapsed:.3f}s for {len(messages)} events)")
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    messages = create_events(count)
+    events = {json.loads(message)["ps"]: KlineEvent() for message in messages[:54]}
+
+    # json.loads is inside both loops, python-binance does it before the handler anyway
+    measure("dataframe", decode_dataframe, messages[:max(count // 50, 1)])
+    measure("slotted", lambda event: decode_slotted(event, events), messages)
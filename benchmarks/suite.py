@@ -0,0 +1,226 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+sys.path.append('.')
+
+from benchmarks.fixtures import get_fixture, sizes
+from src.account import Account
+from src.bar import Bar
+from src.batch_backtest import BatchBacktest
+from src.grid_backtest import GridBacktest
+from src.kline_log import KlineLog
+from src.setting import Setting
+from src.strategy import Strategy
+
+results_path = 'benchmarks/results'
+
+balance = 500.
+indicators = ["ema9", "ema20", "ema55", "wma14"]
+amplitudes = [round(amplitude, 2) for amplitude in np.arange(1, 5.01, 0.1)]
+
+
+class Liquidated(Exception):
+    pass
+
+
+def create_strategy(indicator: str = "ema9", amplitude: float = 2.4) -> Strategy:
+    setting = Setting()
+    setting.is_back_test = True
+    setting.is_hyperopt = True
+    setting.indicator = indicator
+    setting.ema_amplitude = amplitude
+    setting.paper_leverage = 10
+
+    strategy = Strategy(Account(balance), setting)
+
+    def liquidate(_):
+        raise Liquidated
+
+    strategy.liquidation_callback = liquidate
+
+    return strategy
+
+
+def get_peak_memory() -> int:
+    # kilobytes on linux, bytes on macos
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def get_outcome(strategy: Strategy) -> dict:
+    return {
+        "balance": round(float(strategy.account.balance), 6),
+        "wins": strategy.setting.wins,
+        "loses": strategy.setting.loses,
+        "trailing_loses": strategy.setting.trailing_loses,
+    }
+
+
+def bench_replay(log_path: str) -> dict:
+    strategy = create_strategy()
+    rows = 0
+
+    started = time.perf_counter()
+
+    # the same loop backtest.py runs without batch
+    try:
+        with open(log_path, 'r') as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=',')
+            next(csv_reader)
+
+            for row in csv_reader:
+                bar, current_price = Bar.from_log_row(row)
+                rows += 1
+
+                strategy.process_kline_event("BENCHUSDT", bar, current_price)
+    except Liquidated:
+        pass
+
+    elapsed = time.perf_counter() - started
+
+    return {"rows": rows, "seconds": elapsed, "rows_per_second": rows / elapsed, **get_outcome(strategy)}
+
+
+def bench_batch(log_path: str) -> dict:
+    started = time.perf_counter()
+    data = KlineLog.read(log_path)
+    loaded = time.perf_counter()
+
+    strategy = create_strategy()
+    try:
+        BatchBacktest(strategy).run("BENCHUSDT", data)
+    except Liquidated:
+        pass
+
+    elapsed = time.perf_counter() - loaded
+    rows = len(data['close_time'])
+
+    return {
+        "rows": rows, "load_seconds": loaded - started, "seconds": elapsed, "rows_per_second": rows / elapsed,
+        **get_outcome(strategy),
+    }
+
+
+def bench_grid(log_path: str) -> dict:
+    data = KlineLog.read(log_path)
+    rows = len(data['close_time'])
+    best = balance
+
+    started = time.perf_counter()
+
+    for indicator in indicators:
+        result = GridBacktest(create_strategy(indicator)).run("BENCHUSDT", data, amplitudes)
+        best = max(best, float(result["balance"].max()))
+
+    elapsed = time.perf_counter() - started
+    points = len(indicators) * len(amplitudes)
+
+    return {
+        "rows": rows, "grid_points": points, "seconds": elapsed,
+        "grid_points_per_second": points / elapsed, "row_points_per_second": rows * points / elapsed,
+        "best_balance": round(best, 6),
+    }
+
+
+benches = {
+    "replay": bench_replay,
+    "batch": bench_batch,
+    "grid": bench_grid,
+}
+
+
+def run_isolated(bench: str, log_path: str) -> dict:
+    result = benches[bench](log_path)
+    result["peak_memory"] = get_peak_memory()
+
+    return result
+
+
+def get_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict, previous_path: str):
+    with open(previous_path) as previous_file:
+        previous = json.load(previous_file)["results"]
+
+    for size, stages in results.items():
+        for bench, result in stages.items():
+            before = previous.get(size, {}).get(bench)
+            if not before:
+                continue
+
+            key = "grid_points_per_second" if bench == "grid" else "rows_per_second"
+            print(
+                f"{size:>6} {bench:>7}: {result[key] / before[key]:6.2f}x throughput, "
+                f"{result['peak_memory'] / before['peak_memory']:6.2f}x peak memory"
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay and hyperopt throughput on synthetic kline logs')
+    parser.add_argument('--sizes', default='day,month', help=f'comma separated, any of {",".join(sizes)}')
+    parser.add_argument('--benches', default=','.join(benches), help=f'comma separated, any of {",".join(benches)}')
+    parser.add_argument('--output', help='result file, benchmarks/results/<revision>.json by default')
+    parser.add_argument('--compare', help='an earlier result file to compare against')
+    args = parser.parse_args()
+
+    revision = get_revision()
+    results = {}
+
+    for size in args.sizes.split(','):
+        log_path = get_fixture(size)
+        results[size] = {}
+
+        for bench in args.benches.split(','):
+            # a fresh process per bench, so peak memory belongs to that bench alone
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                result = executor.submit(run_isolated, bench, log_path).result()
+
+            results[size][bench] = result
+
+            throughput = (
+                f"{result['grid_points_per_second']:,.1f} grid points/sec" if bench == "grid"
+                else f"{result['rows_per_second']:,.0f} rows/sec"
+            )
+            print(
+                f"{size:>6} {bench:>7}: {throughput}, {result['seconds']:.3f}s, "
+                f"peak memory {result['peak_memory'] / 2 ** 20:,.1f} MB"
+            )
+
+    output = args.output or os.path.join(results_path, f'{revision}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    with open(output, 'w') as out_file:
+        json.dump(
+            {
+                "revision": revision,
+                "time": time.strftime('%Y-%m-%d %H:%M:%S'),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "results": results,
+            },
+            out_file,
+            indent=2,
+        )
+
+    print(f'Results saved to {output}')
+
+    if args.compare:
+        compare(results, args.compare)
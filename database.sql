@@ -1,9 +1,11 @@
 create table if not exists symbol_settings (
     id int not null auto_increment primary key,
-    symbol varchar(50) not null,
+    symbol varchar(50) not null unique,
     indicator varchar(50) not null,
     amplitude varchar(10) not null,
     hyperopted_balance varchar(50),
     created_at datetime not null,
     updated_at datetime
-);
\ No newline at end of file
+);
+
+-- tables created before symbols were unique: migrations/001_unique_symbol_settings.sql
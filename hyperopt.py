@@ -1,29 +1,50 @@
-import csv
+import argparse
 import datetime
-import glob
 import os
 import time
 from multiprocessing.pool import ThreadPool
 import gc
 
-import pandas as pd
 import numpy as np
 from dotenv import load_dotenv
 
 from src.account import Account
+from src.bar import Bar
+from src.batch_backtest import BatchBacktest
+from src.hyperopt_executor import HyperoptExecutor
+from src.kline_log import KlineLog
+from src.profiler import SamplingProfiler
 from src.setting import Setting
 from src.strategy import Strategy
+from src.utils import Utils
+from src.walk_forward import WalkForward
 
 load_dotenv()
 os.environ['TZ'] = 'UTC'
 
+parser = argparse.ArgumentParser()
+parser.add_argument('--profile', action='store_true', help='sample every symbol, collapsed stacks go to logs/')
+args = parser.parse_args()
+
+profiler = SamplingProfiler() if args.profile else None
+
+# a profiled run stays in this process, pool workers are out of the sampler's sight
 processes = int(os.getenv('PROCESSES')) if os.getenv('PROCESSES') else 2
+processes = 0 if profiler else processes
 
-log_files = glob.glob('logs/*.{}'.format('csv'))
+log_files = KlineLog.find_logs('logs')
 
 from_date = None
 # from_date = "05-05-2023 00:00:01"
 
+# replay the whole file with vectorized entry masks in a process pool instead of row by row in threads
+batch = True
+
+# optimize on rolling train windows and score each result on the window after it, instead of the whole history
+walk_forward = False
+train_days = int(os.getenv('WALK_FORWARD_TRAIN_DAYS')) if os.getenv('WALK_FORWARD_TRAIN_DAYS') else 30
+test_days = int(os.getenv('WALK_FORWARD_TEST_DAYS')) if os.getenv('WALK_FORWARD_TEST_DAYS') else 7
+
 # strategy.setting.ema1_amplitude = 2.25
 # strategy.setting.ema2_amplitude = 2.25
 # strategy.setting.take_profit = 0.02
@@ -33,28 +54,34 @@ from_date = None
 # strategy.setting.trailing_amplitude_diff = 10
 
 
-def run_back_test(csv_list, symbol, instance):
-    header = []
-
+def run_back_test(columns, symbol, instance):
     print(
         datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), symbol,
-        instance.setting.ema_amplitude, instance.setting.indicator, len(csv_list)
+        instance.setting.ema_amplitude, instance.setting.indicator,
+        len(columns['close_time'])
     )
 
-    for i, row in enumerate(csv_list):
-        if i == 0:
-            header = row
-            continue
-
-        df = pd.DataFrame([row], columns=header)
-        df_data = df.iloc[0]
+    if batch:
+        BatchBacktest(instance).run(symbol, columns)
+        return
 
-        if from_date:
-            if float(df_data.close_time) < from_date:
-                continue
+    # from_date is already applied by the loader
+    for bar, current_price in Bar.iterate_columns(columns):
+        instance.process_kline_event(symbol, bar, current_price)
 
-        instance.process_kline_event(symbol, df_data, float(df_data['current_price']))
 
+grid = {
+    "indicator": [
+        "ema5", "ema9", "ema10", "ema15", "ema20", "ema25", "ema30",
+        "ema35", "ema40", "ema45", "ema50", "ema55", "ema60", "ema65",
+        "ema70", "ema75", "ema80", "ema85", "ema90", "wma14"
+    ],
+    "amplitude": {
+        "min": 1,
+        "max": 5,
+        "step": 0.1
+    },
+}
 
 if from_date:
     from_date = time.mktime(
@@ -74,73 +101,65 @@ def process_file(file):
 
         print(file_abs_path, os.path.isfile(file_abs_path))
 
-        with open(os.getcwd() + "/" + file, 'r') as csv_file:
-            csv_reader = csv.reader(csv_file, delimiter=',')
-            csv_enumerate = list(csv_reader)
-
-            balance = float(os.getenv('BALANCE')) if os.getenv('BALANCE') else 500.
-
-            account = Account(balance)
-            setting = Setting()
-            setting.is_back_test = True
-            setting.is_hyperopt = True
-
-            strategy = Strategy(account, setting)
-
-            hyperopt_params = {
-                "indicator": [
-                    "ema5", "ema9", "ema10", "ema15", "ema20", "ema25", "ema30",
-                    "ema35", "ema40", "ema45", "ema50", "ema55", "ema60", "ema65",
-                    "ema70", "ema75", "ema80", "ema85", "ema90", "wma14"
-                ],
-                "amplitude": {
-                    "min": 1,
-                    "max": 5,
-                    "step": 0.1
-                },
-                "best_result": 500,
-                "best_params": {
-                    "indicator": None,
-                    "amplitude": None,
-                }
-            }
+        # parsed once into float64 columns, every combination replays the same arrays
+        columns = KlineLog.read_csv(file_abs_path, from_date)
+
+        balance = float(os.getenv('BALANCE')) if os.getenv('BALANCE') else 500.
+
+        account = Account(balance)
+        setting = Setting()
+        setting.is_back_test = True
+        setting.is_hyperopt = True
 
-            for indicator in hyperopt_params["indicator"]:
-                strategy.setting.indicator = indicator
+        strategy = Strategy(account, setting)
 
-                for amplitude in np.arange(
-                        hyperopt_params["amplitude"]["min"],
-                        hyperopt_params["amplitude"]["max"] + 1,
-                        hyperopt_params["amplitude"]["step"]):
-                    strategy.account.balance = 500
-                    strategy.setting.ema_amplitude = round(amplitude, 2)
+        hyperopt_params = {
+            "indicator": grid["indicator"],
+            "amplitude": grid["amplitude"],
+            "best_result": 500,
+            "best_params": {
+                "indicator": None,
+                "amplitude": None,
+            }
+        }
+
+        for indicator in hyperopt_params["indicator"]:
+            strategy.setting.indicator = indicator
+
+            for amplitude in np.arange(
+                    hyperopt_params["amplitude"]["min"],
+                    hyperopt_params["amplitude"]["max"] + 1,
+                    hyperopt_params["amplitude"]["step"]):
+                # a fresh account, positions left open by the previous combination do not carry over
+                strategy.account = Account(500)
+                strategy.setting.ema_amplitude = round(amplitude, 2)
+
+                strategy.utils.print_log(
+                    {
+                        "Try params": "",
+                        "Symbol": symbol,
+                        "Indicator": indicator,
+                        "Amplitude": strategy.setting.ema_amplitude,
+                    }
+                )
+
+                run_back_test(columns, symbol, strategy)
+
+                if strategy.account.balance > hyperopt_params["best_result"]:
+                    hyperopt_params["best_result"] = strategy.account.balance
+                    hyperopt_params["best_params"]["indicator"] = indicator
+                    hyperopt_params["best_params"]["amplitude"] = amplitude
 
                     strategy.utils.print_log(
                         {
-                            "Try params": "",
+                            "Best Result": "",
                             "Symbol": symbol,
-                            "Indicator": indicator,
-                            "Amplitude": strategy.setting.ema_amplitude,
+                            "Indicator": hyperopt_params["best_params"]["indicator"],
+                            "Amplitude": hyperopt_params["best_params"]["amplitude"],
+                            "Balance": hyperopt_params["best_result"],
                         }
                     )
 
-                    run_back_test(csv_enumerate, symbol, strategy)
-
-                    if strategy.account.balance > hyperopt_params["best_result"]:
-                        hyperopt_params["best_result"] = strategy.account.balance
-                        hyperopt_params["best_params"]["indicator"] = indicator
-                        hyperopt_params["best_params"]["amplitude"] = amplitude
-
-                        strategy.utils.print_log(
-                            {
-                                "Best Result": "",
-                                "Symbol": symbol,
-                                "Indicator": hyperopt_params["best_params"]["indicator"],
-                                "Amplitude": hyperopt_params["best_params"]["amplitude"],
-                                "Balance": hyperopt_params["best_result"],
-                            }
-                        )
-
     except FileNotFoundError as re:
         # raise re
         print(re)
@@ -160,13 +179,114 @@ def process_file(file):
         gc.collect()
 
 
-with ThreadPool(processes=processes) as pool:
-    pool.map(process_file, log_files)
+def run_symbols(run: callable) -> dict:
+    if not profiler:
+        return run(log_files)
+
+    best = {}
+
+    # one profile per symbol, like the backtest
+    for symbol, file in log_files.items():
+        with profiler.profile(symbol):
+            best.update(run({symbol: file}))
+
+    return best
+
+
+def run_process_pool():
+    balance = float(os.getenv('BALANCE')) if os.getenv('BALANCE') else 500.
 
-# threads = []
-# for f in log_files:
-#     threads.append(Thread(target=process_file, args=(f,)))
-#     threads[-1].start()
-#
-# for thread in threads:
-#     thread.join()
+    amplitudes = [
+        round(amplitude, 2) for amplitude in np.arange(
+            grid["amplitude"]["min"],
+            grid["amplitude"]["max"] + 1,
+            grid["amplitude"]["step"])
+    ]
+
+    executor = HyperoptExecutor(processes, balance, from_date)
+    best = run_symbols(lambda files: executor.run(files, grid["indicator"], amplitudes))
+
+    setting = Setting()
+    utils = Utils(os.getenv("ENV"))
+
+    for symbol, params in best.items():
+        utils.print_log(
+            {
+                "Best Result": "",
+                "Symbol": symbol,
+                "Indicator": params["indicator"],
+                "Amplitude": params["amplitude"],
+                "Balance": params["balance"],
+            }
+        )
+
+    # every symbol in one transaction
+    setting.save_symbols_settings_to_db([
+        {
+            "symbol": symbol,
+            "amplitude": float(params["amplitude"]),
+            "indicator": params["indicator"],
+            "balance": round(params["balance"], 2),
+        }
+        for symbol, params in best.items()
+    ])
+
+
+def run_walk_forward():
+    balance = float(os.getenv('BALANCE')) if os.getenv('BALANCE') else 500.
+
+    amplitudes = [
+        round(amplitude, 2) for amplitude in np.arange(
+            grid["amplitude"]["min"],
+            grid["amplitude"]["max"] + 1,
+            grid["amplitude"]["step"])
+    ]
+
+    # grids of windows computed by an earlier run are read back from cache/walk_forward
+    optimizer = WalkForward(processes, balance, train_days, test_days)
+    best = run_symbols(lambda files: optimizer.run(files, grid["indicator"], amplitudes))
+
+    setting = Setting()
+    utils = Utils(os.getenv("ENV"))
+
+    for symbol, params in best.items():
+        utils.print_log(
+            {
+                "Walk Forward": "",
+                "Symbol": symbol,
+                "Indicator": params["indicator"],
+                "Amplitude": params["amplitude"],
+                "Train Balance": params["train_balance"],
+                "Out Of Sample Balance": params["balance"],
+                "Windows": f'{params["scored_windows"]}/{params["windows"]}',
+            }
+        )
+
+    # the parameters of the latest train window, with the balance they earned out of sample
+    setting.save_symbols_settings_to_db([
+        {
+            "symbol": symbol,
+            "amplitude": float(params["amplitude"]),
+            "indicator": params["indicator"],
+            "balance": round(params["balance"], 2),
+        }
+        for symbol, params in best.items() if params["indicator"] is not None
+    ])
+
+
+if __name__ == '__main__':
+    if walk_forward:
+        run_walk_forward()
+    elif batch:
+        run_process_pool()
+    elif profiler:
+        for symbol, file in log_files.items():
+            if file.endswith(KlineLog.csv_extension):
+                with profiler.profile(symbol):
+                    process_file(file)
+    else:
+        with ThreadPool(processes=processes) as pool:
+            pool.map(process_file, [file for file in log_files.values() if file.endswith(KlineLog.csv_extension)])
+
+    if profiler:
+        profiler.print_top()
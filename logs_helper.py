@@ -1,19 +1,55 @@
+import glob
+import sys
+
 import pandas as pd
 import os
 
+from src.kline_log import KlineLog, KlineLogWriter
+
 CHUNK_SIZE = 50000
 csv_file_list = ["./logs/old/DYDXUSDT.csv", "./logs/new/DYDXUSDT.csv"]
 output_file = "./logs/DYDXUSDT.csv"
 
-os.remove(output_file) if os.path.exists(output_file) else None
 
-for i, csv_file_name in enumerate(csv_file_list):
-    if i == 0:
-        skip_row = []
-    else:
-        skip_row = [0]
+def merge_csv_logs():
+    os.remove(output_file) if os.path.exists(output_file) else None
+
+    for i, csv_file_name in enumerate(csv_file_list):
+        if i == 0:
+            skip_row = []
+        else:
+            skip_row = [0]
+
+        chunk_container = pd.read_csv(csv_file_name, chunksize=CHUNK_SIZE, skiprows=skip_row)
+        for chunk in chunk_container:
+            print(chunk)
+            chunk.to_csv(output_file, mode="a", index=False)
+
+
+def convert_csv_logs(symbols: list = None):
+    # python logs_helper.py convert [SYMBOL ...]
+    for csv_file_name in sorted(glob.glob("./logs/*" + KlineLog.csv_extension)):
+        symbol = os.path.basename(csv_file_name)[:-len(KlineLog.csv_extension)]
+
+        if symbols and symbol not in symbols:
+            continue
+
+        binary_file_name = "./logs/" + symbol + KlineLog.binary_extension
+        if os.path.exists(binary_file_name):
+            print(f"Skip {symbol}, {binary_file_name} already exists")
+            continue
+
+        writer = KlineLogWriter(binary_file_name)
+        rows = 0
+
+        for chunk in pd.read_csv(csv_file_name, chunksize=CHUNK_SIZE, dtype=float, float_precision="round_trip"):
+            writer.write_columns({column: chunk[column].to_numpy() for column in KlineLog.headers})
+            rows += len(chunk)
+
+        print(f"Converted {symbol}, rows {rows}")
+
 
-    chunk_container = pd.read_csv(csv_file_name, chunksize=CHUNK_SIZE, skiprows=skip_row)
-    for chunk in chunk_container:
-        print(chunk)
-        chunk.to_csv(output_file, mode="a", index=False)
+if len(sys.argv) > 1 and sys.argv[1] == "convert":
+    convert_csv_logs(sys.argv[2:])
+else:
+    merge_csv_logs()
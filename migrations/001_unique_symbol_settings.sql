@@ -0,0 +1,9 @@
+-- symbol_settings tables created before symbols were unique.
+-- keeps the latest row of every symbol, then adds the key the batched upsert relies on
+
+delete older from symbol_settings older
+join symbol_settings newer
+    on newer.symbol = older.symbol
+    and (coalesce(newer.updated_at, newer.created_at), newer.id) > (coalesce(older.updated_at, older.created_at), older.id);
+
+alter table symbol_settings add unique key (symbol);
@@ -1,15 +1,18 @@
+from src.position_book import PositionBook
+
+
 class Account:
     balance = 0
-    symbol_position = None
-    long_position = False
-    short_position = False
-    entry_price = 0
-    stop_loss_price = 0
-    take_profit_price = 0
-    asset_size = 0
-    position_size = 0
-    position_fee = 0
+    # set once the user data stream owns the balance, live trades then stop booking it locally
+    synced = False
 
     def __init__(self, balance: float = 0):
         self.balance = balance
-        pass
+
+        # positions are tracked per symbol, the balance is shared by all of them
+        self.positions = PositionBook()
+        # symbols the exchange holds a position in that the book does not know, not traded until they are flat
+        self.halted = set()
+
+    def get_open_positions_count(self) -> int:
+        return self.positions.get_open_count()
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import threading
+import time
+
+import aiohttp
+from binance import AsyncClient, BinanceSocketManager
+
+from src.account import Account
+from src.order_executor import OrderExecutor
+from src.position_book import PositionBook
+from src.utils import Utils
+
+
+class ListenKeyExpired(Exception):
+    pass
+
+
+class AccountStream:
+    asset = 'USDT'
+
+    # a listen key lives for 60 minutes without a keepalive
+    keepalive_period = 30 * 60
+    heartbeat = 60
+    drift_check_period = 10
+    # an order fill and its ACCOUNT_UPDATE can be a few seconds apart, only a lasting mismatch is drift
+    drift_checks = 3
+    min_reconcile_period = 30
+
+    def __init__(self, account: Account, order_executor: OrderExecutor = None, utils: Utils = None):
+        self.account = account
+        self.order_executor = order_executor
+        self.utils = utils
+
+        # symbol -> (position amount, entry price) as the exchange sees it
+        self.positions = {}
+        self.balance_time = 0
+        self.position_times = {}
+        self.drifts = {}
+        self.last_reconcile = 0.
+
+        self.listen_key = None
+        self.lock = threading.Lock()
+
+    def set_balance(self, balance: float, event_time: int):
+        # every reader sees a plain attribute, sizing never waits for the network
+        with self.lock:
+            if event_time < self.balance_time:
+                return
+
+            self.balance_time = event_time
+            self.account.balance = balance
+            self.account.synced = True
+
+    def set_position(self, s: str, amount: float, entry_price: float, event_time: int):
+        with self.lock:
+            if event_time < self.position_times.get(s, 0):
+                return
+
+            self.position_times[s] = event_time
+            self.positions[s] = (amount, entry_price)
+
+    def handle_account_update(self, event: dict):
+        event_time = event["E"]
+        update = event["a"]
+
+        for balance in update.get("B", []):
+            if balance["a"] == self.asset:
+                self.set_balance(float(balance["wb"]), event_time)
+
+        for position in update.get("P", []):
+            self.set_position(position["s"], float(position["pa"]), float(position["ep"]), event_time)
+
+    def handle_message(self, event: dict):
+        event_type = event.get("e")
+
+        if event_type == "ACCOUNT_UPDATE":
+            self.handle_account_update(event)
+        elif event_type == "ORDER_TRADE_UPDATE":
+            if self.order_executor is not None:
+                self.order_executor.handle_order_update(event)
+        elif event_type == "listenKeyExpired":
+            raise ListenKeyExpired
+
+    def apply_snapshot(self, balances: list, positions: list, snapshot_time: int):
+        # events that were queued while the snapshot was requested are older than it and are skipped
+        for balance in balances:
+            if balance["asset"] == self.asset:
+                self.set_balance(float(balance["balance"]), snapshot_time)
+
+        for position in positions:
+            self.set_position(
+                position["symbol"], float(position["positionAmt"]), float(position["entryPrice"]), snapshot_time
+            )
+
+        self.last_reconcile = time.monotonic()
+        self.drifts = {}
+
+    async def reconcile(self, client: AsyncClient):
+        snapshot_time = int(time.time() * 1000)
+
+        balances, positions = await asyncio.gather(
+            client.futures_account_balance(), client.futures_position_information()
+        )
+
+        self.apply_snapshot(balances, positions, snapshot_time)
+
+    def get_drift(self) -> list:
+        # symbols where the position book and the exchange disagree on the side of the position
+        positions = self.account.positions
+        drift = []
+
+        for s in set(positions.symbols) | set(self.positions):
+            if self.order_executor is not None and self.order_executor.is_pending(s):
+                continue
+
+            if s in self.account.halted:
+                continue
+
+            side = positions.side[positions.index[s]] if s in positions.index else PositionBook.FLAT
+            amount = self.positions.get(s, (0., 0.))[0]
+            exchange_side = PositionBook.LONG if amount > 0 else PositionBook.SHORT if amount < 0 else PositionBook.FLAT
+
+            if side != exchange_side:
+                drift.append(s)
+
+        return drift
+
+    def alert(self, s: str, message: str):
+        if self.utils is None:
+            print(f"Symbol: {s}, Exception ❗ Type: Account Drift, Message: {message}")
+            return
+
+        self.utils.print_log({"Symbol": s, "Exception": " ❗", "Reason": "Account Drift", "Message": message})
+
+    def correct_drift(self):
+        # right after a snapshot the exchange is the truth, a mismatch left is the book's
+        positions = self.account.positions
+
+        for s in sorted(self.get_drift()):
+            amount, entry_price = self.positions.get(s, (0., 0.))
+
+            row = positions.get_row(s)
+            positions.reset(row)
+            positions.last_orders[row] = []
+            positions.position_fee[row] = 0
+
+            if amount:
+                # a position the bot did not open is left to a human, the symbol is not traded meanwhile
+                self.account.halted.add(s)
+                self.alert(s, f"Halted, the exchange holds {amount} at {entry_price}")
+            else:
+                self.alert(s, "Closed in the book, the exchange is flat")
+
+    def resume_halted(self):
+        for s in sorted(self.account.halted):
+            if not self.positions.get(s, (0., 0.))[0]:
+                self.account.halted.discard(s)
+                self.alert(s, "Resumed, the exchange is flat")
+
+    async def keepalive(self, client: AsyncClient, connection):
+        while True:
+            await asyncio.sleep(self.keepalive_period)
+
+            try:
+                await client.futures_stream_keepalive(self.listen_key)
+            except Exception as e:
+                print(f"Exception ❗ Type: Listen Key Keepalive, Message: {e}")
+
+                # a new listen key means a new connection, closing this one gets there
+                await connection.close()
+                return
+
+    async def check_drift(self, client: AsyncClient):
+        while True:
+            await asyncio.sleep(self.drift_check_period)
+
+            self.resume_halted()
+
+            drift = self.get_drift()
+            self.drifts = {s: self.drifts.get(s, 0) + 1 for s in drift}
+
+            if not any(count >= self.drift_checks for count in self.drifts.values()):
+                continue
+
+            if time.monotonic() - self.last_reconcile < self.min_reconcile_period:
+                continue
+
+            print(f"Exception ❗ Type: Account Drift, Symbols: {', '.join(sorted(drift))}")
+
+            try:
+                await self.reconcile(client)
+            except Exception as e:
+                print(f"Exception ❗ Type: {type(e).__name__}, Reason: At reconcile, Message: {e}")
+                continue
+
+            self.correct_drift()
+
+    def get_stream_url(self, client: AsyncClient) -> str:
+        # the same base url the socket manager would pick for the client
+        if client.testnet:
+            return BinanceSocketManager.FSTREAM_TESTNET_URL + 'ws/'
+
+        return BinanceSocketManager.FSTREAM_URL.format(client.tld) + 'ws/'
+
+    async def stream(self, client: AsyncClient):
+        self.listen_key = await client.futures_stream_get_listen_key()
+        url = self.get_stream_url(client) + self.listen_key
+
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(url, heartbeat=self.heartbeat) as connection:
+                keepalive = asyncio.ensure_future(self.keepalive(client, connection))
+
+                try:
+                    # connected first, so nothing that happens during the snapshot is missed
+                    await self.reconcile(client)
+
+                    async for message in connection:
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            break
+
+                        self.handle_message(json.loads(message.data))
+                finally:
+                    keepalive.cancel()
+
+    async def run(self, client: AsyncClient):
+        drift = asyncio.ensure_future(self.check_drift(client))
+
+        try:
+            while True:
+                try:
+                    await self.stream(client)
+                except asyncio.CancelledError:
+                    raise
+                except ListenKeyExpired:
+                    print("Exception ❗ Type: User Data Websocket, Message: listen key expired")
+                except Exception as e:
+                    print(f"Exception ❗ Type: {type(e).__name__}, Message: {e}")
+
+                await asyncio.sleep(1)
+        finally:
+            drift.cancel()
@@ -0,0 +1,42 @@
+import numpy as np
+
+from src.kline_log import KlineLog
+
+
+class Bar:
+    __slots__ = ("values", "close_time", "ema9", "ema20", "ema50", "ema55", "atr14")
+
+    # the log layout without current_price, which comes with every tick instead
+    columns = KlineLog.headers[:-1]
+    column_index = {column: i for i, column in enumerate(columns)}
+
+    def __init__(self, values: list):
+        index = self.column_index
+
+        self.values = values
+        self.close_time = values[index["close_time"]]
+        self.ema9 = values[index["ema9"]]
+        self.ema20 = values[index["ema20"]]
+        self.ema50 = values[index["ema50"]]
+        self.ema55 = values[index["ema55"]]
+        self.atr14 = values[index["atr14"]]
+
+    @classmethod
+    def from_log_row(cls, row: list) -> tuple:
+        values = [float(value) if value != "" else float("nan") for value in row]
+
+        return cls(values[:-1]), values[-1]
+
+    @classmethod
+    def iterate_columns(cls, columns: dict, chunk_size: int = 4096):
+        # rows are unpacked a chunk at a time, so replays never hold a python copy of the whole log
+        rows = len(columns["close_time"])
+
+        for start in range(0, rows, chunk_size):
+            table = np.column_stack([columns[column][start:start + chunk_size] for column in KlineLog.headers])
+
+            for values in table.tolist():
+                yield cls(values[:-1]), values[-1]
+
+    def get(self, column: str) -> float:
+        return self.values[self.column_index[column]]
@@ -0,0 +1,135 @@
+import numpy as np
+
+from src.strategy import Strategy
+
+
+class BatchBacktest:
+    strategy: Strategy = None
+
+    min_chunk_size = 64
+    max_chunk_size = 65536
+
+    def __init__(self, strategy: Strategy):
+        self.strategy = strategy
+
+    def get_amplitude_valid(self, s: str, valid: np.ndarray, actual_amplitude: np.ndarray) -> np.ndarray:
+        setting = self.strategy.setting
+
+        if not setting.use_trailing_entry:
+            return np.abs(actual_amplitude) >= setting.get_symbol_parameters(s).amplitude
+
+        # trailing entry keeps state between events, so it has to see every valid bar in order
+        amplitude_valid = np.zeros(len(actual_amplitude), dtype=bool)
+        for i in np.flatnonzero(valid):
+            amplitude_valid[i] = self.strategy.is_amplitude_valid(s, float(actual_amplitude[i]))
+
+        return amplitude_valid
+
+    @classmethod
+    def find_exit(
+        cls, start: int, valid: np.ndarray, price: np.ndarray, long: bool,
+        stop_loss_price: float, take_profit_price: float
+    ):
+        chunk_size = cls.min_chunk_size
+        while start < len(price):
+            chunk = price[start:start + chunk_size]
+
+            if long:
+                hit = (chunk <= stop_loss_price) | (chunk >= take_profit_price)
+            else:
+                hit = (chunk >= stop_loss_price) | (chunk <= take_profit_price)
+
+            hit &= valid[start:start + chunk_size]
+
+            index = np.flatnonzero(hit)
+            if len(index):
+                return start + int(index[0])
+
+            start += chunk_size
+            chunk_size = min(chunk_size * 2, cls.max_chunk_size)
+
+        return None
+
+    def liquidate(self, close_time: float):
+        print(
+            f"Time: {self.strategy.format_time(close_time)}, "
+            f"LIQUIDATION! Balance: {self.strategy.account.balance:.5f}"
+        )
+
+        if self.strategy.liquidation_callback:
+            self.strategy.liquidation_callback(self.strategy)
+
+    def run(self, s: str, data: dict):
+        strategy = self.strategy
+        account = strategy.account
+        setting = strategy.setting
+
+        price = data['current_price']
+        close_time = data['close_time']
+
+        valid = ~(np.isnan(data['ema9']) | np.isnan(data['ema20']) | np.isnan(data['ema55']))
+        valid_index = np.flatnonzero(valid)
+
+        if not len(valid_index):
+            return
+
+        if account.balance <= 0:
+            self.liquidate(close_time[valid_index[0]])
+            return
+
+        actual_amplitude = strategy.get_percentage_difference(
+            price, data[setting.get_symbol_parameters(s).indicator]
+        )
+        amplitude_valid = self.get_amplitude_valid(s, valid, actual_amplitude)
+
+        above = (price > data['ema9']) & (price > data['ema20']) & (price > data['ema50'])
+        below = (price < data['ema9']) & (price < data['ema20']) & (price < data['ema50'])
+
+        short_entry = valid & above & (actual_amplitude > 0) & amplitude_valid
+        long_entry = valid & below & (actual_amplitude < 0) & amplitude_valid
+        entries = np.flatnonzero(short_entry | long_entry)
+
+        positions = account.positions
+        row = positions.get_row(s)
+
+        i = 0
+        while i < len(price):
+            if positions.side[row] != positions.FLAT:
+                long = bool(positions.side[row] == positions.LONG)
+                j = self.find_exit(
+                    i, valid, price, long, positions.stop_loss_price[row], positions.take_profit_price[row]
+                )
+                if j is None:
+                    return
+
+                strategy.manage_opened_position(
+                    s, float(price[j]),
+                    setting.DIRECTION_LONG if long else setting.DIRECTION_SHORT,
+                    float(close_time[j]), strategy.fix_atr(data['atr14'][j])
+                )
+                i = j + 1
+
+                if account.balance <= 0:
+                    k = np.searchsorted(valid_index, i)
+                    if k < len(valid_index):
+                        self.liquidate(close_time[valid_index[k]])
+                    return
+
+                continue
+
+            # positions held on other symbols do not change while this one is replayed
+            if positions.touches[row] != 0 or not strategy.can_open_position():
+                return
+
+            k = np.searchsorted(entries, i)
+            if k == len(entries):
+                return
+
+            j = int(entries[k])
+            strategy.open_position(
+                s, float(price[j]),
+                setting.DIRECTION_SHORT if short_entry[j] else setting.DIRECTION_LONG,
+                float(close_time[j]), strategy.fix_atr(data['atr14'][j]),
+                abs(float(actual_amplitude[j]))
+            )
+            i = j + 1
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+import aiohttp
+import numpy as np
+
+
+class WeightLimiter:
+    window = 60
+
+    def __init__(self, weight_per_minute: int):
+        self.weight_per_minute = weight_per_minute
+        self.used = deque()
+        self.paused_until = 0.
+
+    def get_used_weight(self, now: float) -> int:
+        while self.used and self.used[0][0] <= now - self.window:
+            self.used.popleft()
+
+        return sum(weight for _, weight in self.used)
+
+    async def acquire(self, weight: int):
+        while True:
+            now = time.monotonic()
+
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+
+            if self.get_used_weight(now) + weight <= self.weight_per_minute:
+                self.used.append((now, weight))
+                return
+
+            await asyncio.sleep(self.used[0][0] + self.window - now)
+
+    def update(self, used_weight: int):
+        # the exchange counts weight of every client on this ip, so trust its number over ours
+        if used_weight >= self.weight_per_minute:
+            self.paused_until = time.monotonic() + self.window - time.time() % self.window
+
+
+class KlineBootstrap:
+    base_url = "https://fapi.binance.com"
+    klines_path = "/fapi/v1/klines"
+
+    interval = "1m"
+    interval_ms = 60000
+    limit = 1500
+
+    # half of the futures ip limit, the running bot needs the rest
+    weight_per_minute = 1200
+    max_concurrent_requests = 8
+    max_retries = 5
+    retry_delay = 0.25
+    # how long one symbol may keep failing before it is left out
+    retry_budget = 10
+    request_timeout = 5
+
+    def __init__(self, base_url: str = None):
+        self.base_url = base_url or os.getenv("BINANCE_FUTURES_URL") or self.base_url
+        self.limiter = WeightLimiter(self.weight_per_minute)
+        self.requests = None
+
+    @staticmethod
+    def get_request_weight(limit: int) -> int:
+        if limit < 100:
+            return 1
+        elif limit < 500:
+            return 2
+        elif limit <= 1000:
+            return 5
+
+        return 10
+
+    async def get_klines(self, session: aiohttp.ClientSession, s: str, start_ms: int, end_ms: int) -> list:
+        params = {"symbol": s, "interval": self.interval, "startTime": start_ms, "endTime": end_ms, "limit": self.limit}
+        failing_since = None
+
+        for attempt in range(self.max_retries):
+            await self.limiter.acquire(self.get_request_weight(self.limit))
+
+            requested = time.monotonic()
+            try:
+                async with self.requests:
+                    async with session.get(self.base_url + self.klines_path, params=params) as response:
+                        if "X-MBX-USED-WEIGHT-1M" in response.headers:
+                            self.limiter.update(int(response.headers["X-MBX-USED-WEIGHT-1M"]))
+
+                        if response.status in (418, 429):
+                            # the ip is rate limited, every symbol waits the same, so it is not this symbol failing
+                            await asyncio.sleep(int(response.headers.get("Retry-After", 2 ** attempt)))
+                            continue
+
+                        if response.status < 500:
+                            response.raise_for_status()
+
+                            return await response.json()
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                # a dropped connection or a slow answer is worth another try, a 4xx is not
+                print(f"Symbol: {s}, Exception ❗ Type: {type(e).__name__}, Message: {e}")
+
+            retry_after = self.retry_delay * 2 ** attempt
+
+            # a symbol that keeps failing is dropped quickly, the startup of the others waits for it,
+            # so a retry that could time out past the budget is not made
+            failing_since = failing_since or requested
+            if time.monotonic() + retry_after + self.request_timeout - failing_since > self.retry_budget:
+                break
+
+            await asyncio.sleep(retry_after)
+
+        raise aiohttp.ClientError(f"Too many retries for {s} klines")
+
+    async def fetch_symbol(self, session: aiohttp.ClientSession, s: str, start_ms: int, end_ms: int) -> tuple:
+        started = time.monotonic()
+        chunks = []
+        requests = 0
+
+        cursor = start_ms
+        try:
+            while cursor <= end_ms:
+                klines = await self.get_klines(session, s, cursor, end_ms)
+                requests += 1
+
+                if not klines:
+                    break
+
+                # numbers come as json ints and strings, numpy parses both
+                chunks.append(np.array(klines, dtype=np.float64))
+
+                if len(klines) < self.limit:
+                    break
+
+                cursor = int(klines[-1][0]) + self.interval_ms
+        except Exception as e:
+            # only this symbol goes without history, the others still start
+            print(f"Symbol: {s}, Exception ❗ Type: {type(e).__name__}, Reason: At bootstrap, Message: {e}")
+
+            return s, None, requests, time.monotonic() - started
+
+        table = np.concatenate(chunks) if chunks else np.empty((0, 12))
+
+        return s, table, requests, time.monotonic() - started
+
+    async def fetch(self, starts: dict, end_ms: int) -> dict:
+        self.requests = asyncio.Semaphore(self.max_concurrent_requests)
+        symbols = list(starts)
+
+        started = time.monotonic()
+        tables = {}
+
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            for i, task in enumerate(asyncio.as_completed(
+                [self.fetch_symbol(session, s, starts[s], end_ms) for s in symbols]
+            ), 1):
+                s, table, requests, elapsed = await task
+
+                if table is None:
+                    print(f"Bootstrap [{i}/{len(symbols)}] Symbol: {s}, Failed")
+                    continue
+
+                tables[s] = table
+
+                print(
+                    f"Bootstrap [{i}/{len(symbols)}] Symbol: {s}, Rows: {len(table)}, "
+                    f"Requests: {requests}, Time: {elapsed:.2f}s"
+                )
+
+        print(f"Bootstrap of {len(tables)}/{len(symbols)} symbols took {time.monotonic() - started:.2f}s")
+
+        return tables
@@ -0,0 +1,91 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import binance
+
+
+class ExchangeMetadata:
+    path = 'cache/exchange'
+
+    # symbol filters and leverage brackets change a few times a month at most
+    ttl = 6 * 60 * 60
+    max_workers = 8
+
+    def __init__(self, client: binance.Client, path: str = None, ttl: int = None):
+        self.client = client
+
+        if path:
+            self.path = path
+
+        if ttl is not None:
+            self.ttl = ttl
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def get_file(self, name: str) -> str:
+        return os.path.join(self.path, f'{name}.json')
+
+    def load(self, name: str, fetch: callable) -> dict:
+        file = self.get_file(name)
+
+        if os.path.isfile(file) and time.time() - os.path.getmtime(file) < self.ttl:
+            with open(file, 'r') as in_file:
+                return json.load(in_file)
+
+        data = fetch()
+
+        # written aside and renamed, a crash never leaves half a cache behind
+        temporary_file = file + '.tmp'
+        with open(temporary_file, 'w') as out_file:
+            json.dump(data, out_file)
+
+        os.replace(temporary_file, file)
+
+        return data
+
+    def fetch_symbols_info(self) -> dict:
+        # indexed by symbol in one pass, later duplicates win like the old filter did
+        return {info['symbol']: info for info in self.client.futures_exchange_info()['symbols']}
+
+    def fetch_leverage_brackets(self) -> dict:
+        brackets = {}
+
+        for info in self.client.futures_leverage_bracket():
+            info['brackets'].sort(key=lambda x: x['initialLeverage'], reverse=True)
+            brackets[info['symbol']] = info['brackets']
+
+        return brackets
+
+    def get_symbols_info(self) -> dict:
+        return self.load('exchange_info', self.fetch_symbols_info)
+
+    def get_leverage_brackets(self) -> dict:
+        return self.load('leverage_brackets', self.fetch_leverage_brackets)
+
+    def get_current_leverage(self) -> dict:
+        # per account and cheap, never cached
+        return {
+            position['symbol']: int(position['leverage'])
+            for position in self.client.futures_position_information()
+        }
+
+    def change_leverage(self, targets: dict) -> list:
+        current = self.get_current_leverage()
+        changes = [(s, leverage) for s, leverage in targets.items() if current.get(s) != leverage]
+
+        if not changes:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self.client.futures_change_leverage, symbol=s, leverage=leverage)
+                for s, leverage in changes
+            ]
+
+            # the first failure is raised, like the serial calls did
+            for future in futures:
+                future.result()
+
+        return [s for s, _ in changes]
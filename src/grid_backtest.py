@@ -0,0 +1,231 @@
+import copy
+
+import numpy as np
+
+from src.account import Account
+from src.batch_backtest import BatchBacktest
+from src.strategy import Strategy
+
+
+class GridBacktest:
+    strategy: Strategy = None
+
+    FLAT = 0
+    LONG = 1
+    SHORT = -1
+
+    def __init__(self, strategy: Strategy):
+        self.strategy = strategy
+
+    def run_each(self, s: str, data: dict, amplitudes: list) -> dict:
+        # trailing entry keeps amplitude state between bars, so every combination gets its own replay
+        result = {"balance": [], "wins": [], "loses": [], "trailing_loses": []}
+
+        for amplitude in amplitudes:
+            setting = copy.copy(self.strategy.setting)
+            setting.ema_amplitude = amplitude
+            setting.wins = setting.loses = setting.trailing_loses = 0
+
+            strategy = Strategy(Account(self.strategy.account.balance), setting)
+            BatchBacktest(strategy).run(s, data)
+
+            result["balance"].append(strategy.account.balance)
+            result["wins"].append(setting.wins)
+            result["loses"].append(setting.loses)
+            result["trailing_loses"].append(setting.trailing_loses)
+
+        return {key: np.array(value) for key, value in result.items()}
+
+    def run(self, s: str, data: dict, amplitudes: list) -> dict:
+        strategy = self.strategy
+        setting = strategy.setting
+
+        if setting.use_trailing_entry:
+            return self.run_each(s, data, amplitudes)
+
+        amplitudes = np.asarray(amplitudes, dtype=np.float64)
+        k = len(amplitudes)
+
+        price = data['current_price']
+        n = len(price)
+
+        valid = ~(np.isnan(data['ema9']) | np.isnan(data['ema20']) | np.isnan(data['ema55']))
+        atr = np.where(data['atr14'] >= setting.max_atr_value, data['atr14'] / 2, data['atr14'])
+
+        actual_amplitude = strategy.get_percentage_difference(price, data[setting.get_symbol_parameters(s).indicator])
+
+        above = (price > data['ema9']) & (price > data['ema20']) & (price > data['ema50'])
+        below = (price < data['ema9']) & (price < data['ema20']) & (price < data['ema50'])
+
+        short_entry = valid & above & (actual_amplitude > 0)
+        long_entry = valid & below & (actual_amplitude < 0)
+
+        candidates = np.flatnonzero(short_entry | long_entry)
+        candidate_amplitude = np.abs(actual_amplitude[candidates])
+        entries = [candidates[candidate_amplitude >= amplitude] for amplitude in amplitudes]
+
+        self.leverage = strategy.get_symbol_leverage(s)
+
+        # one independent account per amplitude, advanced together
+        self.balance = np.full(k, float(strategy.account.balance))
+        self.side = np.zeros(k, dtype=np.int8)
+        self.entry_price = np.zeros(k)
+        self.stop_loss_price = np.zeros(k)
+        self.take_profit_price = np.zeros(k)
+        self.asset_size = np.zeros(k)
+        self.position_size = np.zeros(k)
+        self.position_fee = np.zeros(k)
+        self.orders_position_size = np.zeros(k)
+        self.orders_asset_size = np.zeros(k)
+        self.touches = np.zeros(k, dtype=np.int64)
+        self.wins = np.zeros(k, dtype=np.int64)
+        self.loses = np.zeros(k, dtype=np.int64)
+        self.trailing_loses = np.zeros(k, dtype=np.int64)
+
+        next_event = np.full(k, n)
+        for j in range(k):
+            if self.balance[j] > 0 and len(entries[j]):
+                next_event[j] = entries[j][0]
+
+        while True:
+            t = int(next_event.min())
+            if t >= n:
+                break
+
+            group = np.flatnonzero(next_event == t)
+            current_price = float(price[t])
+
+            side = self.side[group]
+
+            for direction in (self.LONG, self.SHORT):
+                managing = group[side == direction]
+                if len(managing):
+                    self.manage_positions(managing, current_price, direction == self.LONG, float(atr[t]))
+
+            opening = group[side == self.FLAT]
+            if len(opening):
+                self.open_positions(opening, current_price, bool(long_entry[t]), float(atr[t]))
+
+            side = self.side[group]
+
+            flat = group[side == self.FLAT]
+            next_event[flat[self.balance[flat] <= 0]] = n
+
+            for j in flat[self.balance[flat] > 0].tolist():
+                i = np.searchsorted(entries[j], t + 1)
+                next_event[j] = entries[j][i] if i < len(entries[j]) else n
+
+            # states that share a side and stop/take prices leave the position on the same bar
+            opened = group[side != self.FLAT]
+            exits = {}
+            for j, key in zip(opened.tolist(), zip(
+                self.side[opened].tolist(), self.stop_loss_price[opened].tolist(), self.take_profit_price[opened].tolist()
+            )):
+                if key not in exits:
+                    exit_index = BatchBacktest.find_exit(t + 1, valid, price, key[0] == self.LONG, key[1], key[2])
+                    exits[key] = n if exit_index is None else exit_index
+
+                next_event[j] = exits[key]
+
+        return {
+            "balance": self.balance,
+            "wins": self.wins,
+            "loses": self.loses,
+            "trailing_loses": self.trailing_loses,
+        }
+
+    def get_entry_position_size(self, g: np.ndarray, high_risk: bool = False) -> np.ndarray:
+        setting = self.strategy.setting
+        risk = setting.high_risk_per_trade if high_risk else setting.low_risk_per_trade
+
+        size = (self.balance[g] * risk) * self.leverage
+        fee = size - (size * (1 - setting.taker_fee))
+
+        self.position_fee[g] += fee
+
+        return size - fee
+
+    def set_stop_and_take(self, g: np.ndarray, long: bool, atr: float, stop_loss: float, take_profit: float):
+        entry_price = self.entry_price[g]
+
+        if long:
+            self.stop_loss_price[g] = entry_price * (1 - stop_loss) * (1 - atr)
+            self.take_profit_price[g] = entry_price * (1 + take_profit) * (1 + atr)
+        else:
+            self.stop_loss_price[g] = entry_price * (1 + stop_loss) * (1 + atr)
+            self.take_profit_price[g] = entry_price * (1 - take_profit) * (1 - atr)
+
+    def open_positions(self, g: np.ndarray, current_price: float, long: bool, atr: float):
+        setting = self.strategy.setting
+
+        self.side[g] = self.LONG if long else self.SHORT
+        self.entry_price[g] = current_price
+        self.position_size[g] = self.get_entry_position_size(g)
+        self.asset_size[g] = self.position_size[g] / current_price
+
+        self.touches[g] = 1
+        self.orders_position_size[g] = self.position_size[g]
+        self.orders_asset_size[g] = self.asset_size[g]
+
+        self.set_stop_and_take(g, long, atr, setting.stop_loss, setting.take_profit)
+
+    def manage_positions(self, g: np.ndarray, current_price: float, long: bool, atr: float):
+        setting = self.strategy.setting
+
+        if long:
+            exit_condition = current_price <= self.stop_loss_price[g]
+        else:
+            exit_condition = current_price >= self.stop_loss_price[g]
+
+        exit_price = np.where(exit_condition, self.stop_loss_price[g], self.take_profit_price[g])
+
+        entry_price = self.entry_price[g]
+        position_size = self.position_size[g]
+        rate = (exit_price / entry_price) if long else (entry_price / exit_price)
+        pnl = (rate * position_size) - position_size
+
+        trailing = (pnl >= 0) & (self.touches[g] <= setting.max_trailing_takes)
+
+        self.close_positions(g[~trailing], pnl[~trailing])
+
+        g = g[trailing]
+        if not len(g):
+            return
+
+        increase_position_size = self.get_entry_position_size(g, True)
+        increase_asset_size = increase_position_size / current_price
+
+        self.orders_position_size[g] += increase_position_size
+        self.orders_asset_size[g] += increase_asset_size
+        self.touches[g] += 1
+        self.entry_price[g] = self.orders_position_size[g] / self.orders_asset_size[g]
+
+        self.position_size[g] += increase_position_size
+        self.asset_size[g] += increase_asset_size
+
+        self.set_stop_and_take(g, long, atr, setting.trailing_stop_loss, setting.trailing_take_profit)
+
+    def close_positions(self, g: np.ndarray, pnl: np.ndarray):
+        if not len(g):
+            return
+
+        setting = self.strategy.setting
+
+        loss = pnl <= 0
+        trailing = self.touches[g] > 1
+
+        self.trailing_loses[g[loss & trailing]] += 1
+        self.loses[g[loss & ~trailing]] += 1
+        self.wins[g[~loss]] += 1
+
+        position_size = self.position_size[g]
+        self.position_fee[g] += position_size - (position_size * (1 - setting.maker_fee))
+        self.balance[g] += pnl - self.position_fee[g]
+
+        self.side[g] = self.FLAT
+        self.stop_loss_price[g] = 0
+        self.take_profit_price[g] = 0
+        self.touches[g] = 0
+        self.position_size[g] = 0
+        self.asset_size[g] = 0
+        self.position_fee[g] = 0
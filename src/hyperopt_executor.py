@@ -0,0 +1,132 @@
+import datetime
+import os
+import shutil
+from multiprocessing import Pool
+
+from src.account import Account
+from src.grid_backtest import GridBacktest
+from src.kline_log import KlineLog, KlineLogWriter
+from src.setting import Setting
+from src.strategy import Strategy
+
+# memory-mapped logs, opened once per worker process
+shared_columns = {}
+
+
+def share_log(task: tuple) -> tuple:
+    path, symbol, cache_path, from_date = task
+
+    # binary logs are memory-mapped as they are, csv logs are parsed once into the same format
+    if not path.endswith(KlineLog.binary_extension):
+        data = KlineLog.read_csv(path, from_date)
+
+        path = os.path.join(cache_path, symbol + KlineLog.binary_extension)
+
+        # the writer appends, whatever a killed run left behind would double every row
+        shutil.rmtree(path, ignore_errors=True)
+        KlineLogWriter(path).write_columns(data)
+
+    return symbol, path, len(KlineLog.read_binary(path, from_date)['close_time'])
+
+
+def get_shared_columns(symbol: str, path: str, from_date: float = None) -> dict:
+    if symbol not in shared_columns:
+        shared_columns[symbol] = KlineLog.read_binary(path, from_date)
+
+    return shared_columns[symbol]
+
+
+def run_task(task: tuple) -> tuple:
+    index, symbol, indicator, amplitudes, balance, path, from_date = task
+
+    account = Account(balance)
+    setting = Setting()
+    setting.is_back_test = True
+    setting.is_hyperopt = True
+    setting.indicator = indicator
+
+    # every amplitude of the indicator is evaluated in a single pass over the log
+    result = GridBacktest(Strategy(account, setting)).run(symbol, get_shared_columns(symbol, path, from_date), amplitudes)
+
+    return index, symbol, indicator, list(zip(
+        amplitudes, result["balance"].tolist(), result["wins"].tolist(),
+        result["loses"].tolist(), result["trailing_loses"].tolist()
+    ))
+
+
+class SerialPool:
+    # the tasks of a pool run one by one in the calling process, where a profiler can sample them
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # dropped like the mapped logs of an exiting worker
+        shared_columns.clear()
+
+    @staticmethod
+    def imap_unordered(func: callable, iterable, chunksize: int = 1):
+        return map(func, iterable)
+
+
+def create_pool(processes: int):
+    return Pool(processes=processes) if processes else SerialPool()
+
+
+class HyperoptExecutor:
+    cache_path = 'cache/hyperopt'
+    chunk_size = 1
+
+    def __init__(self, processes: int, balance: float, from_date: float = None):
+        self.processes = processes
+        self.balance = balance
+        self.from_date = from_date
+
+    def create_tasks(self, paths: dict, indicators: list, amplitudes: list) -> list:
+        tasks = []
+
+        # grouped by symbol, so a worker keeps hitting the same mapped file
+        for symbol in sorted(paths):
+            for indicator in indicators:
+                tasks.append((len(tasks), symbol, indicator, amplitudes, self.balance, paths[symbol], self.from_date))
+
+        return tasks
+
+    def run(self, log_files: dict, indicators: list, amplitudes: list) -> dict:
+        os.makedirs(self.cache_path, exist_ok=True)
+
+        best = {}
+
+        try:
+            with create_pool(self.processes) as pool:
+                paths = {}
+                for symbol, path, rows in pool.imap_unordered(share_log, [
+                    (path, symbol, self.cache_path, self.from_date) for symbol, path in log_files.items()
+                ]):
+                    print(f'Shared symbol {symbol}, rows {rows}')
+                    paths[symbol] = path
+
+                tasks = self.create_tasks(paths, indicators, amplitudes)
+                results = [None] * len(tasks)
+
+                for i, result in enumerate(pool.imap_unordered(run_task, tasks, chunksize=self.chunk_size), 1):
+                    results[result[0]] = result
+
+                    if i % 10 == 0 or i == len(tasks):
+                        print(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), f'Tasks {i}/{len(tasks)}')
+        finally:
+            shutil.rmtree(self.cache_path, ignore_errors=True)
+
+        # reduce in task order, so ties resolve to the first combination like the serial search
+        for _, symbol, indicator, table in results:
+            for amplitude, balance, wins, loses, trailing_loses in table:
+                if balance > best.get(symbol, {"balance": self.balance})["balance"]:
+                    best[symbol] = {
+                        "indicator": indicator,
+                        "amplitude": amplitude,
+                        "balance": balance,
+                        "wins": wins,
+                        "loses": loses,
+                        "trailing_loses": trailing_loses,
+                    }
+
+        return best
@@ -0,0 +1,195 @@
+import math
+from collections import deque
+
+
+class Ema:
+    # pandas_ta ema: seeded with the sma of the first `length` closes, then ewm(span=length, adjust=False)
+    __slots__ = ("length", "alpha", "count", "total", "value")
+
+    def __init__(self, length: int):
+        self.length = length
+        self.alpha = 2 / (length + 1)
+        self.count = 0
+        self.total = 0.
+        self.value = math.nan
+
+    def copy(self):
+        other = Ema(self.length)
+        other.count = self.count
+        other.total = self.total
+        other.value = self.value
+
+        return other
+
+    def update(self, close: float) -> float:
+        self.count += 1
+
+        if self.count < self.length:
+            self.total += close
+        elif self.count == self.length:
+            self.total += close
+            self.value = self.total / self.length
+        else:
+            self.value = self.alpha * close + (1 - self.alpha) * self.value
+
+        return self.value
+
+
+class Wma:
+    __slots__ = ("length", "weight", "window", "value")
+
+    def __init__(self, length: int):
+        self.length = length
+        self.weight = length * (length + 1) / 2
+        self.window = deque(maxlen=length)
+        self.value = math.nan
+
+    def copy(self):
+        other = Wma(self.length)
+        other.window.extend(self.window)
+        other.value = self.value
+
+        return other
+
+    def update(self, close: float) -> float:
+        self.window.append(close)
+
+        if len(self.window) == self.length:
+            self.value = sum(i * value for i, value in enumerate(self.window, 1)) / self.weight
+
+        return self.value
+
+
+class Rma:
+    # pandas_ta rma: ewm(alpha=1 / length, min_periods=length) with the default adjust=True
+    __slots__ = ("length", "decay", "count", "numerator", "denominator", "value")
+
+    def __init__(self, length: int):
+        self.length = length
+        self.decay = 1 - 1 / length
+        self.count = 0
+        self.numerator = 0.
+        self.denominator = 0.
+        self.value = math.nan
+
+    def copy(self):
+        other = Rma(self.length)
+        other.count = self.count
+        other.numerator = self.numerator
+        other.denominator = self.denominator
+        other.value = self.value
+
+        return other
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        self.numerator = value + self.decay * self.numerator
+        self.denominator = 1 + self.decay * self.denominator
+
+        if self.count >= self.length:
+            self.value = self.numerator / self.denominator
+
+        return self.value
+
+
+class Atr:
+    __slots__ = ("rma", "previous_close")
+
+    def __init__(self, length: int):
+        self.rma = Rma(length)
+        self.previous_close = math.nan
+
+    def copy(self):
+        other = Atr(self.rma.length)
+        other.rma = self.rma.copy()
+        other.previous_close = self.previous_close
+
+        return other
+
+    def update(self, high: float, low: float, close: float) -> float:
+        previous_close, self.previous_close = self.previous_close, close
+
+        # true range is undefined for the very first candle
+        if math.isnan(previous_close):
+            return self.rma.value
+
+        return self.rma.update(max(high - low, abs(high - previous_close), abs(previous_close - low)))
+
+
+class Rsi:
+    __slots__ = ("positive", "negative", "previous_close", "value")
+
+    def __init__(self, length: int):
+        self.positive = Rma(length)
+        self.negative = Rma(length)
+        self.previous_close = math.nan
+        self.value = math.nan
+
+    def copy(self):
+        other = Rsi(self.positive.length)
+        other.positive = self.positive.copy()
+        other.negative = self.negative.copy()
+        other.previous_close = self.previous_close
+        other.value = self.value
+
+        return other
+
+    def update(self, close: float) -> float:
+        previous_close, self.previous_close = self.previous_close, close
+
+        if math.isnan(previous_close):
+            return self.value
+
+        diff = close - previous_close
+        positive = self.positive.update(max(diff, 0.))
+        negative = abs(self.negative.update(min(diff, 0.)))
+
+        if not math.isnan(positive):
+            self.value = 100 * positive / (positive + negative) if positive + negative else math.nan
+
+        return self.value
+
+
+class IndicatorEngine:
+    ema_lengths = (5, 9, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 90)
+    wma_length = 14
+    atr_length = 14
+    rsi_length = 14
+
+    columns = [f"ema{length}" for length in ema_lengths] + ["wma14", "atr14", "rsi14"]
+
+    def __init__(self):
+        self.emas = [Ema(length) for length in self.ema_lengths]
+        self.wma = Wma(self.wma_length)
+        self.atr = Atr(self.atr_length)
+        self.rsi = Rsi(self.rsi_length)
+
+        self.open_time = None
+        self.previous = None
+
+    def snapshot(self) -> tuple:
+        return [ema.copy() for ema in self.emas], self.wma.copy(), self.atr.copy(), self.rsi.copy()
+
+    def restore(self, snapshot: tuple):
+        emas, wma, atr, rsi = snapshot
+
+        self.emas = [ema.copy() for ema in emas]
+        self.wma = wma.copy()
+        self.atr = atr.copy()
+        self.rsi = rsi.copy()
+
+    def update(self, open_time: int, high: float, low: float, close: float) -> list:
+        # a candle with the same open time is a refreshed (not yet closed) candle,
+        # so roll back to the state before it instead of counting it twice
+        if open_time == self.open_time:
+            self.restore(self.previous)
+        else:
+            self.previous = self.snapshot()
+            self.open_time = open_time
+
+        values = [ema.update(close) for ema in self.emas]
+        values.append(self.wma.update(close))
+        values.append(self.atr.update(high, low, close))
+        values.append(self.rsi.update(close))
+
+        return values
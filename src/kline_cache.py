@@ -0,0 +1,115 @@
+import glob
+import os
+import time
+
+import numpy as np
+
+
+class KlineCache:
+    path = 'cache/klines'
+    columns = 12
+    interval_ms = {'1m': 60000}
+
+    # the bot needs history since yesterday 00:00, anything older is dead weight
+    max_age = 3 * 24 * 60 * 60
+    max_rows = 5 * 24 * 60
+    max_total_size = 256 * 1024 * 1024
+
+    def __init__(self, path: str = None):
+        if path:
+            self.path = path
+
+        os.makedirs(self.path, exist_ok=True)
+
+        self.last_open_time = {}
+
+    def get_file(self, s: str, interval: str) -> str:
+        return os.path.join(self.path, f'{s}-{interval}.bin')
+
+    def check(self, table: np.ndarray) -> np.ndarray:
+        # duplicates keep the latest written candle, sorted by open time
+        if not len(table):
+            return table
+
+        _, last = np.unique(table[::-1, 0], return_index=True)
+
+        return table[::-1][last]
+
+    def load(self, s: str, interval: str) -> np.ndarray:
+        file = self.get_file(s, interval)
+        if not os.path.isfile(file):
+            self.last_open_time[(s, interval)] = None
+            return np.empty((0, self.columns))
+
+        raw = np.fromfile(file, dtype='<f8')
+        # a torn append leaves a partial row at the end
+        stored = raw[:len(raw) - len(raw) % self.columns].reshape(-1, self.columns)
+
+        table = self.check(stored)
+        table = table[table[:, 0] >= (time.time() - self.max_age) * 1000][-self.max_rows:]
+
+        if len(table) != len(stored) or len(raw) % self.columns:
+            self.write(file, table)
+
+        self.last_open_time[(s, interval)] = table[-1, 0] if len(table) else None
+
+        return table
+
+    def write(self, file: str, table: np.ndarray):
+        temporary_file = file + '.tmp'
+        table.astype('<f8').tofile(temporary_file)
+        os.replace(temporary_file, file)
+
+    def store(self, s: str, interval: str, table: np.ndarray, now_ms: float = None):
+        now_ms = now_ms or time.time() * 1000
+
+        # only closed candles, and only the ones after what is already cached
+        table = table[table[:, 6] < now_ms]
+
+        last_open_time = self.last_open_time.get((s, interval))
+        if last_open_time is not None:
+            table = table[table[:, 0] > last_open_time]
+
+        if not len(table):
+            return
+
+        # a gap the exchange has no candles for stays a gap, the history before it is kept
+        with open(self.get_file(s, interval), 'ab') as out_file:
+            out_file.write(table.astype('<f8').tobytes())
+
+        self.last_open_time[(s, interval)] = table[-1, 0]
+
+    def merge(self, s: str, interval: str, table: np.ndarray, now_ms: float = None):
+        # a range fetched from before the first cached candle, store would only keep what is after the last one
+        now_ms = now_ms or time.time() * 1000
+
+        table = self.check(np.concatenate([self.load(s, interval), table[table[:, 6] < now_ms]]))[-self.max_rows:]
+
+        self.write(self.get_file(s, interval), table)
+        self.last_open_time[(s, interval)] = table[-1, 0] if len(table) else None
+
+    def get_next_open_time(self, s: str, interval: str):
+        last_open_time = self.last_open_time.get((s, interval))
+
+        return None if last_open_time is None else int(last_open_time) + self.interval_ms[interval]
+
+    def evict(self):
+        now = time.time()
+        files = []
+
+        for file in glob.glob(os.path.join(self.path, '*.bin')):
+            modified = os.path.getmtime(file)
+
+            if modified < now - self.max_age:
+                os.remove(file)
+            else:
+                files.append((modified, os.path.getsize(file), file))
+
+        total_size = sum(size for _, size, _ in files)
+
+        for _, size, file in sorted(files):
+            if total_size <= self.max_total_size:
+                break
+
+            os.remove(file)
+            total_size -= size
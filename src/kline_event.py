@@ -0,0 +1,33 @@
+class KlineEvent:
+    __slots__ = (
+        "symbol", "start_time", "close_time", "open", "high", "low", "close", "volume", "trades", "is_closed"
+    )
+
+    def __init__(self):
+        self.symbol = None
+        self.start_time = 0
+        self.close_time = 0
+        self.open = 0.
+        self.high = 0.
+        self.low = 0.
+        self.close = 0.
+        self.volume = 0.
+        self.trades = 0
+        self.is_closed = False
+
+    def decode(self, event: dict) -> "KlineEvent":
+        # fills this instance in place, the socket loop keeps one per symbol
+        kline = event["k"]
+
+        self.symbol = event["ps"]
+        self.start_time = kline["t"]
+        self.close_time = kline["T"]
+        self.open = float(kline["o"])
+        self.high = float(kline["h"])
+        self.low = float(kline["l"])
+        self.close = float(kline["c"])
+        self.volume = float(kline["v"])
+        self.trades = kline["n"]
+        self.is_closed = kline["x"]
+
+        return self
@@ -0,0 +1,174 @@
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+class KlineLogIndex:
+    extension = '.idx'
+    block_size = 4096
+    read_size = 1 << 22
+    fingerprint_size = 4096
+
+    def __init__(self, path: str, block_size: int = None):
+        self.path = path
+        self.index_path = path + self.extension
+
+        if block_size:
+            self.block_size = block_size
+
+        self.header = None
+        self.rows = np.empty(0, dtype=np.int64)
+        self.offsets = np.empty(0, dtype=np.int64)
+        self.min_close_time = np.empty(0)
+        self.max_close_time = np.empty(0)
+        self.total_rows = 0
+        self.size = 0
+        self.fingerprint = 0
+
+    def get_fingerprint(self) -> int:
+        # a rewritten log starts differently, an appended one does not
+        with open(self.path, 'rb') as in_file:
+            return zlib.crc32(in_file.read(self.fingerprint_size))
+
+    def get_header(self) -> list:
+        with open(self.path, 'r') as in_file:
+            return in_file.readline().rstrip('\r\n').split(',')
+
+    def load(self) -> bool:
+        if not os.path.isfile(self.index_path):
+            return False
+
+        with np.load(self.index_path) as index:
+            size, total_rows, block_size, fingerprint = index['meta'].tolist()
+
+            if block_size != self.block_size:
+                return False
+
+            self.rows = index['rows']
+            self.offsets = index['offsets']
+            self.min_close_time = index['min_close_time']
+            self.max_close_time = index['max_close_time']
+
+        self.size = size
+        self.total_rows = total_rows
+        self.fingerprint = fingerprint
+
+        return True
+
+    def save(self):
+        temporary_path = self.index_path + '.tmp'
+
+        with open(temporary_path, 'wb') as out_file:
+            np.savez(
+                out_file,
+                rows=self.rows,
+                offsets=self.offsets,
+                min_close_time=self.min_close_time,
+                max_close_time=self.max_close_time,
+                meta=np.array([self.size, self.total_rows, self.block_size, self.fingerprint], dtype=np.int64),
+            )
+
+        os.replace(temporary_path, self.index_path)
+
+    def scan(self, start_row: int, start_offset: int, size: int) -> tuple:
+        # block starts are every block_size-th line start, lines are found by their line breaks
+        offsets = [np.array([start_offset], dtype=np.int64)]
+        row = start_row
+        last = b'\n'
+
+        with open(self.path, 'rb') as in_file:
+            in_file.seek(start_offset)
+            position = start_offset
+
+            while position < size:
+                block = in_file.read(min(self.read_size, size - position))
+                if not block:
+                    break
+
+                breaks = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10) + position
+                numbers = row + np.arange(1, len(breaks) + 1)
+
+                starts = breaks[numbers % self.block_size == 0] + 1
+                offsets.append(starts[starts < size])
+
+                row += len(breaks)
+                position += len(block)
+                last = block[-1:]
+
+        # a last line without a line break is still a row
+        total_rows = row + (last != b'\n' and position > start_offset)
+
+        return np.concatenate(offsets), total_rows
+
+    def scan_close_time(self, start_offset: int, blocks: int) -> tuple:
+        min_close_time = np.full(blocks, np.inf)
+        max_close_time = np.full(blocks, np.inf)
+
+        with open(self.path, 'rb') as in_file:
+            in_file.seek(start_offset)
+
+            chunks = pd.read_csv(
+                in_file, header=None, names=self.header, usecols=['close_time'], dtype=np.float64,
+                chunksize=self.block_size
+            )
+
+            # reading starts on a block boundary, so every chunk is exactly one block
+            for i, chunk in enumerate(chunks):
+                if i == blocks:
+                    break
+
+                close_time = chunk['close_time'].to_numpy()
+                if len(close_time) and not np.isnan(close_time).all():
+                    min_close_time[i] = np.nanmin(close_time)
+                    max_close_time[i] = np.nanmax(close_time)
+
+        return min_close_time, max_close_time
+
+    def update(self) -> "KlineLogIndex":
+        self.header = self.get_header()
+
+        size = os.path.getsize(self.path)
+        fingerprint = self.get_fingerprint()
+
+        if self.load() and self.fingerprint == fingerprint and self.size <= size:
+            if self.size == size:
+                return self
+
+            # appended since the last time, the last block may have been partial
+            keep = len(self.offsets) - 1
+        else:
+            keep = 0
+
+        if keep:
+            start_row, start_offset = int(self.rows[keep]), int(self.offsets[keep])
+        else:
+            with open(self.path, 'rb') as in_file:
+                start_row, start_offset = 0, len(in_file.readline())
+
+        offsets, self.total_rows = self.scan(start_row, start_offset, size)
+
+        if start_offset < size:
+            min_close_time, max_close_time = self.scan_close_time(start_offset, len(offsets))
+        else:
+            min_close_time, max_close_time = np.full(len(offsets), np.inf), np.full(len(offsets), np.inf)
+
+        self.offsets = np.concatenate([self.offsets[:keep], offsets])
+        self.rows = np.concatenate([self.rows[:keep], start_row + np.arange(len(offsets)) * self.block_size])
+        self.min_close_time = np.concatenate([self.min_close_time[:keep], min_close_time])
+        self.max_close_time = np.concatenate([self.max_close_time[:keep], max_close_time])
+        self.size = size
+        self.fingerprint = fingerprint
+
+        self.save()
+
+        return self
+
+    def seek(self, from_date: float) -> tuple:
+        # the first block that can hold a row at or after from_date, every row before it is older
+        blocks = np.flatnonzero(self.max_close_time >= from_date)
+        if not len(blocks):
+            return self.total_rows, self.size
+
+        return int(self.rows[blocks[0]]), int(self.offsets[blocks[0]])
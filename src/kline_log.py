@@ -0,0 +1,237 @@
+import atexit
+import glob
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src.kline_index import KlineLogIndex
+
+
+class BoundedFile:
+    # reads a file up to a fixed end, rows appended after it was counted are left for the next read
+    def __init__(self, in_file, end: int):
+        self.in_file = in_file
+        self.end = end
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = max(self.end - self.in_file.tell(), 0)
+
+        return self.in_file.read(remaining if size is None or size < 0 else min(size, remaining))
+
+
+class KlineLog:
+    headers = [
+        'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'trades',
+        'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore',
+        'ema5', 'ema9', 'ema10', 'ema15', 'ema20', 'ema25', 'ema30', 'ema35', 'ema40', 'ema45', 'ema50', 'ema55',
+        'ema60', 'ema65', 'ema70', 'ema75', 'ema80', 'ema85', 'ema90',
+        'wma14', 'atr14', 'rsi14',
+        'current_price'
+    ]
+
+    integer_columns = ['close_time', 'trades']
+
+    csv_extension = '.csv'
+    binary_extension = '.klines'
+
+    @classmethod
+    def get_dtype(cls, column: str) -> np.dtype:
+        return np.dtype('<i8') if column in cls.integer_columns else np.dtype('<f8')
+
+    @classmethod
+    def get_column_path(cls, path: str, column: str) -> str:
+        return os.path.join(path, f'{column}.{cls.get_dtype(column).kind}8')
+
+    @classmethod
+    def find_logs(cls, path: str = 'logs') -> dict:
+        logs = {}
+
+        # a binary log wins over a csv log of the same symbol
+        for extension in (cls.csv_extension, cls.binary_extension):
+            for log_path in glob.glob(os.path.join(path, f'*{extension}')):
+                logs[os.path.basename(log_path)[:-len(extension)]] = log_path
+
+        return logs
+
+    @classmethod
+    def read(cls, path: str, from_date: float = None) -> dict:
+        if path.endswith(cls.binary_extension):
+            return cls.read_binary(path, from_date)
+
+        return cls.read_csv(path, from_date)
+
+    @staticmethod
+    def count_rows(path: str, size: int = None, block_size: int = 1 << 20) -> int:
+        lines = 0
+        last = b'\n'
+
+        with open(path, 'rb') as in_file:
+            if size is not None:
+                in_file = BoundedFile(in_file, size)
+
+            while block := in_file.read(block_size):
+                lines += block.count(b'\n')
+                last = block[-1:]
+
+        # without the header, plus a last line that has no line break
+        return max(lines - 1 + (last != b'\n'), 0)
+
+    @classmethod
+    def read_csv(cls, path: str, from_date: float = None, chunk_size: int = 65536) -> dict:
+        # columns are allocated once for the whole file and filled chunk by chunk,
+        # so memory stays at 8 bytes per value plus a single chunk
+        with open(path, 'r') as in_file:
+            header = in_file.readline().rstrip('\r\n').split(',')
+            offset = in_file.tell()
+
+        if from_date:
+            # the sidecar index skips whole blocks older than from_date without parsing them
+            index = KlineLogIndex(path).update()
+            first_row, offset = index.seek(from_date)
+            rows = index.total_rows - first_row
+            end = index.size
+        else:
+            # the live bot keeps appending, only what was counted is read
+            end = os.path.getsize(path)
+            rows = cls.count_rows(path, end)
+
+        columns = {column: np.empty(rows) for column in header}
+        size = 0
+
+        with open(path, 'rb') as in_file:
+            in_file.seek(offset)
+
+            if offset < end:
+                # round_trip keeps parsing identical to float() used by the per-row replay
+                chunks = pd.read_csv(
+                    BoundedFile(in_file, end), header=None, names=header, dtype=np.float64, float_precision='round_trip',
+                    chunksize=chunk_size
+                )
+            else:
+                chunks = []
+
+            for chunk in chunks:
+                if from_date:
+                    chunk = chunk[chunk['close_time'] >= from_date]
+
+                for column in header:
+                    columns[column][size:size + len(chunk)] = chunk[column].to_numpy()
+
+                size += len(chunk)
+
+        # rows skipped by from_date are given back
+        if size < rows:
+            return {column: values[:size].copy() for column, values in columns.items()}
+
+        return columns
+
+    @classmethod
+    def open_csv(cls, path: str, from_date: float = None):
+        # a text file positioned at the first row that can be at or after from_date, the header is consumed
+        in_file = open(path, 'r', newline='')
+        in_file.readline()
+
+        if from_date:
+            in_file.seek(KlineLogIndex(path).update().seek(from_date)[1])
+
+        return in_file
+
+    @classmethod
+    def read_binary(cls, path: str, from_date: float = None) -> dict:
+        columns = {}
+
+        for column in cls.headers:
+            column_path = cls.get_column_path(path, column)
+
+            if os.path.getsize(column_path):
+                columns[column] = np.memmap(column_path, dtype=cls.get_dtype(column), mode='r')
+            else:
+                columns[column] = np.empty(0, dtype=cls.get_dtype(column))
+
+        # an interrupted flush can leave some columns longer than others
+        rows = min(len(values) for values in columns.values())
+        start = int(np.searchsorted(columns['close_time'][:rows], from_date)) if from_date else 0
+
+        return {column: values[start:rows] for column, values in columns.items()}
+
+
+# every writer ever created, flushed by a single exit hook instead of one hook per owner
+writers = []
+
+
+def flush_writers():
+    for writer in writers:
+        writer.flush()
+
+
+class KlineLogWriter:
+    flush_size = 256
+
+    def __init__(self, path: str, flush_size: int = None):
+        self.path = path
+        self.rows = []
+
+        if not writers:
+            atexit.register(flush_writers)
+        writers.append(self)
+
+        if flush_size:
+            self.flush_size = flush_size
+
+        os.makedirs(path, exist_ok=True)
+
+        for column in KlineLog.headers:
+            open(KlineLog.get_column_path(path, column), 'ab').close()
+
+        self.truncate()
+
+    def truncate(self):
+        column_paths = [KlineLog.get_column_path(self.path, column) for column in KlineLog.headers]
+
+        # a torn flush leaves columns of different lengths, appending to them would misalign every later row
+        rows = min(os.path.getsize(column_path) // 8 for column_path in column_paths)
+
+        for column_path in column_paths:
+            if os.path.getsize(column_path) != rows * 8:
+                os.truncate(column_path, rows * 8)
+
+    @classmethod
+    def convert_csv(cls, csv_path: str, path: str):
+        # written aside and renamed, an interrupted conversion leaves no half log behind
+        temporary_path = path + '.tmp'
+        shutil.rmtree(temporary_path, ignore_errors=True)
+
+        cls(temporary_path).write_columns(KlineLog.read_csv(csv_path))
+        os.replace(temporary_path, path)
+
+    def append(self, row: list):
+        self.rows.append(row)
+
+        if len(self.rows) >= self.flush_size:
+            self.flush()
+
+    def extend(self, rows: list):
+        self.rows.extend(rows)
+
+        if len(self.rows) >= self.flush_size:
+            self.flush()
+
+    def write_columns(self, columns: dict):
+        self.flush()
+        self.write(columns)
+
+    def write(self, columns: dict):
+        for column in KlineLog.headers:
+            with open(KlineLog.get_column_path(self.path, column), 'ab') as out_file:
+                out_file.write(np.asarray(columns[column]).astype(KlineLog.get_dtype(column)).tobytes())
+
+    def flush(self):
+        if not self.rows:
+            return
+
+        table = np.array(self.rows, dtype=np.float64)
+        self.rows = []
+
+        self.write({column: table[:, i] for i, column in enumerate(KlineLog.headers)})
@@ -0,0 +1,135 @@
+import time
+
+monotonic_ns = time.monotonic_ns
+
+
+class LatencyHistogram:
+    # log-linear buckets like HdrHistogram: exact below 32ns, then 16 buckets per power of two (~6% error)
+    sub_bits = 4
+    sub_buckets = 1 << sub_bits
+    buckets = 64 * sub_buckets
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * self.buckets
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @classmethod
+    def get_index(cls, value: int) -> int:
+        if value < 2 * cls.sub_buckets:
+            return value
+
+        shift = value.bit_length() - cls.sub_bits - 1
+
+        return (shift + 1) * cls.sub_buckets + (value >> shift) - cls.sub_buckets
+
+    @classmethod
+    def get_value(cls, index: int) -> int:
+        # the lowest value of a bucket
+        if index < 2 * cls.sub_buckets:
+            return index
+
+        shift = index // cls.sub_buckets - 1
+
+        return (index % cls.sub_buckets + cls.sub_buckets) << shift
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+
+        self.counts[self.get_index(value)] += 1
+        self.count += 1
+        self.total += value
+
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def get_percentile(self, percentile: float) -> int:
+        if not self.count:
+            return 0
+
+        rank = max(int(self.count * percentile / 100 + 0.5), 1)
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # the highest value of the bucket, never above what was recorded
+                return min(self.get_value(index + 1) - 1, self.max)
+
+        return self.max
+
+
+class LatencyRecorder:
+    percentiles = (50, 90, 99, 99.9)
+
+    def __init__(self):
+        # off by default, call sites check the flag before taking a timestamp
+        self.enabled = False
+        self.histograms = {}
+
+    def record(self, stage: str, s: str, started: int):
+        histogram = self.histograms.get((stage, s))
+        if histogram is None:
+            histogram = self.histograms.setdefault((stage, s), LatencyHistogram())
+
+        histogram.record(monotonic_ns() - started)
+
+    def reset(self):
+        self.histograms = {}
+
+    def get_summary(self, histograms: dict = None) -> list:
+        summary = []
+
+        # listed first, recording threads may add a histogram meanwhile
+        for (stage, s), histogram in sorted(list((self.histograms if histograms is None else histograms).items())):
+            summary.append({
+                "stage": stage,
+                "symbol": s,
+                "count": histogram.count,
+                "mean_us": histogram.total / histogram.count / 1000 if histogram.count else 0.,
+                **{f"p{percentile}_us": histogram.get_percentile(percentile) / 1000 for percentile in self.percentiles},
+                "max_us": histogram.max / 1000,
+            })
+
+        return summary
+
+    def get_stage_summary(self) -> list:
+        # every symbol of a stage merged, for a log line that stays readable with hundreds of symbols
+        merged = {}
+
+        for (stage, _), histogram in list(self.histograms.items()):
+            merged.setdefault((stage, "all"), LatencyHistogram()).merge(histogram)
+
+        return self.get_summary(merged)
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP futures_bot_stage_latency_seconds Time spent in a stage of the kline to order path.",
+            "# TYPE futures_bot_stage_latency_seconds summary",
+        ]
+
+        for (stage, s), histogram in sorted(list(self.histograms.items())):
+            labels = f'stage="{stage}",symbol="{s}"'
+
+            for percentile in self.percentiles:
+                value = histogram.get_percentile(percentile) / 1e9
+                quantile = f'quantile="{percentile / 100:g}"'
+                lines.append(f"futures_bot_stage_latency_seconds{{{labels},{quantile}}} {value:.9f}")
+
+            lines.append(f"futures_bot_stage_latency_seconds_sum{{{labels}}} {histogram.total / 1e9:.9f}")
+            lines.append(f"futures_bot_stage_latency_seconds_count{{{labels}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+latency = LatencyRecorder()
@@ -0,0 +1,132 @@
+import logging
+import queue
+import threading
+import time
+
+import requests
+
+from src.latency import latency, monotonic_ns
+
+
+class TelegramNotifier:
+    api_url = "https://api.telegram.org/bot{0}/sendMessage"
+    spill_log = "logs/telegram_spill.log"
+
+    max_queue_size = 1000
+    max_message_length = 4096
+    coalesce_delay = 1.
+    request_timeout = 10
+    max_retries = 5
+    max_backoff = 60
+
+    def __init__(self, bot_id: str, chat_id: str):
+        self.url = self.api_url.format(bot_id)
+        self.chat_id = chat_id
+
+        self.queue = queue.Queue(maxsize=self.max_queue_size)
+        self.session = requests.Session()
+        self.dropped = 0
+
+        self.worker = threading.Thread(target=self.run, name="telegram-notifier", daemon=True)
+        self.worker.start()
+
+    def send(self, text: str):
+        # the only cost on the trading path
+        try:
+            self.queue.put_nowait(text)
+        except queue.Full:
+            self.spill(text)
+
+    def spill(self, text: str):
+        self.dropped += 1
+
+        with open(self.spill_log, "a") as spill_file:
+            spill_file.write(text + "\n")
+
+    def close(self, timeout: float = 5.):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+
+        self.worker.join(timeout)
+
+    def collect(self):
+        messages = [self.queue.get()]
+        if messages[0] is None:
+            return None
+
+        # give a burst of events a moment to arrive, so they go out as one message
+        deadline = time.monotonic() + self.coalesce_delay
+        length = len(messages[0])
+
+        while length < self.max_message_length:
+            try:
+                text = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+
+            if text is None:
+                self.queue.put(None)
+                break
+
+            messages.append(text)
+            length += len(text) + 1
+
+        return messages
+
+    def pack(self, messages: list) -> list:
+        packed = []
+
+        for text in messages:
+            text = text[:self.max_message_length]
+
+            if packed and len(packed[-1]) + len(text) + 1 <= self.max_message_length:
+                packed[-1] += "\n" + text
+            else:
+                packed.append(text)
+
+        return packed
+
+    def deliver(self, text: str):
+        backoff = 1
+
+        for _ in range(self.max_retries):
+            try:
+                response = self.session.post(
+                    self.url,
+                    data={"chat_id": self.chat_id, "parse_mode": "html", "text": text},
+                    timeout=self.request_timeout,
+                )
+
+                if response.status_code == 429:
+                    delay = response.json().get("parameters", {}).get("retry_after", backoff)
+                elif response.status_code >= 500:
+                    delay = backoff
+                else:
+                    if not response.ok:
+                        logging.warning({"telegram": response.status_code, "response": response.text})
+
+                    return
+            except (requests.RequestException, ValueError) as e:
+                logging.warning({"telegram": str(e)})
+                delay = backoff
+
+            time.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+        self.spill(text)
+
+    def run(self):
+        while True:
+            messages = self.collect()
+            if messages is None:
+                return
+
+            for text in self.pack(messages):
+                started = monotonic_ns() if latency.enabled else 0
+
+                self.deliver(text)
+
+                if started:
+                    latency.record("telegram", "-", started)
@@ -0,0 +1,383 @@
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import binance
+from binance.exceptions import BinanceAPIException
+
+from src.latency import latency
+
+
+class Order:
+    __slots__ = (
+        "client_order_id", "symbol", "kind", "side", "quantity", "price", "context",
+        "state", "order_id", "avg_price", "filled_quantity", "error",
+        "created_ns", "sent_ns", "acked_ns", "filled_ns",
+    )
+
+    OPEN = "open"
+    INCREASE = "increase"
+    CLOSE = "close"
+
+    NEW = "NEW"
+    SUBMITTED = "SUBMITTED"
+    PARTIALLY_FILLED = "PARTIALLY_FILLED"
+    FILLED = "FILLED"
+    REJECTED = "REJECTED"
+    FAILED = "FAILED"
+
+    # a late or duplicated update can never move an order backwards
+    transitions = {
+        NEW: (SUBMITTED, PARTIALLY_FILLED, FILLED, REJECTED, FAILED),
+        # failed after submitted only once a lookup shows the exchange never got the order
+        SUBMITTED: (PARTIALLY_FILLED, FILLED, REJECTED, FAILED),
+        PARTIALLY_FILLED: (PARTIALLY_FILLED, FILLED),
+        FILLED: (),
+        REJECTED: (),
+        FAILED: (),
+    }
+    final_states = (FILLED, REJECTED, FAILED)
+
+    def __init__(self, symbol: str, kind: str, side: str, quantity: float, price: float, context: dict = None):
+        self.client_order_id = None
+        self.symbol = symbol
+        self.kind = kind
+        self.side = side
+        self.quantity = quantity
+        # the price the strategy planned with, the fill replaces it
+        self.price = price
+        self.context = context
+
+        self.state = self.NEW
+        self.order_id = None
+        self.avg_price = None
+        self.filled_quantity = 0.
+        self.error = None
+
+        self.created_ns = time.monotonic_ns()
+        self.sent_ns = None
+        self.acked_ns = None
+        self.filled_ns = None
+
+    def transition(self, state: str) -> bool:
+        if state not in self.transitions[self.state]:
+            return False
+
+        self.state = state
+
+        return True
+
+    def is_final(self) -> bool:
+        return self.state in self.final_states
+
+    def get_latency(self) -> dict:
+        def elapsed(start, end):
+            return None if start is None or end is None else (end - start) / 1e6
+
+        return {
+            "queue_ms": elapsed(self.created_ns, self.sent_ns),
+            "ack_ms": elapsed(self.created_ns, self.acked_ns),
+            "fill_ms": elapsed(self.created_ns, self.filled_ns),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "client_order_id": self.client_order_id,
+            "symbol": self.symbol,
+            "kind": self.kind,
+            "side": self.side,
+            "quantity": self.quantity,
+            "price": self.price,
+            "state": self.state,
+            "order_id": self.order_id,
+            "avg_price": self.avg_price,
+            "filled_quantity": self.filled_quantity,
+            "error": self.error,
+            **self.get_latency(),
+        }
+
+
+class OrderExecutor:
+    max_queue_size = 1000
+    max_latencies = 1000
+    client_order_prefix = "fb"
+
+    # errors after which the order may or may not exist on the exchange
+    unknown_status_codes = (-1000, -1001, -1006, -1007)
+    order_not_found_code = -2013
+    # an order still in the matching engine is not found either, so the first look waits a little
+    lookup_delay = 2.
+    lookup_period = 1.
+
+    def __init__(self, client: binance.Client):
+        self.client = client
+
+        self.queue = queue.Queue(maxsize=self.max_queue_size)
+        # finished orders wait here until the tick thread applies them to the position book
+        self.completed = deque()
+        self.lock = threading.Lock()
+
+        self.orders = {}
+        self.pending = {}
+        self.latencies = deque(maxlen=self.max_latencies)
+
+        # sent orders that are not final yet -> when to look them up next, only the worker touches it
+        self.unsettled = {}
+
+        # unique across restarts, so user data events of an older process are never matched
+        self.sequence = itertools.count(1)
+        self.session = f"{self.client_order_prefix}{os.getpid()}{int(time.time()) % 100000}"
+
+        self.worker = threading.Thread(target=self.run, name="order-executor", daemon=True)
+        self.worker.start()
+
+    def submit(self, order: Order) -> Order:
+        # the only cost on the tick path
+        order.client_order_id = f"{self.session}-{next(self.sequence)}"
+
+        with self.lock:
+            self.orders[order.client_order_id] = order
+            self.pending[order.symbol] = order
+
+        try:
+            self.queue.put_nowait(order)
+        except queue.Full:
+            order.error = "Order queue is full"
+            self.finish(order, Order.FAILED)
+
+        return order
+
+    def is_pending(self, s: str) -> bool:
+        return s in self.pending
+
+    def drain(self) -> list:
+        completed = []
+
+        while self.completed:
+            completed.append(self.completed.popleft())
+
+        return completed
+
+    def close(self, timeout: float = 5.):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+
+        self.worker.join(timeout)
+
+    def finish(self, order: Order, state: str):
+        with self.lock:
+            if not order.transition(state):
+                return
+
+            if order.state == Order.FILLED:
+                order.filled_ns = time.monotonic_ns()
+
+            self.orders.pop(order.client_order_id, None)
+            if self.pending.get(order.symbol) is order:
+                del self.pending[order.symbol]
+
+        self.latencies.append((order.symbol, order.kind, order.state, order.get_latency()))
+
+        if latency.enabled and order.filled_ns is not None:
+            latency.record("order_fill", order.symbol, order.created_ns)
+        self.completed.append(order)
+
+    def apply_fill(self, order: Order, state: str, avg_price: float, filled_quantity: float):
+        # the response and the user data stream race, whichever comes second finds a final order
+        with self.lock:
+            if order.is_final():
+                return
+
+            if avg_price:
+                order.avg_price = avg_price
+            order.filled_quantity = filled_quantity
+
+            if state != Order.FILLED:
+                order.transition(state)
+                return
+
+        self.finish(order, state)
+
+    def apply_end(self, order: Order, status: str, avg_price: float, filled_quantity: float):
+        order.error = status
+
+        # a market order cut short keeps what it executed, rejecting it would leave that part out of the book
+        if filled_quantity:
+            self.apply_fill(order, Order.FILLED, avg_price, filled_quantity)
+        else:
+            self.finish(order, Order.REJECTED)
+
+    def handle_response(self, order: Order, response: dict):
+        if latency.enabled:
+            latency.record("order_rest", order.symbol, order.sent_ns)
+
+        self.apply_response(order, response)
+
+    def apply_response(self, order: Order, response: dict):
+        # the user data stream can finish the order before the response arrives
+        if order.acked_ns is None:
+            order.acked_ns = time.monotonic_ns()
+        order.order_id = response.get("orderId")
+
+        status = response.get("status")
+        avg_price = float(response.get("avgPrice") or 0)
+        filled_quantity = float(response.get("executedQty") or 0)
+
+        # market orders usually come back filled, otherwise the user data stream completes them
+        if status == "FILLED" and avg_price:
+            self.apply_fill(order, Order.FILLED, avg_price, filled_quantity)
+        elif status == "PARTIALLY_FILLED":
+            self.apply_fill(order, Order.PARTIALLY_FILLED, avg_price, filled_quantity)
+        elif status in ("REJECTED", "EXPIRED", "CANCELED"):
+            self.apply_end(order, status, avg_price, filled_quantity)
+        else:
+            with self.lock:
+                order.transition(Order.SUBMITTED)
+
+        # the user data stream normally settles it within milliseconds, a lookup covers a stream that is down
+        if not order.is_final():
+            self.watch(order)
+
+    def handle_order_update(self, event: dict):
+        # ORDER_TRADE_UPDATE of the futures user data stream, other events are not about orders
+        if event.get("e") != "ORDER_TRADE_UPDATE":
+            return
+
+        update = event["o"]
+
+        with self.lock:
+            order = self.orders.get(update["c"])
+
+        if order is None:
+            return
+
+        status = update["X"]
+        avg_price = float(update.get("ap") or 0)
+        filled_quantity = float(update.get("z") or 0)
+
+        if status == "FILLED":
+            self.apply_fill(order, Order.FILLED, avg_price, filled_quantity)
+        elif status == "PARTIALLY_FILLED":
+            self.apply_fill(order, Order.PARTIALLY_FILLED, avg_price, filled_quantity)
+        elif status in ("REJECTED", "EXPIRED", "CANCELED"):
+            self.apply_end(order, status, avg_price, filled_quantity)
+
+    def place(self, order: Order):
+        order.sent_ns = time.monotonic_ns()
+
+        params = {}
+        if order.kind == Order.CLOSE:
+            # a close that does not match the exchange position shrinks to it, it never opens the other side
+            params["reduceOnly"] = "true"
+
+        try:
+            response = self.client.futures_create_order(
+                symbol=order.symbol,
+                side=order.side,
+                type=binance.Client.ORDER_TYPE_MARKET,
+                quantity=order.quantity,
+                newClientOrderId=order.client_order_id,
+                # the response carries the fill, no position request is needed for the entry price
+                newOrderRespType="RESULT",
+                **params,
+            )
+        except BinanceAPIException as e:
+            order.error = {"code": e.code, "message": e.message}
+
+            if e.status_code >= 500 or e.code in self.unknown_status_codes:
+                self.set_unknown(order)
+                return
+
+            order.acked_ns = time.monotonic_ns()
+            self.finish(order, Order.REJECTED)
+            return
+        except Exception as e:
+            # a timeout or a dropped connection says nothing about whether the exchange filled the order
+            order.error = {"message": str(e)}
+            self.set_unknown(order)
+            return
+
+        self.handle_response(order, response)
+
+    def set_unknown(self, order: Order):
+        logging.warning({"order_executor": f"Unknown status of {order.client_order_id}: {order.error}"})
+
+        with self.lock:
+            order.transition(Order.SUBMITTED)
+
+        self.watch(order)
+
+    def watch(self, order: Order):
+        # a lookup that finds the order still open keeps its turn, it is not pushed back
+        self.unsettled.setdefault(order.client_order_id, (order, time.monotonic() + self.lookup_delay))
+
+    def look_up(self, order: Order):
+        try:
+            response = self.client.futures_get_order(symbol=order.symbol, origClientOrderId=order.client_order_id)
+        except BinanceAPIException as e:
+            if e.code != self.order_not_found_code:
+                return
+
+            # the exchange never got it, only now is rolling the position back safe
+            order.error = {"code": e.code, "message": e.message}
+            self.finish(order, Order.FAILED)
+            return
+        except Exception as e:
+            logging.warning({"order_executor": f"Lookup of {order.client_order_id}: {e}"})
+            return
+
+        self.apply_response(order, response)
+
+    def look_up_unsettled(self):
+        now = time.monotonic()
+
+        for client_order_id, (order, lookup_at) in list(self.unsettled.items()):
+            # the user data stream may have settled it meanwhile
+            if not order.is_final() and lookup_at <= now:
+                self.unsettled[client_order_id] = (order, now + self.lookup_period)
+                self.look_up(order)
+
+            if order.is_final():
+                del self.unsettled[client_order_id]
+
+    def run(self):
+        while True:
+            try:
+                order = self.queue.get(timeout=self.lookup_period if self.unsettled else None)
+            except queue.Empty:
+                order = False
+
+            if order is None:
+                return
+
+            try:
+                if order:
+                    self.place(order)
+
+                if self.unsettled:
+                    self.look_up_unsettled()
+            except Exception as e:
+                logging.warning({"order_executor": str(e)})
+
+    def get_latency_summary(self) -> dict:
+        summary = {}
+
+        for stage in ("queue_ms", "ack_ms", "fill_ms"):
+            values = sorted(latency[stage] for *_, latency in self.latencies if latency[stage] is not None)
+            if not values:
+                continue
+
+            summary[stage] = {
+                "count": len(values),
+                "p50": values[len(values) // 2],
+                "p99": values[min(int(len(values) * 0.99), len(values) - 1)],
+                "max": values[-1],
+            }
+
+        return summary
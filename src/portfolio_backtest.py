@@ -0,0 +1,96 @@
+import csv
+import heapq
+import time
+
+from src.bar import Bar
+from src.kline_log import KlineLog
+from src.strategy import Strategy
+
+
+class PortfolioBacktest:
+    strategy: Strategy = None
+
+    def __init__(self, strategy: Strategy):
+        self.strategy = strategy
+        self.stats = {}
+        self.rows = 0
+        self.elapsed = 0.
+
+    @staticmethod
+    def stream_csv(path: str, from_date: float = None):
+        with KlineLog.open_csv(path, from_date) as csv_file:
+            for row in csv.reader(csv_file, delimiter=','):
+                bar, current_price = Bar.from_log_row(row)
+
+                if from_date and bar.close_time < from_date:
+                    continue
+
+                yield bar, current_price
+
+    @staticmethod
+    def stream_binary(path: str, from_date: float = None):
+        # memory-mapped, only the chunk being unpacked is read
+        yield from Bar.iterate_columns(KlineLog.read_binary(path, from_date))
+
+    def stream(self, index: int, s: str, path: str, from_date: float = None):
+        events = (
+            self.stream_binary(path, from_date) if path.endswith(KlineLog.binary_extension)
+            else self.stream_csv(path, from_date)
+        )
+
+        # the symbol position breaks ties of the same close_time, so the order is always the same
+        for bar, current_price in events:
+            yield bar.close_time, index, s, bar, current_price
+
+    def create_stats(self) -> dict:
+        return {"events": 0, "wins": 0, "loses": 0, "trailing_loses": 0, "pnl": 0.}
+
+    def run(self, log_files: dict, from_date: float = None) -> dict:
+        strategy = self.strategy
+        account = strategy.account
+        setting = strategy.setting
+
+        symbols = sorted(log_files)
+        self.stats = {s: self.create_stats() for s in symbols}
+
+        streams = [self.stream(i, s, log_files[s], from_date) for i, s in enumerate(symbols)]
+
+        started = time.perf_counter()
+
+        # one account and one strategy see every symbol in close_time order, like the live bot
+        for _, _, s, bar, current_price in heapq.merge(*streams):
+            balance = account.balance
+            wins, loses, trailing_loses = setting.wins, setting.loses, setting.trailing_loses
+
+            strategy.process_kline_event(s, bar, current_price)
+
+            stats = self.stats[s]
+            stats["events"] += 1
+
+            if balance != account.balance:
+                stats["pnl"] += account.balance - balance
+                stats["wins"] += setting.wins - wins
+                stats["loses"] += setting.loses - loses
+                stats["trailing_loses"] += setting.trailing_loses - trailing_loses
+
+            if account.balance <= 0:
+                break
+
+        self.elapsed = time.perf_counter() - started
+        self.rows = sum(stats["events"] for stats in self.stats.values())
+
+        return self.get_stats()
+
+    def get_stats(self) -> dict:
+        total = self.create_stats()
+
+        for stats in self.stats.values():
+            for key in total:
+                total[key] += stats[key]
+
+        total["balance"] = self.strategy.account.balance
+        # a position still open when its log ends keeps holding a slot of max_open_positions
+        total["open_symbols"] = self.strategy.account.positions.get_open_symbols()
+        total["rows_per_second"] = self.rows / self.elapsed if self.elapsed else 0.
+
+        return {"symbols": self.stats, "total": total}
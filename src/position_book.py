@@ -0,0 +1,91 @@
+import numpy as np
+
+
+class PositionBook:
+    FLAT = 0
+    LONG = 1
+    SHORT = -1
+
+    capacity = 64
+
+    def __init__(self, symbols: list = None):
+        self.index = {}
+        self.symbols = []
+
+        # one row per symbol, positions never share state
+        self.side = np.zeros(self.capacity, dtype=np.int8)
+        self.entry_price = np.zeros(self.capacity)
+        self.stop_loss_price = np.zeros(self.capacity)
+        self.take_profit_price = np.zeros(self.capacity)
+        self.asset_size = np.zeros(self.capacity)
+        self.position_size = np.zeros(self.capacity)
+        self.position_fee = np.zeros(self.capacity)
+        self.touches = np.zeros(self.capacity, dtype=np.int64)
+        self.peak_amplitude = np.full(self.capacity, np.nan)
+
+        self.last_action = []
+        self.last_orders = []
+
+        for s in symbols or []:
+            self.get_row(s)
+
+    def grow(self):
+        self.capacity *= 2
+
+        for name in (
+            "side", "entry_price", "stop_loss_price", "take_profit_price",
+            "asset_size", "position_size", "position_fee", "touches",
+        ):
+            values = getattr(self, name)
+            setattr(self, name, np.concatenate([values, np.zeros_like(values)]))
+
+        self.peak_amplitude = np.concatenate([self.peak_amplitude, np.full(len(self.peak_amplitude), np.nan)])
+
+    def get_row(self, s: str) -> int:
+        row = self.index.get(s)
+        if row is not None:
+            return row
+
+        row = len(self.symbols)
+        if row == self.capacity:
+            self.grow()
+
+        self.index[s] = row
+        self.symbols.append(s)
+        self.last_action.append(None)
+        self.last_orders.append([])
+
+        return row
+
+    def reset(self, row: int):
+        self.side[row] = self.FLAT
+        self.stop_loss_price[row] = 0
+        self.take_profit_price[row] = 0
+        self.asset_size[row] = 0
+        self.position_size[row] = 0
+        self.touches[row] = 0
+
+    def snapshot(self, row: int) -> dict:
+        return {
+            "side": int(self.side[row]),
+            "entry_price": float(self.entry_price[row]),
+            "stop_loss_price": float(self.stop_loss_price[row]),
+            "take_profit_price": float(self.take_profit_price[row]),
+            "asset_size": float(self.asset_size[row]),
+            "position_size": float(self.position_size[row]),
+            "position_fee": float(self.position_fee[row]),
+            "touches": int(self.touches[row]),
+            "last_action": self.last_action[row],
+            "last_orders": list(self.last_orders[row]),
+        }
+
+    def restore(self, row: int, snapshot: dict):
+        # puts a row back the way it was before an order the exchange did not fill
+        for name, value in snapshot.items():
+            getattr(self, name)[row] = value
+
+    def get_open_count(self) -> int:
+        return int(np.count_nonzero(self.side[:len(self.symbols)]))
+
+    def get_open_symbols(self) -> list:
+        return [self.symbols[row] for row in np.flatnonzero(self.side[:len(self.symbols)])]
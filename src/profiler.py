@@ -0,0 +1,102 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class SamplingProfiler:
+    path = 'logs'
+    # the interpreter hands the GIL over every 5ms by default, sampling faster only adds overhead
+    interval = 0.005
+
+    def __init__(self, path: str = None, interval: float = None):
+        if path:
+            self.path = path
+
+        if interval:
+            self.interval = interval
+
+        self.stacks = Counter()
+        self.labels = {}
+
+    def get_label(self, code) -> str:
+        label = self.labels.get(code)
+
+        if label is None:
+            label = self.labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+        return label
+
+    def get_file(self, name: str) -> str:
+        return os.path.join(self.path, f'profile-{name}.collapsed')
+
+    def sample(self, thread_id: int, stacks: Counter, stop: threading.Event):
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+
+            stack = []
+            while frame is not None:
+                stack.append(self.get_label(frame.f_code))
+                frame = frame.f_back
+
+            if stack:
+                stacks[tuple(reversed(stack))] += 1
+
+    @contextmanager
+    def profile(self, name: str):
+        # samples the calling thread from another one, the profiled code runs unmodified
+        stacks = Counter()
+        stop = threading.Event()
+
+        sampler = threading.Thread(
+            target=self.sample, args=(threading.get_ident(), stacks, stop), name="profiler", daemon=True
+        )
+        started = time.perf_counter()
+        sampler.start()
+
+        try:
+            yield stacks
+        finally:
+            stop.set()
+            sampler.join()
+
+            self.write(name, stacks)
+            self.stacks.update(stacks)
+
+            print(f"Profile {name}: {sum(stacks.values())} samples in {time.perf_counter() - started:.2f}s, "
+                  f"written to {self.get_file(name)}")
+
+    def write(self, name: str, stacks: Counter):
+        os.makedirs(self.path, exist_ok=True)
+
+        # collapsed stacks, the input format of flamegraph.pl, speedscope and inferno
+        with open(self.get_file(name), 'w') as out_file:
+            for stack, count in stacks.most_common():
+                out_file.write(f"{';'.join(stack)} {count}\n")
+
+    def get_top(self, limit: int = 20) -> list:
+        own = Counter()
+        total = Counter()
+
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+
+            # a recursive function counts once per sample
+            for label in set(stack):
+                total[label] += count
+
+        return [(label, count, total[label]) for label, count in own.most_common(limit)]
+
+    def print_top(self, limit: int = 20):
+        samples = sum(self.stacks.values())
+        if not samples:
+            print("Profile: no samples")
+            return
+
+        print(f"Top {limit} functions by own samples of {samples}:")
+        print(f"{'own':>7} {'total':>7}  function")
+
+        for label, count, total in self.get_top(limit):
+            print(f"{count / samples:>7.1%} {total / samples:>7.1%}  {label}")
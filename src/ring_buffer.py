@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+
+class KlineRingBuffer:
+    capacity = 100
+
+    def __init__(self, columns: list, capacity: int = None):
+        if capacity:
+            self.capacity = capacity
+
+        self.columns = list(columns)
+        self.column_index = {column: i for i, column in enumerate(self.columns)}
+
+        # every row is written twice, so the latest rows are always one contiguous slice
+        self.data = np.full((2 * self.capacity, len(self.columns)), np.nan)
+        self.open_times = np.zeros(2 * self.capacity, dtype=np.int64)
+
+        self.head = 0
+        self.size = 0
+        self.series = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def last_open_time(self) -> int:
+        return int(self.open_times[self.head + self.capacity - 1]) if self.size else None
+
+    def append(self, open_time: int, row):
+        if self.size and open_time <= self.last_open_time:
+            if open_time < self.last_open_time:
+                return
+
+            # same candle again, it is still forming
+            slot = (self.head - 1) % self.capacity
+        else:
+            slot = self.head
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+        self.data[slot] = row
+        self.data[slot + self.capacity] = row
+        self.open_times[slot] = open_time
+        self.open_times[slot + self.capacity] = open_time
+
+        self.series = None
+
+    def extend(self, open_times: np.ndarray, rows: np.ndarray):
+        for open_time, row in zip(open_times[-self.capacity:], rows[-self.capacity:]):
+            self.append(int(open_time), row)
+
+    def view(self, rows: int = None) -> np.ndarray:
+        rows = self.size if rows is None else min(rows, self.size)
+        end = self.head + self.capacity
+
+        return self.data[end - rows:end]
+
+    def latest(self) -> np.ndarray:
+        return self.data[self.head + self.capacity - 1]
+
+    def get(self, column: str) -> float:
+        return self.data[self.head + self.capacity - 1, self.column_index[column]]
+
+    def latest_series(self) -> pd.Series:
+        # built once per candle update, ticks in between reuse it
+        if self.series is None:
+            self.series = pd.Series(self.latest().copy(), index=self.columns)
+
+        return self.series
+
+    def to_frame(self, rows: int = None) -> pd.DataFrame:
+        rows = self.size if rows is None else min(rows, self.size)
+        end = self.head + self.capacity
+
+        return pd.DataFrame(
+            self.view(rows),
+            index=pd.to_datetime(self.open_times[end - rows:end], unit="ms"),
+            columns=self.columns,
+        )
@@ -0,0 +1,330 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+from binance import AsyncClient, BinanceSocketManager
+from binance.exceptions import BinanceAPIException
+
+from src.account_stream import AccountStream
+from src.bar import Bar
+from src.bootstrap import KlineBootstrap
+from src.indicators import IndicatorEngine
+from src.kline_cache import KlineCache
+from src.kline_event import KlineEvent
+from src.latency import latency, monotonic_ns
+from src.ring_buffer import KlineRingBuffer
+from src.setting import Setting
+from src.strategy import Strategy
+
+
+class MarketDataRuntime:
+    strategy: Strategy = None
+    setting: Setting = None
+    client: AsyncClient = None
+
+    interval = AsyncClient.KLINE_INTERVAL_1MINUTE
+    settings_update_period = 300
+    max_concurrent_requests = 10
+    buffer_capacity = 100
+    latency_summary_period = 60
+    metrics_host = "127.0.0.1"
+    metrics_port = 9108
+
+    kline_columns = [
+        "timestamp",
+        "open",
+        "high",
+        "low",
+        "close",
+        "volume",
+        "close_time",
+        "quote_asset_volume",
+        "trades",
+        "taker_buy_base_asset_volume",
+        "taker_buy_quote_asset_volume",
+        "ignore",
+    ]
+
+    def __init__(self, strategy: Strategy, start_time: str):
+        self.strategy = strategy
+        self.setting = strategy.setting
+        self.start_time = start_time
+        self.symbols = self.setting.get_symbols_with_shitcoins()
+
+        self.buffers = {}
+        self.bars = {}
+        self.indicators = {}
+        self.events = {s: KlineEvent() for s in self.symbols}
+        self.cache = KlineCache()
+        self.requests = None
+
+        # fills and the balance come from the user data stream once orders are placed for real
+        self.account_stream = (
+            AccountStream(strategy.account, strategy.order_executor, strategy.utils)
+            if strategy.order_executor is not None else None
+        )
+
+    async def create_client(self):
+        if self.client:
+            await self.client.close_connection()
+
+        self.client = await AsyncClient.create(os.getenv("BINANCE_API_KEY"), os.getenv("BINANCE_API_SECRET"))
+
+    async def get_klines(self, s: str, st: str, et: str) -> np.ndarray:
+        async with self.requests:
+            klines = await self.client.futures_historical_klines(
+                symbol=s, interval=self.interval, start_str=st, end_str=et
+            )
+
+        return np.array(klines, dtype=np.float64).reshape(-1, len(self.kline_columns))
+
+    def update_buffer(self, s: str, table: np.ndarray):
+        started = monotonic_ns() if latency.enabled else 0
+
+        if len(table):
+            rows = [
+                self.indicators[s].update(int(open_time), high, low, close)
+                for open_time, high, low, close in zip(table[:, 0], table[:, 2], table[:, 3], table[:, 4])
+            ]
+
+            self.buffers[s].extend(table[:, 0], np.hstack([table[:, 1:], np.array(rows, dtype=np.float64)]))
+
+        # ticks between candle updates share one snapshot
+        self.bars[s] = Bar(self.buffers[s].latest().tolist())
+
+        if started:
+            latency.record("buffer_update", s, started)
+
+    async def bootstrap(self):
+        start_ms = pd.Timestamp(self.start_time).value // 10 ** 6
+        end_ms = int(time.time() * 1000)
+
+        self.cache.evict()
+
+        cached = {}
+        starts = {}
+        refetched = set()
+        for s in self.symbols:
+            table = self.cache.load(s, self.interval)
+            cached[s] = table[table[:, 0] >= start_ms]
+
+            # only the gap after the last cached candle is fetched when the cache covers the start
+            if len(cached[s]) and table[0, 0] <= start_ms:
+                starts[s] = int(cached[s][-1, 0]) + self.cache.interval_ms[self.interval]
+            else:
+                cached[s] = cached[s][:0]
+                starts[s] = start_ms
+                refetched.add(s)
+
+        tables = await KlineBootstrap().fetch(starts, end_ms)
+
+        # a symbol without history would trade on cold indicators, it sits this session out
+        failed = [s for s in self.symbols if s not in tables]
+        if failed:
+            print(f"Exception ❗ Type: Bootstrap, Message: Not trading {', '.join(failed)}")
+            self.symbols = [s for s in self.symbols if s in tables]
+
+        for s in self.symbols:
+            if s in refetched:
+                self.cache.merge(s, self.interval, tables[s])
+            else:
+                self.cache.store(s, self.interval, tables[s])
+
+            self.indicators[s] = IndicatorEngine()
+            self.buffers[s] = KlineRingBuffer(self.kline_columns[1:] + IndicatorEngine.columns, self.buffer_capacity)
+
+            self.update_buffer(s, np.concatenate([cached[s], tables[s]]))
+
+    async def update_symbol(self, s: str, previous_minute: str, current_minute: str) -> bool:
+        # true after an api error, the order client is re-created once for the whole minute
+        try:
+            started = monotonic_ns() if latency.enabled else 0
+
+            # candles a failed minute missed are fetched along, so the cache and the buffer have no hole
+            start = previous_minute
+            next_open_time = self.cache.get_next_open_time(s, self.interval)
+            if next_open_time is not None and next_open_time < pd.Timestamp(previous_minute).value // 10 ** 6:
+                start = next_open_time
+
+            table = await self.get_klines(s, start, current_minute)
+
+            if started:
+                latency.record("kline_request", s, started)
+
+            self.cache.store(s, self.interval, table)
+
+            # candles older than the last one are already closed and accounted for
+            last_open_time = self.buffers[s].last_open_time
+            if last_open_time is not None:
+                table = table[table[:, 0] >= last_open_time]
+
+            self.update_buffer(s, table)
+        except asyncio.TimeoutError:
+            print(f"Time: {current_minute}, Symbol: {s}, Exception ❗ Type: TimeoutError")
+        except BinanceAPIException as bae:
+            print(
+                f"Time: {current_minute}, Symbol: {s}, Exception ❗ Type: BinanceAPIException, Message: {bae.message}"
+            )
+
+            return True
+        except Exception as e:
+            # a dropped connection of one symbol only costs that symbol this minute
+            print(f"Time: {current_minute}, Symbol: {s}, Exception ❗ Type: {type(e).__name__}, Message: {e}")
+
+        return False
+
+    async def create_strategy_client(self):
+        loop = asyncio.get_running_loop()
+
+        try:
+            # the blocking client pings on creation
+            await loop.run_in_executor(None, self.strategy.create_client)
+        except Exception as e:
+            print(f"Exception ❗ Type: {type(e).__name__}, Reason: At create_client, Message: {e}")
+            return
+
+        if self.strategy.order_executor is not None:
+            self.strategy.order_executor.client = self.strategy.client
+
+    async def update_dataframes(self):
+        while True:
+            # wake up right after the minute boundary, without drifting
+            await asyncio.sleep(60 - time.time() % 60)
+
+            now = datetime.now()
+            previous_minute = (now - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+            current_minute = now.strftime("%Y-%m-%d %H:%M:%S")
+
+            errors = await asyncio.gather(
+                *(self.update_symbol(s, previous_minute, current_minute) for s in self.symbols)
+            )
+
+            if any(errors):
+                await self.create_strategy_client()
+
+            self.strategy.utils.flush_logs()
+
+    async def update_symbol_settings(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            try:
+                # mysql connector is blocking, keep it off the event loop
+                await loop.run_in_executor(None, self.setting.update_symbol_settings_from_db)
+            except Exception as e:
+                print(f"Exception ❗ Reason: At update_symbol_settings_from_db, Message: {e}")
+
+            await asyncio.sleep(self.settings_update_period)
+
+    def handle_socket_message(self, event: dict):
+        if "ps" not in event:
+            return
+
+        started = monotonic_ns() if latency.enabled else 0
+
+        kline_event = self.events[event["ps"]].decode(event)
+        s = kline_event.symbol
+
+        if started:
+            latency.record("decode", s, started)
+            started = monotonic_ns()
+
+        try:
+            self.strategy.process_kline_event(s, self.bars[s], kline_event.close)
+
+            if started:
+                latency.record("process_kline_event", s, started)
+        except Exception as e:
+            self.strategy.utils.print_log(
+                {
+                    "Symbol": s,
+                    "Exception": " ❗",
+                    "Reason": "At process_kline_event",
+                    "Message": str(e),
+                }
+            )
+
+    async def stream_symbol(self, socket_manager: BinanceSocketManager, s: str):
+        while True:
+            try:
+                async with socket_manager.kline_futures_socket(symbol=s, interval=self.interval) as stream:
+                    while True:
+                        event = await stream.recv()
+
+                        if event.get("e") == "error":
+                            print(f"Symbol: {s}, Exception ❗ Type: Websocket, Message: {event.get('m')}")
+                            break
+
+                        self.handle_socket_message(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Symbol: {s}, Exception ❗ Type: {type(e).__name__}, Message: {e}")
+
+            await asyncio.sleep(1)
+
+    async def log_latency_summary(self):
+        while True:
+            await asyncio.sleep(self.latency_summary_period)
+
+            for stage in latency.get_stage_summary():
+                self.strategy.utils.logger().info({"latency": stage})
+                print(
+                    f"Latency {stage['stage']}: count {stage['count']}, p50 {stage['p50_us']:.1f}us, "
+                    f"p99 {stage['p99_us']:.1f}us, max {stage['max_us']:.1f}us"
+                )
+
+    async def serve_metrics(self):
+        async def metrics(request):
+            return web.Response(text=latency.to_prometheus(), content_type="text/plain", charset="utf-8")
+
+        application = web.Application()
+        application.router.add_get("/metrics", metrics)
+
+        runner = web.AppRunner(application)
+        await runner.setup()
+
+        port = int(os.getenv("METRICS_PORT")) if os.getenv("METRICS_PORT") else self.metrics_port
+
+        try:
+            await web.TCPSite(runner, self.metrics_host, port).start()
+        except OSError as e:
+            # metrics are optional, a taken port must not stop trading
+            print(f"Exception ❗ Type: Metrics, Message: Cannot listen on {self.metrics_host}:{port}, {e}")
+            await runner.cleanup()
+            return
+
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    async def run(self):
+        self.requests = asyncio.Semaphore(self.max_concurrent_requests)
+
+        await self.create_client()
+
+        try:
+            await self.bootstrap()
+
+            socket_manager = BinanceSocketManager(self.client)
+
+            tasks = [
+                self.update_symbol_settings(),
+                self.update_dataframes(),
+                *(self.stream_symbol(socket_manager, s) for s in self.symbols),
+            ]
+
+            if self.account_stream is not None:
+                tasks.append(self.account_stream.run(self.client))
+
+            if latency.enabled:
+                tasks += [self.log_latency_summary(), self.serve_metrics()]
+
+            await asyncio.gather(*tasks)
+        finally:
+            await self.client.close_connection()
@@ -1,8 +1,5 @@
-import os
-import time
-
-import mysql.connector
-from mysql.connector.abstracts import MySQLConnectionAbstract
+from src.settings_repository import SettingsRepository, create_settings_repository
+from src.symbol_parameters import SymbolParameters
 
 
 class Setting:
@@ -25,15 +22,12 @@ class Setting:
     ema_amplitude = 2.4
     indicator = "ema9"
     max_atr_value = 0.04
+    max_open_positions = 1
 
-    touches = 0
     wins = 0
     loses = 0
     trailing_loses = 0
 
-    last_action = None
-    last_orders = []
-
     OPEN_LONG = "open_long"
     OPEN_SHORT = "open_short"
     INCREASE_LONG = "increase_long"
@@ -43,10 +37,12 @@ class Setting:
     DIRECTION_SHORT = "Short"
 
     symbols_settings = {}
+    symbols_parameters = {}
+    default_parameters: SymbolParameters = None
+    settings_repository: SettingsRepository = None
 
     use_trailing_entry = False
     trailing_amplitude_diff = 15
-    amplitude_manager = {}
 
     symbols = [
         'APTUSDT', 'DYDXUSDT', 'ANKRUSDT',
@@ -73,68 +69,92 @@ class Setting:
     ]
 
     def __init__(self):
-        pass
+        # counters and per symbol settings belong to this instance, hyperopt runs many side by side
+        self.wins = 0
+        self.loses = 0
+        self.trailing_loses = 0
+        self.symbols_settings = {}
+        self.symbols_parameters = {}
+        self.default_parameters = None
+        self.settings_repository = None
 
     def get_symbols_with_shitcoins(self) -> list:
         return self.symbols + self.shit_coins
 
-    @staticmethod
-    def create_mysql_connection():
-        return mysql.connector.connect(host=os.getenv('MYSQL_HOST'),
-                                       database=os.getenv('MYSQL_DATABASE'),
-                                       user=os.getenv('MYSQL_USER'),
-                                       password=os.getenv('MYSQL_PWD'))
+    def get_settings_repository(self) -> SettingsRepository:
+        # connects on first use, most scripts never touch the database
+        if self.settings_repository is None:
+            self.settings_repository = create_settings_repository()
 
-    @staticmethod
-    def close_mysql_connection(connection: MySQLConnectionAbstract):
-        if connection.is_connected():
-            connection.close()
+        return self.settings_repository
 
     def update_symbol_settings_from_db(self):
-        connection = self.create_mysql_connection()
+        symbols_settings = {symbol: dict(settings) for symbol, settings in self.symbols_settings.items()}
 
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("select * from symbol_settings")
+        for setting in self.get_settings_repository().load_changed():
+            try:
+                # compiled once here, a bad row would otherwise fail the compile of the whole batch
+                amplitude = float(setting["amplitude"])
+                SymbolParameters(setting["indicator"], amplitude)
+            except (KeyError, TypeError, ValueError):
+                print(
+                    f"Symbol: {setting['symbol']}, Exception ❗ Type: Symbol Settings, "
+                    f"Message: Skipped indicator {setting['indicator']}, amplitude {setting['amplitude']}"
+                )
+                continue
 
-        for setting in cursor.fetchall():
-            self.set_symbol_setting(setting["symbol"], "amplitude", float(setting["amplitude"]))
-            self.set_symbol_setting(setting["symbol"], "indicator", setting["indicator"])
+            symbols_settings.setdefault(setting["symbol"], {})["amplitude"] = amplitude
+            symbols_settings[setting["symbol"]]["indicator"] = setting["indicator"]
 
-        self.close_mysql_connection(connection)
+        self.apply_symbols_settings(symbols_settings)
 
     def save_symbol_settings_to_db(self, symbol: str, amplitude: float, indicator: str, balance: float = None):
-        connection = self.create_mysql_connection()
-
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(f"select id from symbol_settings where symbol = '{symbol}'")
-
-        row = cursor.fetchone()
-
-        now = time.strftime('%Y-%m-%d %H:%M:%S')
-        if row is not None:
-            cursor.execute(
-                f"update symbol_settings "
-                f"set amplitude = {amplitude}, "
-                f"indicator = '{indicator}', "
-                f"hyperopted_balance = '{str(balance)}', "
-                f"updated_at = '{now}' "
-                f"where id = {row['id']}"
-            )
-        else:
-            cursor.execute(
-                f"insert into symbol_settings (symbol, amplitude, indicator, hyperopted_balance, created_at) values"
-                f"('{symbol}', {amplitude}, '{indicator}', '{str(balance)}', '{now}')"
-            )
+        self.save_symbols_settings_to_db(
+            [{"symbol": symbol, "amplitude": amplitude, "indicator": indicator, "balance": balance}]
+        )
+
+    def save_symbols_settings_to_db(self, settings: list):
+        # nothing to save, no connection pool either
+        if not settings:
+            return
 
-        connection.commit()
+        self.get_settings_repository().save_many(settings)
 
-        self.close_mysql_connection(connection)
+    def apply_symbols_settings(self, symbols_settings: dict):
+        # compiled aside and swapped in one assignment, a tick never sees half of an update
+        symbols_parameters = {
+            symbol: SymbolParameters.compile(settings, self.indicator, self.ema_amplitude)
+            for symbol, settings in symbols_settings.items()
+        }
+
+        self.symbols_settings = symbols_settings
+        self.symbols_parameters = symbols_parameters
 
     def set_symbol_setting(self, symbol: str, setting: str, value: any):
-        if symbol not in self.symbols_settings:
-            self.symbols_settings[symbol] = {}
+        symbols_settings = dict(self.symbols_settings)
+        symbols_settings[symbol] = dict(symbols_settings.get(symbol, {}), **{setting: value})
+
+        self.apply_symbols_settings(symbols_settings)
 
-        self.symbols_settings[symbol][setting] = value
+    def set_symbols_setting(self, setting: str, values: dict):
+        # one copy and one compile for every symbol, instead of one per symbol
+        symbols_settings = dict(self.symbols_settings)
+        for symbol, value in values.items():
+            symbols_settings[symbol] = dict(symbols_settings.get(symbol, {}), **{setting: value})
+
+        self.apply_symbols_settings(symbols_settings)
+
+    def get_symbol_parameters(self, symbol: str) -> SymbolParameters:
+        parameters = self.symbols_parameters.get(symbol)
+        if parameters is not None:
+            return parameters
+
+        # backtests change the defaults after construction, so they are compiled on demand
+        parameters = self.default_parameters
+        if parameters is None or parameters.indicator != self.indicator or parameters.amplitude != self.ema_amplitude:
+            parameters = self.default_parameters = SymbolParameters(self.indicator, self.ema_amplitude)
+
+        return parameters
 
     def get_symbol_setting(self, symbol: str, setting: str) -> any:
         def get_default_setting() -> any:
@@ -152,6 +172,3 @@ class Setting:
                 return self.symbols_settings[symbol][setting]
             else:
                 return get_default_setting()
-
-
-
@@ -0,0 +1,183 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from mysql.connector import pooling
+
+
+class SettingsRepository(ABC):
+    select_query = (
+        "select symbol, indicator, amplitude, hyperopted_balance, coalesce(updated_at, created_at) as version "
+        "from symbol_settings"
+    )
+    changed_query = select_query + " where coalesce(updated_at, created_at) >= {0}"
+    upsert_query = None
+    placeholder = "%s"
+
+    def __init__(self):
+        # what the last load returned, so a reload only hands back rows that changed since
+        self.settings = {}
+        self.last_version = None
+
+    @abstractmethod
+    def get_connection(self):
+        pass
+
+    def release_connection(self, connection):
+        connection.close()
+
+    def fetch(self, query: str, params: tuple = ()) -> list:
+        connection = self.get_connection()
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, params)
+
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            cursor.close()
+        finally:
+            self.release_connection(connection)
+
+        return rows
+
+    def load_changed(self) -> list:
+        if self.last_version is None:
+            rows = self.fetch(self.select_query)
+        else:
+            # timestamps have second precision, rows from the last second come again and are compared below
+            rows = self.fetch(self.changed_query.format(self.placeholder), (self.last_version,))
+
+        changed = []
+        for row in rows:
+            if self.settings.get(row["symbol"]) == row:
+                continue
+
+            self.settings[row["symbol"]] = row
+            changed.append(row)
+
+            if self.last_version is None or row["version"] > self.last_version:
+                self.last_version = row["version"]
+
+        return changed
+
+    def save_many(self, settings: list):
+        if not settings:
+            return
+
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        rows = [
+            (
+                setting["symbol"], setting["indicator"], str(setting["amplitude"]),
+                None if setting.get("balance") is None else str(setting["balance"]), now, now
+            )
+            for setting in settings
+        ]
+
+        connection = self.get_connection()
+
+        try:
+            cursor = connection.cursor()
+            cursor.executemany(self.upsert_query, rows)
+            cursor.close()
+
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self.release_connection(connection)
+
+
+class MysqlSettingsRepository(SettingsRepository):
+    upsert_query = (
+        "insert into symbol_settings (symbol, indicator, amplitude, hyperopted_balance, created_at, updated_at) "
+        "values (%s, %s, %s, %s, %s, %s) "
+        "on duplicate key update indicator = values(indicator), amplitude = values(amplitude), "
+        "hyperopted_balance = values(hyperopted_balance), updated_at = values(updated_at)"
+    )
+
+    unique_symbol_query = "show index from symbol_settings where Column_name = 'symbol' and Non_unique = 0"
+
+    pool_size = 4
+
+    def __init__(self, pool_size: int = None):
+        super().__init__()
+
+        self.pool = pooling.MySQLConnectionPool(
+            pool_name="symbol_settings",
+            pool_size=pool_size or self.pool_size,
+            host=os.getenv('MYSQL_HOST'),
+            database=os.getenv('MYSQL_DATABASE'),
+            user=os.getenv('MYSQL_USER'),
+            password=os.getenv('MYSQL_PWD'),
+        )
+
+        # without the key every upsert inserts another row, and reloads flip between the copies
+        if not self.fetch(self.unique_symbol_query):
+            raise RuntimeError(
+                "symbol_settings.symbol is not unique, run migrations/001_unique_symbol_settings.sql"
+            )
+
+    def get_connection(self):
+        return self.pool.get_connection()
+
+    def release_connection(self, connection):
+        # a pooled connection goes back to the pool on close
+        if connection.is_connected():
+            connection.close()
+
+
+class SqliteSettingsRepository(SettingsRepository):
+    upsert_query = (
+        "insert into symbol_settings (symbol, indicator, amplitude, hyperopted_balance, created_at, updated_at) "
+        "values (?, ?, ?, ?, ?, ?) "
+        "on conflict (symbol) do update set indicator = excluded.indicator, amplitude = excluded.amplitude, "
+        "hyperopted_balance = excluded.hyperopted_balance, updated_at = excluded.updated_at"
+    )
+    placeholder = "?"
+
+    schema = """
+        create table if not exists symbol_settings (
+            id integer primary key autoincrement,
+            symbol varchar(50) not null unique,
+            indicator varchar(50) not null,
+            amplitude varchar(10) not null,
+            hyperopted_balance varchar(50),
+            created_at datetime not null,
+            updated_at datetime
+        )
+    """
+
+    path = 'cache/settings.sqlite'
+
+    def __init__(self, path: str = None):
+        super().__init__()
+
+        if path:
+            self.path = path
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # one connection shared by the settings thread and the event loop, sqlite serializes writes anyway
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute(self.schema)
+        self.lock = threading.Lock()
+
+    def get_connection(self):
+        self.lock.acquire()
+
+        return self.connection
+
+    def release_connection(self, connection):
+        self.lock.release()
+
+
+def create_settings_repository():
+    if os.getenv('SETTINGS_BACKEND') == 'sqlite':
+        return SqliteSettingsRepository(os.getenv('SETTINGS_SQLITE_PATH'))
+
+    return MysqlSettingsRepository()
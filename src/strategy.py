@@ -1,11 +1,17 @@
+import atexit
 import os
 from datetime import datetime
+from math import isnan
 
+import numpy as np
 import pandas as pd
 import binance
-from binance.exceptions import BinanceAPIException
 
 from src.account import Account
+from src.bar import Bar
+from src.exchange_metadata import ExchangeMetadata
+from src.latency import latency, monotonic_ns
+from src.order_executor import Order, OrderExecutor
 from src.setting import Setting
 from src.utils import Utils
 
@@ -19,6 +25,8 @@ class Strategy:
     should_dump_to_csv: bool = False
     live: bool = False
     client: binance.Client = None
+    exchange_metadata: ExchangeMetadata = None
+    order_executor: OrderExecutor = None
 
     def __init__(self, account: Account, setting: Setting):
         self.account = account
@@ -44,12 +52,12 @@ class Strategy:
 
     @staticmethod
     def get_percentage_difference(num_a, num_b):
-        if isinstance(num_a, pd.Series):
+        if isinstance(num_a, (pd.Series, np.ndarray)):
             num_a = num_a.astype("float")
         else:
             num_a = float(num_a)
 
-        if isinstance(num_b, pd.Series):
+        if isinstance(num_b, (pd.Series, np.ndarray)):
             num_b = num_b.astype("float")
         else:
             num_b = float(num_b)
@@ -66,39 +74,48 @@ class Strategy:
 
         self.account.balance = float(usdt_balance['balance'])
 
+    def get_exchange_metadata(self) -> ExchangeMetadata:
+        if self.exchange_metadata is None:
+            ttl = os.getenv("EXCHANGE_METADATA_TTL")
+            self.exchange_metadata = ExchangeMetadata(self.client, ttl=int(ttl) if ttl else None)
+
+        return self.exchange_metadata
+
     def update_leverage(self):
-        info = self.client.futures_leverage_bracket()
+        brackets = self.get_exchange_metadata().get_leverage_brackets()
 
-        for s in self.setting.get_symbols_with_shitcoins():
-            *_, leverage_info = filter(lambda d: d['symbol'] == s, info)
-            leverage_info['brackets'].sort(key=lambda x: x['initialLeverage'], reverse=True)
+        # comment below line to disable
+        # brackets[s][0]['initialLeverage'] = 2
 
-            # comment below line to disable
-            # leverage_info['brackets'][0]['initialLeverage'] = 2
+        # needs to process APIError(code=-2027): Exceeded the maximum allowable position at current leverage.
+        self.setting.set_symbols_setting("leverage", {
+            s: brackets[s][1] for s in self.setting.get_symbols_with_shitcoins()
+        })
 
-            # needs to process APIError(code=-2027): Exceeded the maximum allowable position at current leverage.
-            self.setting.set_symbol_setting(s, "leverage", leverage_info["brackets"][1])
+        changed = self.get_exchange_metadata().change_leverage({
+            # leverage=2
+            s: self.setting.get_symbol_setting(s, "leverage")["initialLeverage"]
+            for s in self.setting.get_symbols_with_shitcoins()
+        })
 
-            # print(s, self.setting.symbols_settings[s]['leverage']['initialLeverage'])
-            self.client.futures_change_leverage(
-                symbol=s,
-                # leverage=2
-                leverage=self.setting.get_symbol_setting(s, "leverage")["initialLeverage"]
-            )
+        if changed:
+            print(f"Leverage changed: {', '.join(changed)}")
 
     def setup_symbols_settings(self):
-        futures_info = self.client.futures_exchange_info()
+        symbols_info = self.get_exchange_metadata().get_symbols_info()
 
-        for s in self.setting.get_symbols_with_shitcoins():
-            *_, symbol_info = filter(lambda d: d['symbol'] == s, futures_info['symbols'])
-
-            self.setting.set_symbol_setting(s, "info", symbol_info)
+        self.setting.set_symbols_setting("info", {
+            s: symbols_info[s] for s in self.setting.get_symbols_with_shitcoins()
+        })
 
     def setup_binance(self):
         self.update_current_balance()
         self.update_leverage()
         self.setup_symbols_settings()
 
+        self.order_executor = OrderExecutor(self.client)
+        atexit.register(self.order_executor.close)
+
     def create_client(self):
         if os.getenv("BINANCE_API_KEY") and os.getenv("BINANCE_API_SECRET"):
             self.client = binance.Client(
@@ -118,17 +135,19 @@ class Strategy:
         if not self.live:
             return self.setting.paper_leverage
 
-        return self.setting.symbols_settings[s]["leverage"]["initialLeverage"]
+        return self.setting.get_symbol_parameters(s).leverage
 
     def get_symbol_quantity_precision(self, s: str):
-        return self.setting.symbols_settings[s]["info"]["quantityPrecision"]
+        return self.setting.get_symbol_parameters(s).quantity_precision
 
     def get_symbol_price_precision(self, s: str):
-        return self.setting.symbols_settings[s]["info"]["pricePrecision"]
+        return self.setting.get_symbol_parameters(s).price_precision
 
-    def calculate_avg_order_entry(self):
-        return sum(item["position_size"] for item in self.setting.last_orders) / sum(
-            item["asset_size"] for item in self.setting.last_orders
+    def calculate_avg_order_entry(self, s: str):
+        last_orders = self.account.positions.last_orders[self.account.positions.get_row(s)]
+
+        return sum(item["position_size"] for item in last_orders) / sum(
+            item["asset_size"] for item in last_orders
         )
 
     def calculate_entry_position_size(self, s: str, high_risk: bool = False):
@@ -142,30 +161,37 @@ class Strategy:
         size = (self.account.balance * risk) * self.get_symbol_leverage(s)
         fee = self.calculate_taker_fee(size)
 
-        self.account.position_fee += fee
+        self.account.positions.position_fee[self.account.positions.get_row(s)] += fee
 
         return size - fee
 
-    def calculate_pnl(self, price: float, reverse: bool = False):
-        entry_price = self.account.entry_price
-        position_size = self.account.position_size
+    def calculate_pnl(self, s: str, price: float, reverse: bool = False):
+        positions = self.account.positions
+        row = positions.get_row(s)
+
+        entry_price = float(positions.entry_price[row])
+        position_size = float(positions.position_size[row])
 
         rate = (entry_price / price) if reverse else (price / entry_price)
 
         return (rate * position_size) - position_size
 
+    def can_open_position(self) -> bool:
+        return self.account.get_open_positions_count() < self.setting.max_open_positions
+
     def open_position(
-        self, s: str, current_price: float, direction: str, current_time: str, atr: float, amplitude: float
+        self, s: str, current_price: float, direction: str, close_time: float, atr: float, amplitude: float
     ):
-        if direction is self.setting.DIRECTION_LONG:
-            self.account.long_position = True
-        else:
-            self.account.short_position = True
+        positions = self.account.positions
+        row = positions.get_row(s)
+
+        snapshot = positions.snapshot(row) if self.live else None
+
+        positions.side[row] = positions.LONG if direction is self.setting.DIRECTION_LONG else positions.SHORT
 
-        self.account.symbol_position = s
-        self.account.entry_price = current_price
-        self.account.position_size = self.calculate_entry_position_size(s)
-        self.account.asset_size = self.account.position_size / self.account.entry_price
+        entry_price = current_price
+        position_size = self.calculate_entry_position_size(s)
+        asset_size = position_size / entry_price
 
         if self.live:
             side = (
@@ -174,72 +200,74 @@ class Strategy:
                 else binance.Client.SIDE_SELL
             )
 
-            response = self.client.futures_create_order(
-                symbol=s,
-                side=side,
-                type=binance.Client.ORDER_TYPE_MARKET,
-                quantity=round(
-                    self.account.asset_size, self.get_symbol_quantity_precision(s)
-                ),
+            # placed off the tick path, the fill price is applied by apply_orders
+            self.order_executor.submit(
+                Order(
+                    s, Order.OPEN, side, round(asset_size, self.get_symbol_quantity_precision(s)),
+                    entry_price, {"position": snapshot},
+                )
             )
 
-            self.utils.logger().info({'futures_create_order': response})
-
-            position = self.client.futures_position_information(symbol=s)[0]
-            self.account.entry_price = float(position["entryPrice"])
-
-            self.utils.logger().info({'futures_position_information': position})
-
-        self.setting.touches = 1
-        self.setting.last_orders = []
+        positions.touches[row] = 1
+        positions.last_orders[row] = []
 
         if direction is self.setting.DIRECTION_LONG:
-            self.account.stop_loss_price = self.account.entry_price * (
+            stop_loss_price = entry_price * (
                 1 - self.setting.stop_loss
             ) * (1 - atr)
-            self.account.take_profit_price = self.account.entry_price * (
+            take_profit_price = entry_price * (
                 1 + self.setting.take_profit
             ) * (1 + atr)
-            self.setting.last_action = self.setting.OPEN_LONG
+            positions.last_action[row] = self.setting.OPEN_LONG
         else:
-            self.account.stop_loss_price = self.account.entry_price * (
+            stop_loss_price = entry_price * (
                 1 + self.setting.stop_loss
             ) * (1 + atr)
-            self.account.take_profit_price = self.account.entry_price * (
+            take_profit_price = entry_price * (
                 1 - self.setting.take_profit
             ) * (1 - atr)
-            self.setting.last_action = self.setting.OPEN_SHORT
+            positions.last_action[row] = self.setting.OPEN_SHORT
+
+        positions.entry_price[row] = entry_price
+        positions.position_size[row] = position_size
+        positions.asset_size[row] = asset_size
+        positions.stop_loss_price[row] = stop_loss_price
+        positions.take_profit_price[row] = take_profit_price
 
         if not self.setting.is_hyperopt:
             self.utils.print_log(
                 {
                     "Symbol": s,
-                    "Time": current_time,
+                    "Time": self.format_time(close_time),
                     "ATR": f"{atr:.5f}",
                     "Amplitude": f"{amplitude:.5f}",
                     "Open": "Long 🟢"
                     if direction is self.setting.DIRECTION_LONG
                     else "Short 🔴",
-                    "Position Size": f"${self.account.position_size:,.4f}",
-                    "Asset Size": f"{self.account.asset_size:.4f}",
-                    "Entry Price": f"{self.account.entry_price:.5f}",
-                    "Stop Loss Price": f"{self.account.stop_loss_price:.5f}",
-                    "Take Profit Price": f"{self.account.take_profit_price:.5f}",
+                    "Position Size": f"${position_size:,.4f}",
+                    "Asset Size": f"{asset_size:.4f}",
+                    "Entry Price": f"{entry_price:.5f}",
+                    "Stop Loss Price": f"{stop_loss_price:.5f}",
+                    "Take Profit Price": f"{take_profit_price:.5f}",
                     "Balance": f"${self.account.balance:,.4f}",
+                    "Open Positions": self.account.get_open_positions_count(),
                 }
             )
 
-        self.setting.last_orders.append(
+        positions.last_orders[row].append(
             {
                 "symbol": s,
-                "last_action": self.setting.last_action,
-                "entry_price": self.account.entry_price,
-                "asset_size": self.account.asset_size,
-                "position_size": self.account.position_size,
+                "last_action": positions.last_action[row],
+                "entry_price": entry_price,
+                "asset_size": asset_size,
+                "position_size": position_size,
             }
         )
 
-    def close_position(self, s: str, pnl: float, direction: str):
+    def close_position(self, s: str, pnl: float, direction: str, close_time: float = None) -> bool:
+        positions = self.account.positions
+        row = positions.get_row(s)
+
         if self.live:
             side = (
                 binance.Client.SIDE_SELL
@@ -247,75 +275,70 @@ class Strategy:
                 else binance.Client.SIDE_BUY
             )
 
-            try:
-                # opposite order
-                opposite_order = self.client.futures_create_order(
-                    symbol=s,
-                    side=side,
-                    type=binance.Client.ORDER_TYPE_MARKET,
-                    quantity=round(
-                        self.account.asset_size, self.get_symbol_quantity_precision(s)
-                    ),
+            # opposite order, the position is closed once it fills
+            self.order_executor.submit(
+                Order(
+                    s, Order.CLOSE, side, round(float(positions.asset_size[row]), self.get_symbol_quantity_precision(s)),
+                    None, {"direction": direction, "close_time": close_time},
                 )
+            )
 
-                self.utils.logger().info({'futures_create_order (opposite_order)': opposite_order})
-            except BinanceAPIException as e:
-                self.utils.print_log(
-                    {
-                        "Symbol": s,
-                        "Exception": " ❗",
-                        "Reason": "At close position",
-                        "Message": e.message,
-                        "Code": e.code,
-                    }
-                )
+            return False
 
-                return
+        self.book_closed_position(s, pnl)
 
-        self.account.long_position = False
-        self.account.short_position = False
+        return True
+
+    def book_closed_position(self, s: str, pnl: float):
+        positions = self.account.positions
+        row = positions.get_row(s)
 
         if pnl <= 0:
-            if self.setting.touches > 1:
+            if positions.touches[row] > 1:
                 self.setting.trailing_loses += 1
             else:
                 self.setting.loses += 1
         else:
             self.setting.wins += 1
 
-        self.account.stop_loss_price = 0
-        self.account.take_profit_price = 0
-
-        fee = self.calculate_maker_fee(self.account.position_size)
-        self.account.position_fee += fee
+        fee = self.calculate_maker_fee(float(positions.position_size[row]))
+        positions.position_fee[row] += fee
 
-        self.setting.touches = 0
-        self.account.position_size = 0
-        self.account.asset_size = 0
+        # a synced balance already has the pnl and fees the exchange booked
+        if not self.account.synced:
+            self.account.balance += pnl - float(positions.position_fee[row])
 
-        self.account.balance += pnl - self.account.position_fee
-
-        self.account.symbol_position = None
+        # the fee stays until the close is logged
+        positions.reset(row)
 
     def manage_opened_position(
-        self, s: str, current_price: float, direction: str, current_time: str, atr: float
+        self, s: str, current_price: float, direction: str, close_time: float, atr: float
     ):
+        positions = self.account.positions
+        row = positions.get_row(s)
+
+        stop_loss_price = float(positions.stop_loss_price[row])
+        take_profit_price = float(positions.take_profit_price[row])
+
         if direction is self.setting.DIRECTION_LONG:
-            exit_condition = current_price <= self.account.stop_loss_price
+            exit_condition = current_price <= stop_loss_price
         else:
-            exit_condition = current_price >= self.account.stop_loss_price
+            exit_condition = current_price >= stop_loss_price
 
         exit_price = (
-            self.account.stop_loss_price
+            stop_loss_price
             if exit_condition
-            else self.account.take_profit_price
+            else take_profit_price
         )
-        pnl = self.calculate_pnl(exit_price, direction is self.setting.DIRECTION_SHORT)
+        pnl = self.calculate_pnl(s, exit_price, direction is self.setting.DIRECTION_SHORT)
 
         if pnl < 0:  # stop loss
-            self.close_position(s, pnl, direction)
+            if not self.close_position(s, pnl, direction, close_time):
+                return
         else:  # take profits
-            if self.setting.touches <= self.setting.max_trailing_takes:  # trailing
+            if positions.touches[row] <= self.setting.max_trailing_takes:  # trailing
+                snapshot = positions.snapshot(row) if self.live else None
+
                 last_action_increase = (
                     self.setting.INCREASE_LONG
                     if direction is self.setting.DIRECTION_LONG
@@ -325,7 +348,7 @@ class Strategy:
                 increase_position_size = self.calculate_entry_position_size(s, True)
                 increase_asset_size = increase_position_size / current_price
 
-                self.setting.last_orders.append(
+                positions.last_orders[row].append(
                     {
                         "symbol": s,
                         "last_action": last_action_increase,
@@ -335,8 +358,8 @@ class Strategy:
                     }
                 )
 
-                self.setting.touches += 1
-                self.account.entry_price = self.calculate_avg_order_entry()
+                positions.touches[row] += 1
+                entry_price = self.calculate_avg_order_entry(s)
 
                 # print('entry_price calculate_avg_order_entry', entry_price)
                 if self.live:
@@ -346,95 +369,165 @@ class Strategy:
                         else binance.Client.SIDE_SELL
                     )
 
-                    # needs to process error:
-                    # APIError(code=-2027): Exceeded the maximum allowable position at current leverage.
-                    response = self.client.futures_create_order(
-                        symbol=s,
-                        side=side,
-                        type=binance.Client.ORDER_TYPE_MARKET,
-                        quantity=round(
-                            increase_asset_size, self.get_symbol_quantity_precision(s)
-                        ),
+                    # APIError(code=-2027): Exceeded the maximum allowable position at current leverage,
+                    # a rejected increase puts the position back as it was
+                    self.order_executor.submit(
+                        Order(
+                            s, Order.INCREASE, side,
+                            round(increase_asset_size, self.get_symbol_quantity_precision(s)),
+                            current_price, {"position": snapshot},
+                        )
                     )
-                    self.utils.logger().info({'futures_create_order (increase)': response})
-
-                    position = self.client.futures_position_information(symbol=s)[0]
-                    self.account.entry_price = float(position["entryPrice"])
-
-                    self.utils.logger().info({'futures_position_information (increase)': position})
 
-                self.account.position_size += increase_position_size
-                self.account.asset_size += increase_asset_size
+                positions.entry_price[row] = entry_price
+                positions.position_size[row] += increase_position_size
+                positions.asset_size[row] += increase_asset_size
 
                 # print('entry_price position', entry_price)
 
                 if direction is self.setting.DIRECTION_LONG:
-                    self.account.stop_loss_price = self.account.entry_price * (
+                    stop_loss_price = entry_price * (
                         1 - self.setting.trailing_stop_loss
                     ) * (1 - atr)
-                    self.account.take_profit_price = self.account.entry_price * (
+                    take_profit_price = entry_price * (
                         1 + self.setting.trailing_take_profit
                     ) * (1 + atr)
                 else:
-                    self.account.stop_loss_price = self.account.entry_price * (
+                    stop_loss_price = entry_price * (
                         1 + self.setting.trailing_stop_loss
                     ) * (1 + atr)
-                    self.account.take_profit_price = self.account.entry_price * (
+                    take_profit_price = entry_price * (
                         1 - self.setting.trailing_take_profit
                     ) * (1 - atr)
 
+                positions.stop_loss_price[row] = stop_loss_price
+                positions.take_profit_price[row] = take_profit_price
+
                 if not self.setting.is_hyperopt:
                     self.utils.print_log(
                         {
                             "Symbol": s,
-                            "Time": current_time,
-                            f"Increase {direction}": self.setting.touches - 1,
-                            "Position Size": f"${self.account.position_size:,.4f}",
-                            "Asset Size": f"{self.account.asset_size:.4f}",
-                            "Entry Price": f"{self.account.entry_price:.5f}",
-                            "Stop Loss Price": f"{self.account.stop_loss_price:.5f}",
-                            "Take Profit Price": f"{self.account.take_profit_price:.5f}",
+                            "Time": self.format_time(close_time),
+                            f"Increase {direction}": int(positions.touches[row]) - 1,
+                            "Position Size": f"${positions.position_size[row]:,.4f}",
+                            "Asset Size": f"{positions.asset_size[row]:.4f}",
+                            "Entry Price": f"{entry_price:.5f}",
+                            "Stop Loss Price": f"{stop_loss_price:.5f}",
+                            "Take Profit Price": f"{take_profit_price:.5f}",
                         }
                     )
 
                 return
             else:  # absolute take profit
-                self.close_position(s, pnl, direction)
+                if not self.close_position(s, pnl, direction, close_time):
+                    return
+
+        self.log_closed_position(s, direction, close_time, pnl, exit_price)
+
+    def log_closed_position(self, s: str, direction: str, close_time: float, pnl: float, exit_price: float):
+        positions = self.account.positions
+        row = positions.get_row(s)
 
         if not self.setting.is_hyperopt:
             self.utils.print_log(
                 {
                     "Symbol": s,
-                    "Time": current_time,
+                    "Time": self.format_time(close_time),
                     "Close": f"{direction} 🔵️",
                     "Clear Pnl": f"${pnl:,.4f}",
-                    "Fee": f"$-{self.account.position_fee:,.4f}",
-                    "Entry Price": f"{self.account.entry_price:.5f}",
+                    "Fee": f"$-{positions.position_fee[row]:,.4f}",
+                    "Entry Price": f"{positions.entry_price[row]:.5f}",
                     "Exit Price": f"{exit_price:.5f}",
                     "Balance": f"${self.account.balance:,.4f}",
                 }
             )
 
-        self.account.position_fee = 0
+        positions.position_fee[row] = 0
+
+    def apply_orders(self):
+        # runs on the tick thread, so the position book is only ever changed from one thread
+        for order in self.order_executor.drain():
+            self.utils.logger().info({'order': order.to_dict()})
+
+            if order.state != Order.FILLED:
+                self.reject_order(order)
+            elif order.kind == Order.CLOSE:
+                self.fill_close_order(order)
+            else:
+                self.fill_entry_order(order)
+
+    def fill_entry_order(self, order: Order):
+        s = order.symbol
+        positions = self.account.positions
+        row = positions.get_row(s)
+
+        # the planned order becomes the filled one, so the book holds exactly what the exchange holds
+        last_order = positions.last_orders[row][-1]
+        last_order["entry_price"] = order.avg_price
+        last_order["asset_size"] = order.filled_quantity or order.quantity
+        last_order["position_size"] = last_order["asset_size"] * order.avg_price
+
+        entry_price = order.avg_price if order.kind == Order.OPEN else self.calculate_avg_order_entry(s)
+
+        # stop loss and take profit are proportional to the entry price
+        ratio = entry_price / float(positions.entry_price[row])
+
+        positions.entry_price[row] = entry_price
+        positions.position_size[row] = sum(item["position_size"] for item in positions.last_orders[row])
+        positions.asset_size[row] = sum(item["asset_size"] for item in positions.last_orders[row])
+        positions.stop_loss_price[row] *= ratio
+        positions.take_profit_price[row] *= ratio
+
+    def fill_close_order(self, order: Order):
+        s = order.symbol
+        direction = order.context["direction"]
+
+        pnl = self.calculate_pnl(s, order.avg_price, direction is self.setting.DIRECTION_SHORT)
+        self.book_closed_position(s, pnl)
+
+        self.log_closed_position(s, direction, order.context["close_time"], pnl, order.avg_price)
+
+    def reject_order(self, order: Order):
+        s = order.symbol
+
+        # rejected or failed means the exchange has no such order, an unknown outcome never gets here
+        if order.kind != Order.CLOSE:
+            positions = self.account.positions
+            positions.restore(positions.get_row(s), order.context["position"])
+
+        error = order.error if isinstance(order.error, dict) else {"message": order.error}
+
+        self.utils.print_log(
+            {
+                "Symbol": s,
+                "Exception": " ❗",
+                "Reason": f"At {order.kind} position",
+                "Message": error.get("message"),
+                "Code": error.get("code"),
+            }
+        )
 
     # still development
     def is_amplitude_valid(self, s: str, actual_amplitude: float) -> bool:
         actual_amplitude = abs(actual_amplitude)
 
+        positions = self.account.positions
+        row = positions.get_row(s)
+
         if actual_amplitude >= self.setting.ema_amplitude:
-            if s not in self.setting.amplitude_manager \
-                    or (s in self.setting.amplitude_manager and self.setting.amplitude_manager[s] < actual_amplitude):
-                self.setting.amplitude_manager[s] = actual_amplitude
+            peak_amplitude = float(positions.peak_amplitude[row])
 
-            if actual_amplitude < self.setting.amplitude_manager[s]:
-                amplitude_diff = self.get_percentage_difference(self.setting.amplitude_manager[s], actual_amplitude)
+            if isnan(peak_amplitude) or peak_amplitude < actual_amplitude:
+                positions.peak_amplitude[row] = peak_amplitude = actual_amplitude
+
+            if actual_amplitude < peak_amplitude:
+                amplitude_diff = self.get_percentage_difference(peak_amplitude, actual_amplitude)
 
                 if amplitude_diff >= self.setting.trailing_amplitude_diff: #  and actual_amplitude >= 4.8
                     print(f'Diff: amplitude_diff {amplitude_diff}, actual_amplitude {actual_amplitude}')
                     return True
         else:
-            if s in self.setting.amplitude_manager:
-                del self.setting.amplitude_manager[s]
+            positions.peak_amplitude[row] = np.nan
 
         return False
 
@@ -446,24 +539,31 @@ class Strategy:
 
         return atr
 
-    def process_kline_event(self, s: str, df_data: pd.DataFrame, current_price: float):
-        current_time = datetime.fromtimestamp(
-            int(float(df_data.close_time)) / 1000
-        ).strftime("%Y-%m-%d %H:%M:%S")
+    @staticmethod
+    def format_time(close_time) -> str:
+        return datetime.fromtimestamp(int(float(close_time)) / 1000).strftime("%Y-%m-%d %H:%M:%S")
 
-        if pd.isna(df_data.ema9) or pd.isna(df_data.ema20) or pd.isna(df_data.ema55):
+    def process_kline_event(self, s: str, bar: Bar, current_price: float):
+        if isnan(bar.ema9) or isnan(bar.ema20) or isnan(bar.ema55):
             return
 
+        if self.order_executor is not None:
+            self.apply_orders()
+
+            # nothing is decided for a symbol while its order is in flight, or while the exchange disagrees on it
+            if self.order_executor.is_pending(s) or s in self.account.halted:
+                return
+
         if self.account.balance <= 0:
             print(
-                f"Time: {current_time}, LIQUIDATION! Balance: {self.account.balance:.5f}"
+                f"Time: {self.format_time(bar.close_time)}, LIQUIDATION! Balance: {self.account.balance:.5f}"
             )
             self.liquidation_callback(self)
             return
 
-        actual_amplitude = self.get_percentage_difference(
-            current_price, float(df_data[self.setting.get_symbol_setting(s, 'indicator')])
-        )
+        parameters = self.setting.get_symbol_parameters(s)
+
+        actual_amplitude = self.get_percentage_difference(current_price, bar.values[parameters.indicator_index])
 
         # if self.setting.is_back_test:
         #     if abs(actual_amplitude) >= self.setting.ema_amplitude:
@@ -472,10 +572,15 @@ class Strategy:
         if self.setting.use_trailing_entry:
             is_amplitude_valid = self.is_amplitude_valid(s, actual_amplitude)
         else:
-            is_amplitude_valid = abs(actual_amplitude) >= self.setting.get_symbol_setting(s, 'amplitude')
+            is_amplitude_valid = abs(actual_amplitude) >= parameters.amplitude
 
         if self.should_dump_to_csv:
-            self.utils.dump_to_csv(s, df_data, current_price)
+            started = monotonic_ns() if latency.enabled else 0
+
+            self.utils.dump_event(s, bar, current_price)
+
+            if started:
+                latency.record("dump", s, started)
 
         # print(
         #     f"Symbol: {s}, Current price: {current_price}, "
@@ -485,58 +590,80 @@ class Strategy:
         #     f"Is Amplitude Valid: {is_amplitude_valid}"
         # )
 
+        positions = self.account.positions
+        row = positions.get_row(s)
+        side = positions.side[row]
+
         if (
-            self.account.long_position
-            and s == self.account.symbol_position
+            side == positions.LONG
             and (
-                current_price <= self.account.stop_loss_price
-                or current_price >= self.account.take_profit_price
+                current_price <= positions.stop_loss_price[row]
+                or current_price >= positions.take_profit_price[row]
             )
         ):
+            started = monotonic_ns() if latency.enabled else 0
+
             self.manage_opened_position(
-                s, current_price, self.setting.DIRECTION_LONG, current_time, self.fix_atr(df_data.atr14)
+                s, current_price, self.setting.DIRECTION_LONG, bar.close_time, self.fix_atr(bar.atr14)
             )
+
+            if started:
+                latency.record("manage_position", s, started)
             return
 
         if (
-            self.account.short_position
-            and s == self.account.symbol_position
+            side == positions.SHORT
             and (
-                current_price >= self.account.stop_loss_price
-                or current_price <= self.account.take_profit_price
+                current_price >= positions.stop_loss_price[row]
+                or current_price <= positions.take_profit_price[row]
             )
         ):
+            started = monotonic_ns() if latency.enabled else 0
+
             self.manage_opened_position(
-                s, current_price, self.setting.DIRECTION_SHORT, current_time, self.fix_atr(df_data.atr14)
+                s, current_price, self.setting.DIRECTION_SHORT, bar.close_time, self.fix_atr(bar.atr14)
             )
+
+            if started:
+                latency.record("manage_position", s, started)
             return
 
         if (
-            not self.account.short_position
-            and not self.account.long_position
-            and self.setting.touches == 0
-            and current_price > float(df_data.ema9)
-            and current_price > float(df_data.ema20)
-            and current_price > float(df_data.ema50)
+            side == positions.FLAT
+            and positions.touches[row] == 0
+            and current_price > bar.ema9
+            and current_price > bar.ema20
+            and current_price > bar.ema50
             and actual_amplitude > 0
             and is_amplitude_valid
+            and self.can_open_position()
         ):
+            started = monotonic_ns() if latency.enabled else 0
+
             self.open_position(
                 s, current_price, self.setting.DIRECTION_SHORT,
-                current_time, self.fix_atr(df_data.atr14), abs(actual_amplitude)
+                bar.close_time, self.fix_atr(bar.atr14), abs(actual_amplitude)
             )
 
+            if started:
+                latency.record("open_position", s, started)
+
         if (
-            not self.account.long_position
-            and not self.account.short_position
-            and self.setting.touches == 0
-            and current_price < float(df_data.ema9)
-            and current_price < float(df_data.ema20)
-            and current_price < float(df_data.ema50)
+            positions.side[row] == positions.FLAT
+            and positions.touches[row] == 0
+            and current_price < bar.ema9
+            and current_price < bar.ema20
+            and current_price < bar.ema50
             and actual_amplitude < 0
             and is_amplitude_valid
+            and self.can_open_position()
         ):
+            started = monotonic_ns() if latency.enabled else 0
+
             self.open_position(
                 s, current_price, self.setting.DIRECTION_LONG,
-                current_time, self.fix_atr(df_data.atr14), abs(actual_amplitude)
+                bar.close_time, self.fix_atr(bar.atr14), abs(actual_amplitude)
             )
+
+            if started:
+                latency.record("open_position", s, started)
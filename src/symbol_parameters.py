@@ -0,0 +1,27 @@
+from src.bar import Bar
+
+
+class SymbolParameters:
+    __slots__ = ("indicator", "indicator_index", "amplitude", "leverage", "quantity_precision", "price_precision")
+
+    def __init__(self, indicator: str, amplitude: float, leverage: int = None,
+                 quantity_precision: int = None, price_precision: int = None):
+        self.indicator = indicator
+        self.indicator_index = Bar.column_index[indicator]
+        self.amplitude = amplitude
+        self.leverage = leverage
+        self.quantity_precision = quantity_precision
+        self.price_precision = price_precision
+
+    @classmethod
+    def compile(cls, settings: dict, indicator: str, amplitude: float) -> "SymbolParameters":
+        leverage = settings.get("leverage")
+        info = settings.get("info")
+
+        return cls(
+            settings.get("indicator", indicator),
+            settings.get("amplitude", amplitude),
+            leverage["initialLeverage"] if leverage else None,
+            info["quantityPrecision"] if info else None,
+            info["pricePrecision"] if info else None,
+        )
@@ -1,17 +1,25 @@
+import atexit
 import csv
 import logging
 import sys
 import os
 
-import requests
 from prettytable import PrettyTable
 
+from src.kline_log import KlineLog, KlineLogWriter
+from src.latency import latency, monotonic_ns
+from src.notifier import TelegramNotifier
+
 
 class Utils:
-    event_log = 'logs/{0}.csv'
+    event_log = 'logs/{0}' + KlineLog.csv_extension
+    binary_event_log = 'logs/{0}' + KlineLog.binary_extension
 
     def __init__(self, ENV: str = "local"):
         self.ENV = ENV
+        self.dump_format = os.getenv("DUMP_FORMAT") or "csv"
+        self.log_writers = {}
+        self.notifier = None
 
     @staticmethod
     def logger():
@@ -21,6 +29,8 @@ class Utils:
         return logging
 
     def print_log(self, data):
+        started = monotonic_ns() if latency.enabled else 0
+
         telegram_text = "Env: " + self.ENV + "\n"
 
         self.logger().info(data)
@@ -28,30 +38,51 @@ class Utils:
         for key, value in data.items():
             telegram_text += str(key) + ": " + str(value) + "\n"
 
-        if os.getenv("TELEGRAM_CHAT_ID") and os.getenv("TELEGRAM_BOT_ID"):
-            send_text = (
-                "https://api.telegram.org/bot"
-                + os.getenv("TELEGRAM_BOT_ID")
-                + "/sendMessage?chat_id="
-                + str(os.getenv("TELEGRAM_CHAT_ID"))
-                + "&parse_mode=html&text="
-                + telegram_text
-            )
+        notifier = self.get_notifier()
+        if notifier:
+            notifier.send(telegram_text)
+
+        if started:
+            latency.record("log", data.get("Symbol", "-"), started)
+
+    def get_notifier(self):
+        if self.notifier is None and os.getenv("TELEGRAM_CHAT_ID") and os.getenv("TELEGRAM_BOT_ID"):
+            self.notifier = TelegramNotifier(os.getenv("TELEGRAM_BOT_ID"), str(os.getenv("TELEGRAM_CHAT_ID")))
+
+            atexit.register(self.notifier.close)
+
+        return self.notifier
+
+    def dump_event(self, s, bar, current_price):
+        if self.dump_format == "csv":
+            self.dump_to_csv(s, bar, current_price)
+        else:
+            self.dump_to_binary(s, bar, current_price)
+
+    def dump_to_binary(self, s, bar, current_price):
+        if s not in self.log_writers:
+            path = self.binary_event_log.format(s)
+
+            # find_logs prefers the binary log, so the csv history moves into it before the first row
+            if not os.path.exists(path) and os.path.isfile(self.event_log.format(s)):
+                KlineLogWriter.convert_csv(self.event_log.format(s), path)
+
+            self.log_writers[s] = KlineLogWriter(path)
+
+        row = list(bar.values)
+        row.append(current_price)
+
+        self.log_writers[s].append(row)
 
-            response = requests.get(send_text)
+    def flush_logs(self):
+        for writer in self.log_writers.values():
+            writer.flush()
 
-    def dump_to_csv(self, s, event_data, current_price):
-        row = event_data.values.tolist()
+    def dump_to_csv(self, s, bar, current_price):
+        row = list(bar.values)
         row.append(current_price)
 
-        headers = [
-            'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'trades',
-            'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore',
-            'ema5', 'ema9', 'ema10', 'ema15', 'ema20', 'ema25', 'ema30', 'ema35', 'ema40', 'ema45', 'ema50', 'ema55',
-            'ema60', 'ema65', 'ema70', 'ema75', 'ema80', 'ema85', 'ema90',
-            'wma14', 'atr14', 'rsi14',
-            'current_price'
-        ]
+        headers = KlineLog.headers
 
         if not os.path.isfile(self.event_log.format(s)):
             with open(self.event_log.format(s), 'w', newline='') as out_csv:
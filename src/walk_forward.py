@@ -0,0 +1,291 @@
+import datetime
+import os
+import shutil
+import zlib
+from multiprocessing import Pool
+
+import numpy as np
+
+from src.account import Account
+from src.batch_backtest import BatchBacktest
+from src.grid_backtest import GridBacktest
+from src.hyperopt_executor import create_pool, get_shared_columns, share_log
+from src.kline_log import KlineLog
+from src.setting import Setting
+from src.strategy import Strategy
+
+day = 86400000
+
+
+def create_strategy(balance: float, indicator: str, amplitude: float = None) -> Strategy:
+    setting = Setting()
+    setting.is_back_test = True
+    setting.is_hyperopt = True
+    setting.indicator = indicator
+
+    if amplitude is not None:
+        setting.ema_amplitude = amplitude
+
+    return Strategy(Account(balance), setting)
+
+
+def slice_columns(columns: dict, start: int, end: int) -> dict:
+    return {column: values[start:end] for column, values in columns.items()}
+
+
+def run_train_task(task: tuple) -> tuple:
+    index, symbol, indicator, amplitudes, balance, path, start, end = task
+
+    columns = slice_columns(get_shared_columns(symbol, path), start, end)
+    result = GridBacktest(create_strategy(balance, indicator)).run(symbol, columns, amplitudes)
+
+    return index, result
+
+
+def run_test_task(task: tuple) -> tuple:
+    index, symbol, indicator, amplitude, balance, path, start, end = task
+
+    strategy = create_strategy(balance, indicator, amplitude)
+    BatchBacktest(strategy).run(symbol, slice_columns(get_shared_columns(symbol, path), start, end))
+
+    setting = strategy.setting
+
+    return index, {
+        "balance": strategy.account.balance,
+        "wins": setting.wins,
+        "loses": setting.loses,
+        "trailing_loses": setting.trailing_loses,
+    }
+
+
+class WalkForward:
+    cache_path = 'cache/walk_forward'
+    shared_path = 'cache/walk_forward/shared'
+    chunk_size = 1
+
+    # bump when the strategy changes in a way the settings below do not capture
+    version = 1
+
+    def __init__(self, processes: int, balance: float, train_days: int = 30, test_days: int = 7,
+                 step_days: int = None):
+        self.processes = processes
+        self.balance = balance
+        self.train = train_days * day
+        self.test = test_days * day
+        self.step = (step_days or test_days) * day
+
+    def get_windows(self, close_time: np.ndarray) -> list:
+        # windows are aligned to the epoch, not to the log, so appending rows never moves an existing one
+        if not len(close_time):
+            return []
+
+        first = int(close_time[0]) // day * day
+        end = (int(close_time[-1]) + 1) // self.step * self.step
+
+        windows = []
+        test_start = -(-(first + self.train) // self.step) * self.step
+
+        while test_start <= end:
+            windows.append((test_start - self.train, test_start, test_start + self.test))
+            test_start += self.step
+
+        return windows
+
+    def get_config_key(self, indicators: list, amplitudes: list) -> int:
+        setting = Setting()
+
+        return zlib.crc32(repr((
+            self.version, self.balance, indicators, amplitudes,
+            setting.paper_leverage, setting.stop_loss, setting.take_profit,
+            setting.trailing_stop_loss, setting.trailing_take_profit, setting.max_trailing_takes,
+            setting.max_atr_value, setting.low_risk_per_trade, setting.high_risk_per_trade,
+            setting.taker_fee, setting.maker_fee, setting.use_trailing_entry, setting.trailing_amplitude_diff,
+        )).encode())
+
+    @staticmethod
+    def get_data_key(columns: dict, start: int, end: int) -> int:
+        # a rewritten log changes the prices of the window, an appended one does not
+        key = zlib.crc32(np.ascontiguousarray(columns['close_time'][start:end]).tobytes())
+
+        return zlib.crc32(np.ascontiguousarray(columns['current_price'][start:end]).tobytes(), key)
+
+    def get_cache_file(self, symbol: str, kind: str, start: int, end: int, key: int) -> str:
+        return os.path.join(self.cache_path, symbol, f'{kind}-{start}-{end}-{key:08x}.npz')
+
+    @staticmethod
+    def load(path: str) -> dict:
+        if not os.path.isfile(path):
+            return None
+
+        with np.load(path) as result:
+            return {key: result[key] for key in result.files}
+
+    @staticmethod
+    def save(path: str, result: dict):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as out_file:
+            np.savez(out_file, **result)
+
+        os.replace(temporary_path, path)
+
+    def run_tasks(self, pool: Pool, worker: callable, tasks: list) -> list:
+        results = [None] * len(tasks)
+
+        for i, (index, result) in enumerate(pool.imap_unordered(worker, tasks, chunksize=self.chunk_size), 1):
+            results[index] = result
+
+            if i % 10 == 0 or i == len(tasks):
+                print(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), f'Tasks {i}/{len(tasks)}')
+
+        return results
+
+    def select(self, grid: dict, indicators: list, amplitudes: list) -> tuple:
+        # first combination in grid order wins ties, like the full history search
+        balance = grid["balance"]
+        if not balance.size or balance.max() <= self.balance:
+            return None, None, self.balance
+
+        i, j = np.unravel_index(int(np.argmax(balance)), balance.shape)
+
+        return indicators[i], amplitudes[j], float(balance[i, j])
+
+    def run(self, log_files: dict, indicators: list, amplitudes: list) -> dict:
+        os.makedirs(self.shared_path, exist_ok=True)
+
+        config_key = self.get_config_key(indicators, amplitudes)
+        amplitudes = [float(amplitude) for amplitude in amplitudes]
+
+        best = {}
+
+        try:
+            with create_pool(self.processes) as pool:
+                paths = {}
+                for symbol, path, rows in pool.imap_unordered(share_log, [
+                    (path, symbol, self.shared_path, None) for symbol, path in log_files.items()
+                ]):
+                    print(f'Shared symbol {symbol}, rows {rows}')
+                    paths[symbol] = path
+
+                windows = {}
+                pending = []
+                train_tasks = []
+                for symbol in sorted(paths):
+                    columns = KlineLog.read_binary(paths[symbol])
+                    close_time = columns['close_time']
+
+                    windows[symbol] = []
+                    for train_start, test_start, test_end in self.get_windows(close_time):
+                        start, middle, end = np.searchsorted(close_time, [train_start, test_start, test_end]).tolist()
+
+                        # a gap in the log can leave nothing to train on
+                        if start == middle:
+                            continue
+
+                        window = {
+                            "train_start": train_start,
+                            "test_start": test_start,
+                            "test_end": test_end,
+                            "rows": (start, middle, end),
+                            "complete": int(close_time[-1]) + 1 >= test_end,
+                            "grid_file": self.get_cache_file(
+                                symbol, 'grid', train_start, test_start,
+                                zlib.crc32(str(config_key).encode(), self.get_data_key(columns, start, middle))
+                            ),
+                            "test_data_key": self.get_data_key(columns, middle, end),
+                        }
+                        window["grid"] = self.load(window["grid_file"])
+                        windows[symbol].append(window)
+
+                        if window["grid"] is not None:
+                            continue
+
+                        # only windows that are not cached yet are replayed
+                        pending.append(window)
+                        for indicator in indicators:
+                            train_tasks.append((
+                                len(train_tasks), symbol, indicator, amplitudes, self.balance,
+                                paths[symbol], start, middle
+                            ))
+
+                print(f'Train tasks {len(train_tasks)}')
+                train_results = self.run_tasks(pool, run_train_task, train_tasks)
+
+                # tasks were created window by window, one per indicator
+                for i, window in enumerate(pending):
+                    results = train_results[i * len(indicators):(i + 1) * len(indicators)]
+
+                    window["grid"] = {key: np.stack([result[key] for result in results]) for key in results[0]}
+                    self.save(window["grid_file"], window["grid"])
+
+                test_tasks = []
+                for symbol in sorted(windows):
+                    for window in windows[symbol]:
+                        indicator, amplitude, train_balance = self.select(window["grid"], indicators, amplitudes)
+                        window.update(indicator=indicator, amplitude=amplitude, train_balance=train_balance)
+                        window["test"] = None
+
+                        # out of sample scoring needs the whole test window
+                        if not window["complete"] or indicator is None:
+                            continue
+
+                        _, middle, end = window["rows"]
+                        window["test_file"] = self.get_cache_file(
+                            symbol, 'test', window["test_start"], window["test_end"],
+                            zlib.crc32(f'{config_key}-{indicator}-{amplitude}'.encode(), window["test_data_key"])
+                        )
+                        window["test"] = self.load(window["test_file"])
+
+                        if window["test"] is None:
+                            window["test_task"] = len(test_tasks)
+                            test_tasks.append((
+                                len(test_tasks), symbol, indicator, amplitude, self.balance, paths[symbol], middle, end
+                            ))
+
+                print(f'Test tasks {len(test_tasks)}')
+                test_results = self.run_tasks(pool, run_test_task, test_tasks)
+        finally:
+            shutil.rmtree(self.shared_path, ignore_errors=True)
+
+        for symbol in sorted(windows):
+            for window in windows[symbol]:
+                if "test_task" in window:
+                    window["test"] = {key: np.array(value) for key, value in test_results[window["test_task"]].items()}
+                    self.save(window["test_file"], window["test"])
+
+            best[symbol] = self.summarize(windows[symbol])
+
+        return best
+
+    def summarize(self, windows: list) -> dict:
+        # out of sample results compound from one test window to the next, windows without params stay flat
+        balance = self.balance
+        wins = loses = trailing_loses = 0
+        scored = 0
+
+        for window in windows:
+            test = window["test"]
+            if test is None:
+                continue
+
+            balance *= float(test["balance"]) / self.balance
+            wins += int(test["wins"])
+            loses += int(test["loses"])
+            trailing_loses += int(test["trailing_loses"])
+            scored += 1
+
+        # the latest train window picks the parameters to trade with next
+        last = windows[-1] if windows else {}
+
+        return {
+            "indicator": last.get("indicator"),
+            "amplitude": last.get("amplitude"),
+            "train_balance": last.get("train_balance", self.balance),
+            "balance": balance,
+            "wins": wins,
+            "loses": loses,
+            "trailing_loses": trailing_loses,
+            "windows": len(windows),
+            "scored_windows": scored,
+        }
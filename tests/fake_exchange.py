@@ -0,0 +1,205 @@
+import itertools
+import threading
+import time
+
+from binance.exceptions import BinanceAPIException
+from requests.exceptions import ReadTimeout
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+
+# a local stand-in for the futures endpoints of binance.Client the bot calls, with a fixed round trip latency,
+# fills come back in the order response and, like the user data stream, to every listener
+class FakeExchange:
+    rejection = '{"code": -2027, "msg": "Exceeded the maximum allowable position at current leverage."}'
+    reduce_only_rejection = '{"code": -2022, "msg": "ReduceOnly Order is rejected."}'
+    not_found = '{"code": -2013, "msg": "Order does not exist."}'
+
+    def __init__(self, balance: float = 500., latency: float = 0.05, fill_in_response: bool = True,
+                 leverage: int = 20):
+        self.balance = balance
+        self.latency = latency
+        self.fill_in_response = fill_in_response
+        self.default_leverage = leverage
+
+        self.prices = {}
+        self.positions = {}
+        self.leverage = {}
+        self.rejected_symbols = set()
+        self.timeouts = {}
+        self.split_symbols = set()
+        self.orders = {}
+        self.listeners = []
+        self.order_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def set_price(self, s: str, price: float):
+        self.prices[s] = price
+
+    def reject(self, s: str):
+        self.rejected_symbols.add(s)
+
+    def time_out(self, s: str, executed: bool):
+        # the next order of the symbol times out on the client, after or before the exchange executed it
+        self.timeouts[s] = executed
+
+    def split(self, s: str):
+        # the next order of the symbol fills in two halves, the response only carries the first one
+        self.split_symbols.add(s)
+
+    def subscribe(self, listener: callable):
+        self.listeners.append(listener)
+
+    def publish(self, event: dict):
+        for listener in self.listeners:
+            listener(event)
+
+    def round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_position(self, s: str) -> dict:
+        return self.positions.setdefault(s, {"amount": 0., "entry_price": 0.})
+
+    def trade(self, s: str, side: str, quantity: float, price: float):
+        # one-way mode, a fill moves the position towards long or short and realizes pnl on the way
+        position = self.get_position(s)
+        amount = quantity if side == "BUY" else -quantity
+
+        if position["amount"] and (position["amount"] > 0) != (amount > 0):
+            closed = min(abs(amount), abs(position["amount"]))
+            direction = 1 if position["amount"] > 0 else -1
+            self.balance += closed * (price - position["entry_price"]) * direction
+
+            position["amount"] += amount
+            if abs(position["amount"]) < 1e-12:
+                position["amount"], position["entry_price"] = 0., 0.
+            elif (position["amount"] > 0) == (amount > 0):
+                position["entry_price"] = price
+        else:
+            total = position["amount"] + amount
+            position["entry_price"] = (
+                (position["entry_price"] * abs(position["amount"]) + price * abs(amount)) / abs(total)
+            )
+            position["amount"] = total
+
+    def create_order_update(self, order: dict) -> dict:
+        return {
+            "e": "ORDER_TRADE_UPDATE",
+            "E": int(time.time() * 1000),
+            "o": {
+                "s": order["symbol"], "c": order["clientOrderId"], "S": order["side"], "o": order["type"],
+                "q": order["origQty"], "ap": order["avgPrice"], "X": order["status"], "i": order["orderId"],
+                "z": order["executedQty"],
+            },
+        }
+
+    def create_account_update(self, s: str) -> dict:
+        position = self.get_position(s)
+
+        return {
+            "e": "ACCOUNT_UPDATE",
+            "E": int(time.time() * 1000),
+            "a": {
+                "m": "ORDER",
+                "B": [{"a": "USDT", "wb": str(self.balance), "cw": str(self.balance)}],
+                "P": [{"s": s, "pa": str(position["amount"]), "ep": str(position["entry_price"])}],
+            },
+        }
+
+    def futures_create_order(self, symbol: str, side: str, type: str, quantity: float,
+                             newClientOrderId: str = None, newOrderRespType: str = "ACK", **params) -> dict:
+        self.round_trip()
+
+        executed = self.timeouts.pop(symbol, None)
+        if executed is False:
+            raise ReadTimeout("Read timed out")
+
+        if symbol in self.rejected_symbols:
+            raise BinanceAPIException(FakeResponse(400, self.rejection), 400, self.rejection)
+
+        price = self.prices[symbol]
+        quantity = float(quantity)
+
+        with self.lock:
+            if params.get("reduceOnly") in (True, "true"):
+                amount = self.get_position(symbol)["amount"]
+
+                # a reduce only market order is cut to the position, and rejected when there is nothing to reduce
+                if not amount or (amount > 0) == (side == "BUY"):
+                    raise BinanceAPIException(
+                        FakeResponse(400, self.reduce_only_rejection), 400, self.reduce_only_rejection
+                    )
+
+                quantity = min(quantity, abs(amount))
+
+            self.trade(symbol, side, quantity, price)
+
+            order = {
+                "orderId": next(self.order_ids),
+                "symbol": symbol,
+                "clientOrderId": newClientOrderId,
+                "side": side,
+                "type": type,
+                "origQty": str(quantity),
+                "executedQty": str(quantity),
+                "avgPrice": str(price),
+                "status": "FILLED",
+            }
+            self.orders[newClientOrderId] = order
+
+        if symbol in self.split_symbols:
+            self.split_symbols.discard(symbol)
+
+            response = dict(order, status="PARTIALLY_FILLED", executedQty=str(quantity / 2))
+            self.publish(self.create_order_update(response))
+        elif self.fill_in_response and newOrderRespType == "RESULT":
+            response = order
+        else:
+            response = dict(order, status="NEW", executedQty="0", avgPrice="0.00000")
+
+        self.publish(self.create_order_update(order))
+        self.publish(self.create_account_update(symbol))
+
+        if executed:
+            raise ReadTimeout("Read timed out")
+
+        return response
+
+    def futures_get_order(self, symbol: str, origClientOrderId: str = None, **params) -> dict:
+        self.round_trip()
+
+        if origClientOrderId not in self.orders:
+            raise BinanceAPIException(FakeResponse(400, self.not_found), 400, self.not_found)
+
+        return self.orders[origClientOrderId]
+
+    def futures_position_information(self, symbol: str = None, **params) -> list:
+        self.round_trip()
+
+        symbols = [symbol] if symbol else sorted(set(self.positions) | set(self.leverage))
+
+        return [
+            {
+                "symbol": s,
+                "positionAmt": str(self.get_position(s)["amount"]),
+                "entryPrice": str(self.get_position(s)["entry_price"]),
+                "leverage": str(self.leverage.get(s, self.default_leverage)),
+            }
+            for s in symbols
+        ]
+
+    def futures_account_balance(self, **params) -> list:
+        self.round_trip()
+
+        return [{"asset": "USDT", "balance": str(self.balance)}]
+
+    def futures_change_leverage(self, symbol: str, leverage: int, **params) -> dict:
+        self.round_trip()
+        self.leverage[symbol] = leverage
+
+        return {"symbol": symbol, "leverage": leverage}
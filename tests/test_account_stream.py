@@ -0,0 +1,176 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from src.account import Account
+from src.account_stream import AccountStream
+from src.order_executor import Order, OrderExecutor
+from src.position_book import PositionBook
+from tests.fake_exchange import FakeExchange
+
+
+class FakeAsyncClient:
+    # the user data endpoints of binance.AsyncClient the stream calls
+    def __init__(self, tld: str = 'com', testnet: bool = False):
+        self.tld = tld
+        self.testnet = testnet
+        self.calls = []
+
+    async def futures_stream_get_listen_key(self) -> str:
+        self.calls.append("listen_key")
+        return "key1"
+
+    async def futures_stream_keepalive(self, listen_key: str):
+        self.calls.append("keepalive")
+
+    async def futures_account_balance(self) -> list:
+        self.calls.append("balance")
+        return [{"asset": "USDT", "balance": "500"}]
+
+    async def futures_position_information(self) -> list:
+        self.calls.append("positions")
+        return [{"symbol": "AAAUSDT", "positionAmt": "1", "entryPrice": "10"}]
+
+
+def create_stream(book: dict, exchange: dict) -> AccountStream:
+    account = Account(500.)
+
+    for s, side in book.items():
+        row = account.positions.get_row(s)
+        account.positions.side[row] = side
+        account.positions.asset_size[row] = 1.
+        account.positions.last_orders[row] = [{"symbol": s, "asset_size": 1.}]
+
+    stream = AccountStream(account)
+    stream.apply_snapshot(
+        [{"asset": "USDT", "balance": "500"}],
+        [{"symbol": s, "positionAmt": str(amount), "entryPrice": "10"} for s, amount in exchange.items()],
+        1,
+    )
+
+    return stream
+
+
+def test_book_position_the_exchange_does_not_hold_is_closed():
+    stream = create_stream({"AAAUSDT": PositionBook.LONG}, {"AAAUSDT": 0.})
+    assert stream.get_drift() == ["AAAUSDT"]
+
+    stream.correct_drift()
+
+    positions = stream.account.positions
+    row = positions.get_row("AAAUSDT")
+    assert positions.side[row] == PositionBook.FLAT
+    assert positions.asset_size[row] == 0
+    assert positions.last_orders[row] == []
+    assert stream.account.halted == set()
+    assert stream.get_drift() == []
+
+
+def test_exchange_position_the_book_does_not_hold_halts_the_symbol():
+    stream = create_stream({"CCCUSDT": PositionBook.LONG}, {"BBBUSDT": 2.5, "CCCUSDT": -1.})
+    assert sorted(stream.get_drift()) == ["BBBUSDT", "CCCUSDT"]
+
+    stream.correct_drift()
+
+    positions = stream.account.positions
+    assert positions.side[positions.get_row("CCCUSDT")] == PositionBook.FLAT
+    assert stream.account.halted == {"BBBUSDT", "CCCUSDT"}
+    # a halted symbol is not reported again, so it is not reconciled over and over
+    assert stream.get_drift() == []
+
+    stream.handle_account_update({"E": 2, "a": {"P": [{"s": "BBBUSDT", "pa": "0", "ep": "0"}]}})
+    stream.resume_halted()
+
+    assert stream.account.halted == {"CCCUSDT"}
+
+
+def test_stream_url_follows_the_client():
+    stream = AccountStream(Account(500.))
+
+    assert stream.get_stream_url(FakeAsyncClient()) == "wss://fstream.binance.com/ws/"
+    assert stream.get_stream_url(FakeAsyncClient('us')) == "wss://fstream.binance.us/ws/"
+    assert stream.get_stream_url(FakeAsyncClient(testnet=True)) == "wss://stream.binancefuture.com/ws/"
+
+
+async def run_stream(stream: AccountStream, client: FakeAsyncClient, events: list) -> list:
+    paths = []
+
+    async def user_data(request: web.Request) -> web.WebSocketResponse:
+        paths.append(request.path)
+
+        connection = web.WebSocketResponse()
+        await connection.prepare(request)
+
+        for event in events:
+            await connection.send_json(event)
+        await connection.close()
+
+        return connection
+
+    application = web.Application()
+    application.router.add_get('/ws/{listen_key}', user_data)
+
+    runner = web.AppRunner(application)
+    await runner.setup()
+
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    stream.get_stream_url = lambda client: f"http://127.0.0.1:{port}/ws/"
+
+    try:
+        # returns once the server closes the connection
+        await asyncio.wait_for(stream.stream(client), 5)
+    finally:
+        await runner.cleanup()
+
+    return paths
+
+
+def test_stream_applies_the_snapshot_and_the_events(monkeypatch):
+    # only the stream may settle the order
+    monkeypatch.setattr(OrderExecutor, "lookup_delay", 60.)
+
+    exchange = FakeExchange(latency=0., fill_in_response=False)
+    exchange.set_price("AAAUSDT", 10.)
+    executor = OrderExecutor(exchange)
+
+    order = executor.submit(Order("AAAUSDT", Order.OPEN, "BUY", 2., 10.))
+    deadline = time.monotonic() + 3.
+    while order.state != Order.SUBMITTED and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+    account = Account(0.)
+    stream = AccountStream(account, executor)
+    client = FakeAsyncClient()
+    later = int(time.time() * 1000) + 60000
+
+    events = [
+        # older than the snapshot, skipped
+        {"e": "ACCOUNT_UPDATE", "E": 1, "a": {"B": [{"a": "USDT", "wb": "1"}], "P": []}},
+        {
+            "e": "ACCOUNT_UPDATE", "E": later,
+            "a": {
+                "B": [{"a": "USDT", "wb": "520.5", "cw": "520.5"}],
+                "P": [{"s": "AAAUSDT", "pa": "3", "ep": "10"}],
+            },
+        },
+        {
+            "e": "ORDER_TRADE_UPDATE", "E": later,
+            "o": {"s": "AAAUSDT", "c": order.client_order_id, "X": "FILLED", "ap": "10.1", "z": "2"},
+        },
+    ]
+
+    paths = asyncio.run(run_stream(stream, client, events))
+
+    assert paths == ["/ws/key1"]
+    assert client.calls[:3] == ["listen_key", "balance", "positions"]
+    assert account.synced
+    assert account.balance == 520.5
+    assert stream.positions == {"AAAUSDT": (3., 10.)}
+
+    assert order.state == Order.FILLED
+    assert (order.avg_price, order.filled_quantity) == (10.1, 2.)
+    assert executor.drain() == [order]
@@ -0,0 +1,66 @@
+import csv
+
+import pytest
+
+from benchmarks.fixtures import get_fixture
+from benchmarks.suite import Liquidated, create_strategy, get_outcome
+from src.bar import Bar
+from src.batch_backtest import BatchBacktest
+from src.grid_backtest import GridBacktest
+from src.kline_log import KlineLog
+
+symbol = "BENCHUSDT"
+
+cases = [("ema9", 1.0, False), ("ema20", 1.5, False), ("wma14", 2.4, False), ("ema9", 1.0, True)]
+
+
+def replay(indicator: str, amplitude: float, trailing: bool) -> dict:
+    # the row by row loop backtest.py runs without batch
+    strategy = create_strategy(indicator, amplitude)
+    strategy.setting.use_trailing_entry = trailing
+
+    try:
+        with open(get_fixture('day'), 'r') as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=',')
+            next(csv_reader)
+
+            for row in csv_reader:
+                bar, current_price = Bar.from_log_row(row)
+                strategy.process_kline_event(symbol, bar, current_price)
+    except Liquidated:
+        pass
+
+    return get_outcome(strategy)
+
+
+@pytest.mark.parametrize("indicator, amplitude, trailing", cases)
+def test_batch_matches_replay(indicator, amplitude, trailing):
+    strategy = create_strategy(indicator, amplitude)
+    strategy.setting.use_trailing_entry = trailing
+
+    try:
+        BatchBacktest(strategy).run(symbol, KlineLog.read(get_fixture('day')))
+    except Liquidated:
+        pass
+
+    expected = replay(indicator, amplitude, trailing)
+
+    assert expected["wins"] + expected["loses"] > 0
+    assert get_outcome(strategy) == expected
+
+
+@pytest.mark.parametrize("trailing", [False, True])
+def test_grid_matches_replay(trailing):
+    amplitudes = [1.0, 1.5, 2.4]
+
+    strategy = create_strategy("ema20")
+    strategy.setting.use_trailing_entry = trailing
+    result = GridBacktest(strategy).run(symbol, KlineLog.read(get_fixture('day')), amplitudes)
+
+    for i, amplitude in enumerate(amplitudes):
+        expected = replay("ema20", amplitude, trailing)
+
+        assert float(result["balance"][i]) == pytest.approx(expected["balance"], abs=1e-6)
+        assert (result["wins"][i], result["loses"][i], result["trailing_loses"][i]) == (
+            expected["wins"], expected["loses"], expected["trailing_loses"]
+        )
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.indicators import IndicatorEngine
+
+
+def create_candles(rows: int = 500, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.004, rows)))
+    open_price = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_price, close) * (1 + np.abs(rng.normal(0, 0.002, rows)))
+    low = np.minimum(open_price, close) * (1 - np.abs(rng.normal(0, 0.002, rows)))
+
+    return pd.DataFrame(
+        {"open_time": np.arange(rows) * 60000, "high": high, "low": low, "close": close}
+    )
+
+
+def rma(series: pd.Series, length: int) -> pd.Series:
+    return series.ewm(alpha=1 / length, min_periods=length).mean()
+
+
+def get_reference(candles: pd.DataFrame) -> pd.DataFrame:
+    # the pandas_ta definitions the bot used to call, spelled out in pandas
+    close, high, low = candles["close"], candles["high"], candles["low"]
+    columns = {}
+
+    for length in IndicatorEngine.ema_lengths:
+        seeded = close.copy()
+        seeded.iloc[:length - 1] = np.nan
+        seeded.iloc[length - 1] = close.iloc[:length].mean()
+        columns[f"ema{length}"] = seeded.ewm(span=length, adjust=False).mean()
+
+    weights = np.arange(1, IndicatorEngine.wma_length + 1)
+    columns["wma14"] = close.rolling(IndicatorEngine.wma_length).apply(
+        lambda window: np.dot(window, weights) / weights.sum(), raw=True
+    )
+
+    previous_close = close.shift(1)
+    true_range = pd.concat([high - low, high - previous_close, previous_close - low], axis=1).abs().max(axis=1)
+    true_range.iloc[:1] = np.nan
+    columns["atr14"] = rma(true_range, IndicatorEngine.atr_length)
+
+    diff = close.diff()
+    positive = rma(diff.clip(lower=0), IndicatorEngine.rsi_length)
+    negative = rma(diff.clip(upper=0), IndicatorEngine.rsi_length).abs()
+    columns["rsi14"] = 100 * positive / (positive + negative)
+
+    return pd.DataFrame(columns)
+
+
+def get_pandas_ta(candles: pd.DataFrame) -> pd.DataFrame:
+    ta = pytest.importorskip("pandas_ta")
+    close = candles["close"]
+
+    columns = {f"ema{length}": ta.ema(close, length=length) for length in IndicatorEngine.ema_lengths}
+    columns["wma14"] = ta.wma(close, length=14)
+    columns["atr14"] = ta.atr(candles["high"], candles["low"], close, talib=False)
+    columns["rsi14"] = ta.rsi(close, talib=False)
+
+    return pd.DataFrame(columns)
+
+
+def stream(candles: pd.DataFrame, refreshed: bool = False) -> pd.DataFrame:
+    engine = IndicatorEngine()
+    rows = []
+
+    for candle in candles.itertuples():
+        if refreshed:
+            # the still open candle is applied first and then replaced by the closed one
+            engine.update(candle.open_time, candle.high * 1.01, candle.low * 0.99, candle.close * 1.005)
+
+        rows.append(engine.update(candle.open_time, candle.high, candle.low, candle.close))
+
+    return pd.DataFrame(rows, columns=IndicatorEngine.columns)
+
+
+def assert_same(actual: pd.DataFrame, expected: pd.DataFrame):
+    for column in IndicatorEngine.columns:
+        np.testing.assert_allclose(
+            actual[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9, atol=1e-9, err_msg=column
+        )
+
+
+@pytest.mark.parametrize("refreshed", [False, True])
+def test_streaming_matches_the_reference(refreshed):
+    candles = create_candles()
+
+    assert_same(stream(candles, refreshed), get_reference(candles))
+
+
+def test_streaming_matches_pandas_ta():
+    candles = create_candles()
+
+    assert_same(stream(candles, True), get_pandas_ta(candles))
+
+
+def test_refreshed_candle_rolls_back():
+    candles = create_candles(100)
+    engine = IndicatorEngine()
+
+    for candle in candles.iloc[:-1].itertuples():
+        engine.update(candle.open_time, candle.high, candle.low, candle.close)
+
+    last = candles.iloc[-1]
+    first = engine.update(last.open_time, last.high, last.low, last.close)
+
+    # refreshing the same candle any number of times gives the values of applying it once
+    for factor in (1.02, 0.97, 1.):
+        values = engine.update(last.open_time, last.high * factor, last.low * factor, last.close * factor)
+
+    assert values == first
@@ -0,0 +1,106 @@
+import os
+import time
+
+import numpy as np
+
+from src.kline_cache import KlineCache
+
+interval_ms = KlineCache.interval_ms['1m']
+
+
+def create_table(start_ms: int, rows: int) -> np.ndarray:
+    table = np.zeros((rows, KlineCache.columns))
+    table[:, 0] = start_ms + np.arange(rows) * interval_ms
+    table[:, 4] = np.arange(rows) + 1.
+    table[:, 6] = table[:, 0] + interval_ms - 1
+
+    return table
+
+
+def get_start_ms(rows_ago: int) -> int:
+    now_ms = int(time.time() * 1000)
+
+    return now_ms - now_ms % interval_ms - rows_ago * interval_ms
+
+
+def test_gap_is_kept(tmp_path):
+    cache = KlineCache(str(tmp_path))
+    start_ms = get_start_ms(100)
+    cache.load("AUSDT", "1m")
+
+    cache.store("AUSDT", "1m", create_table(start_ms, 10))
+    # the exchange had nothing for ten minutes, the history before stays
+    cache.store("AUSDT", "1m", create_table(start_ms + 20 * interval_ms, 10))
+
+    table = KlineCache(str(tmp_path)).load("AUSDT", "1m")
+
+    assert len(table) == 20
+    assert table[9, 0] == start_ms + 9 * interval_ms
+    assert table[10, 0] == start_ms + 20 * interval_ms
+    assert cache.get_next_open_time("AUSDT", "1m") == start_ms + 30 * interval_ms
+
+
+def test_store_keeps_closed_candles_after_the_cached_ones(tmp_path):
+    cache = KlineCache(str(tmp_path))
+    start_ms = get_start_ms(10)
+    cache.load("AUSDT", "1m")
+
+    cache.store("AUSDT", "1m", create_table(start_ms, 5))
+    # overlaps the cached candles and ends with the still open one
+    cache.store("AUSDT", "1m", create_table(start_ms + 3 * interval_ms, 8))
+
+    table = KlineCache(str(tmp_path)).load("AUSDT", "1m")
+
+    assert len(table) == 10
+    assert np.all(np.diff(table[:, 0]) == interval_ms)
+
+
+def test_merge_keeps_a_refetched_head(tmp_path):
+    cache = KlineCache(str(tmp_path))
+    start_ms = get_start_ms(100)
+    cache.load("AUSDT", "1m")
+
+    cache.store("AUSDT", "1m", create_table(start_ms + 10 * interval_ms, 5))
+    cache.merge("AUSDT", "1m", create_table(start_ms, 15))
+
+    table = KlineCache(str(tmp_path)).load("AUSDT", "1m")
+
+    assert len(table) == 15
+    assert table[0, 0] == start_ms
+    assert np.all(np.diff(table[:, 0]) == interval_ms)
+
+
+def test_load_drops_a_torn_append_and_old_rows(tmp_path):
+    cache = KlineCache(str(tmp_path))
+    cache.load("AUSDT", "1m")
+
+    old = create_table(get_start_ms(KlineCache.max_age // 60 + 10), 5)
+    cache.store("AUSDT", "1m", old)
+    cache.store("AUSDT", "1m", create_table(get_start_ms(10), 5))
+
+    with open(cache.get_file("AUSDT", "1m"), 'ab') as out_file:
+        out_file.write(np.zeros(3).tobytes())
+
+    table = KlineCache(str(tmp_path)).load("AUSDT", "1m")
+
+    assert len(table) == 5
+    assert os.path.getsize(cache.get_file("AUSDT", "1m")) == 5 * KlineCache.columns * 8
+
+
+def test_evict_removes_stale_files_then_the_oldest(tmp_path):
+    cache = KlineCache(str(tmp_path))
+    now = time.time()
+
+    for i, s in enumerate(["AUSDT", "BUSDT", "CUSDT", "DUSDT"]):
+        file = cache.get_file(s, "1m")
+        create_table(get_start_ms(10), 10).tofile(file)
+        os.utime(file, (now - 100 + i, now - 100 + i))
+
+    stale = cache.get_file("EUSDT", "1m")
+    create_table(get_start_ms(10), 10).tofile(stale)
+    os.utime(stale, (now - KlineCache.max_age - 1, now - KlineCache.max_age - 1))
+
+    cache.max_total_size = 2 * os.path.getsize(cache.get_file("AUSDT", "1m"))
+    cache.evict()
+
+    assert sorted(os.listdir(tmp_path)) == ["CUSDT-1m.bin", "DUSDT-1m.bin"]
@@ -0,0 +1,96 @@
+import csv
+import os
+
+import numpy as np
+
+from src.kline_index import KlineLogIndex
+from src.kline_log import KlineLog
+
+start_time = 1672531200000
+
+
+def write_rows(path: str, start: int, rows: int, mode: str = 'a', close: float = 1.):
+    with open(path, mode, newline='') as out_csv:
+        writer = csv.writer(out_csv, delimiter=',', lineterminator='\n')
+
+        if mode == 'w':
+            writer.writerow(KlineLog.headers)
+
+        for i in range(start, start + rows):
+            row = [0.] * len(KlineLog.headers)
+            row[KlineLog.headers.index('close')] = close + i
+            row[KlineLog.headers.index('close_time')] = start_time + i * 60000 + 59999
+            writer.writerow(row)
+
+
+def get_close_time(row: int) -> int:
+    return start_time + row * 60000 + 59999
+
+
+def read_row_at(path: str, offset: int) -> float:
+    with open(path, 'rb') as in_file:
+        in_file.seek(offset)
+        values = in_file.readline().decode().split(',')
+
+    return float(values[KlineLog.headers.index('close_time')])
+
+
+def test_seek_lands_on_the_block_holding_the_date(tmp_path):
+    path = str(tmp_path / "AUSDT.csv")
+    write_rows(path, 0, 22, 'w')
+
+    index = KlineLogIndex(path, 4).update()
+
+    assert index.total_rows == 22
+    assert index.rows.tolist() == [0, 4, 8, 12, 16, 20]
+
+    for row in (0, 5, 13, 21):
+        first_row, offset = index.seek(get_close_time(row))
+
+        assert first_row == row - row % 4
+        assert read_row_at(path, offset) == get_close_time(first_row)
+
+    # past the end there is nothing to read
+    assert index.seek(get_close_time(22)) == (22, os.path.getsize(path))
+
+
+def test_append_extends_the_index_like_a_fresh_one(tmp_path):
+    path = str(tmp_path / "AUSDT.csv")
+    write_rows(path, 0, 10, 'w')
+    KlineLogIndex(path, 4).update()
+
+    write_rows(path, 10, 9)
+    index = KlineLogIndex(path, 4).update()
+
+    os.remove(path + KlineLogIndex.extension)
+    fresh = KlineLogIndex(path, 4).update()
+
+    assert index.total_rows == fresh.total_rows == 19
+    for name in ('rows', 'offsets', 'min_close_time', 'max_close_time'):
+        np.testing.assert_array_equal(getattr(index, name), getattr(fresh, name), err_msg=name)
+
+
+def test_rewritten_log_is_indexed_again(tmp_path):
+    path = str(tmp_path / "AUSDT.csv")
+    write_rows(path, 0, 10, 'w')
+    KlineLogIndex(path, 4).update()
+
+    # written again from scratch, the old offsets point anywhere
+    write_rows(path, 100, 10, 'w', close=2.)
+    index = KlineLogIndex(path, 4).update()
+
+    assert read_row_at(path, index.seek(get_close_time(105))[1]) == get_close_time(104)
+
+
+def test_read_csv_from_date_matches_a_full_read(tmp_path):
+    path = str(tmp_path / "AUSDT.csv")
+    write_rows(path, 0, 50, 'w')
+
+    full = KlineLog.read_csv(path)
+    from_date = get_close_time(17)
+    keep = full['close_time'] >= from_date
+
+    data = KlineLog.read_csv(path, from_date)
+
+    for column in KlineLog.headers:
+        np.testing.assert_array_equal(data[column], full[column][keep], err_msg=column)
@@ -0,0 +1,145 @@
+import time
+
+import pytest
+
+from benchmarks import order_execution
+from benchmarks.fixtures import get_fixture
+from src.order_executor import Order, OrderExecutor
+from tests.fake_exchange import FakeExchange
+
+symbol = "TESTUSDT"
+
+
+@pytest.fixture(autouse=True)
+def quick_lookups(monkeypatch):
+    monkeypatch.setattr(OrderExecutor, "lookup_delay", 0.05)
+    monkeypatch.setattr(OrderExecutor, "lookup_period", 0.05)
+
+
+def create_executor(subscribed: bool = True, **params) -> tuple:
+    exchange = FakeExchange(latency=0., **params)
+    exchange.set_price(symbol, 10.)
+
+    executor = OrderExecutor(exchange)
+    if subscribed:
+        exchange.subscribe(executor.handle_order_update)
+
+    return exchange, executor
+
+
+def wait(executor: OrderExecutor, timeout: float = 3.) -> list:
+    deadline = time.monotonic() + timeout
+
+    # a settled order also leaves the lookups, the worker drops it right after finishing it
+    while (executor.is_pending(symbol) or executor.unsettled) and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+    assert not executor.is_pending(symbol)
+    assert executor.unsettled == {}
+
+    return executor.drain()
+
+
+def test_fill_in_response():
+    exchange, executor = create_executor()
+
+    order = executor.submit(Order(symbol, Order.OPEN, "BUY", 2., 9.9))
+
+    assert wait(executor) == [order]
+    assert order.state == Order.FILLED
+    assert (order.avg_price, order.filled_quantity) == (10., 2.)
+    assert exchange.get_position(symbol)["amount"] == 2.
+
+
+@pytest.mark.parametrize("subscribed", [True, False])
+def test_fill_without_fill_in_response(subscribed):
+    # the user data stream settles it, or the lookup when the stream is down
+    exchange, executor = create_executor(subscribed, fill_in_response=False)
+
+    order = executor.submit(Order(symbol, Order.OPEN, "SELL", 1., 10.))
+
+    assert wait(executor) == [order]
+    assert order.state == Order.FILLED
+    assert order.avg_price == 10.
+
+
+@pytest.mark.parametrize("subscribed", [True, False])
+def test_partial_fill(subscribed):
+    exchange, executor = create_executor(subscribed)
+    exchange.split(symbol)
+
+    order = executor.submit(Order(symbol, Order.OPEN, "BUY", 3., 10.))
+
+    assert wait(executor) == [order]
+    assert order.state == Order.FILLED
+    assert order.filled_quantity == 3.
+
+
+def test_partially_filled_order_that_expires_keeps_the_executed_part(monkeypatch):
+    exchange, executor = create_executor(False)
+    exchange.split(symbol)
+
+    # the lookup finds the rest expired instead of filled
+    get_order = exchange.futures_get_order
+    monkeypatch.setattr(
+        exchange, "futures_get_order", lambda **params: dict(get_order(**params), status="EXPIRED", executedQty="1.5")
+    )
+
+    order = executor.submit(Order(symbol, Order.OPEN, "BUY", 3., 10.))
+
+    assert wait(executor) == [order]
+    assert order.state == Order.FILLED
+    assert order.filled_quantity == 1.5
+
+
+def test_reject():
+    exchange, executor = create_executor()
+    exchange.reject(symbol)
+
+    order = executor.submit(Order(symbol, Order.OPEN, "BUY", 1., 10.))
+
+    assert wait(executor) == [order]
+    assert order.state == Order.REJECTED
+    assert order.error["code"] == -2027
+    assert exchange.get_position(symbol)["amount"] == 0.
+
+
+@pytest.mark.parametrize("executed, state", [(True, Order.FILLED), (False, Order.FAILED)])
+def test_lost_response(executed, state):
+    # the client times out, only a lookup tells whether the exchange got the order
+    exchange, executor = create_executor(False)
+    exchange.time_out(symbol, executed)
+
+    order = executor.submit(Order(symbol, Order.OPEN, "BUY", 1., 10.))
+
+    assert wait(executor) == [order]
+    assert order.state == state
+    assert exchange.get_position(symbol)["amount"] == (1. if executed else 0.)
+
+
+def test_reduce_only_close():
+    exchange, executor = create_executor()
+
+    # nothing to reduce, the close never opens the other side
+    order = executor.submit(Order(symbol, Order.CLOSE, "SELL", 1., 10.))
+    wait(executor)
+
+    assert order.state == Order.REJECTED
+    assert order.error["code"] == -2022
+    assert exchange.get_position(symbol)["amount"] == 0.
+
+    executor.submit(Order(symbol, Order.OPEN, "BUY", 1., 10.))
+    wait(executor)
+
+    # a close larger than the position shrinks to it
+    order = executor.submit(Order(symbol, Order.CLOSE, "SELL", 1.5, 10.))
+    wait(executor)
+
+    assert order.state == Order.FILLED
+    assert order.filled_quantity == 1.
+    assert exchange.get_position(symbol)["amount"] == 0.
+
+
+@pytest.mark.parametrize("fill_in_response", [True, False])
+def test_every_close_leaves_the_exchange_flat(fill_in_response):
+    assert order_execution.run(get_fixture('day'), 0., 0., fill_in_response)
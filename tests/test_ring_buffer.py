@@ -0,0 +1,53 @@
+import numpy as np
+
+from src.ring_buffer import KlineRingBuffer
+
+columns = ["open", "close"]
+
+
+def test_view_is_the_latest_rows_in_order():
+    buffer = KlineRingBuffer(columns, 4)
+
+    for i in range(10):
+        buffer.append(i * 60000, [i, i + 0.5])
+
+        assert len(buffer) == min(i + 1, 4)
+        assert buffer.view()[:, 0].tolist() == list(range(max(0, i - 3), i + 1))
+
+    # a view past the wrap point is still a contiguous slice, not a copy
+    assert buffer.view(2).base is buffer.data
+    assert buffer.view(2)[:, 0].tolist() == [8, 9]
+    assert buffer.last_open_time == 9 * 60000
+    assert buffer.get("close") == 9.5
+
+
+def test_same_candle_is_replaced_and_older_is_ignored():
+    buffer = KlineRingBuffer(columns, 4)
+
+    for i in range(5):
+        buffer.append(i * 60000, [i, i])
+
+    series = buffer.latest_series()
+    assert buffer.latest_series() is series
+
+    buffer.append(4 * 60000, [4, 40])
+    buffer.append(2 * 60000, [2, 20])
+
+    assert len(buffer) == 4
+    assert buffer.view()[:, 1].tolist() == [1, 2, 3, 40]
+    # a refreshed candle builds a new series
+    assert buffer.latest_series()["close"] == 40
+
+
+def test_extend_keeps_the_tail_and_to_frame():
+    buffer = KlineRingBuffer(columns, 3)
+    open_times = np.arange(6) * 60000
+    rows = np.column_stack([np.arange(6), np.arange(6) * 2.])
+
+    buffer.extend(open_times, rows)
+    frame = buffer.to_frame()
+
+    assert frame["open"].tolist() == [3, 4, 5]
+    assert frame["close"].tolist() == [6, 8, 10]
+    assert frame.index[-1].value == 5 * 60000 * 1000000
+    assert buffer.to_frame(1)["open"].tolist() == [5]
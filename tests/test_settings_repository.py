@@ -0,0 +1,41 @@
+from src.settings_repository import SqliteSettingsRepository
+
+
+def create_setting(s: str, amplitude: float, balance: float = None) -> dict:
+    return {"symbol": s, "indicator": "ema9", "amplitude": amplitude, "balance": balance}
+
+
+def test_load_changed_returns_only_new_and_updated_rows(tmp_path):
+    path = str(tmp_path / "settings.sqlite")
+    repository = SqliteSettingsRepository(path)
+
+    repository.save_many([create_setting("AUSDT", 2.4, 512.5), create_setting("BUSDT", 1.5)])
+
+    rows = repository.load_changed()
+    assert sorted(row["symbol"] for row in rows) == ["AUSDT", "BUSDT"]
+    assert {row["symbol"]: row["amplitude"] for row in rows} == {"AUSDT": "2.4", "BUSDT": "1.5"}
+    assert rows[0]["version"] is not None
+
+    # rows of the last second come back from the query and are dropped as unchanged
+    assert repository.load_changed() == []
+
+    repository.save_many([create_setting("BUSDT", 3.1, 490.)])
+
+    rows = repository.load_changed()
+    assert [(row["symbol"], row["amplitude"], row["hyperopted_balance"]) for row in rows] == [
+        ("BUSDT", "3.1", "490.0")
+    ]
+    assert repository.load_changed() == []
+
+
+def test_save_many_upserts_by_symbol(tmp_path):
+    path = str(tmp_path / "settings.sqlite")
+    repository = SqliteSettingsRepository(path)
+
+    repository.save_many([])
+    repository.save_many([create_setting("AUSDT", 1.0)])
+    repository.save_many([create_setting("AUSDT", 2.0), create_setting("CUSDT", 1.0)])
+
+    rows = SqliteSettingsRepository(path).load_changed()
+
+    assert sorted((row["symbol"], row["amplitude"]) for row in rows) == [("AUSDT", "2.0"), ("CUSDT", "1.0")]